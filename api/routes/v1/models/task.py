@@ -1,10 +1,13 @@
 from pydantic import BaseModel
+from pydantic import Field
 from typing import List
 
 
 class NewTaskRequest(BaseModel):
     arguments: dict = {}
     tags: List[str] = []
+    # tasks with a higher priority are delivered first
+    priority: int = Field(0, ge=0, le=255)
 
 
 class TaskCreatedResponse(BaseModel):
@@ -1,3 +1,4 @@
+from datetime import datetime
 from redis import Redis
 from bson.regex import Regex
 from fastapi import APIRouter, Depends
@@ -8,6 +9,8 @@ from odmantic import AIOEngine
 from motor.motor_asyncio import AsyncIOMotorCollection
 
 from framework.src.chain_factory.models.mongodb_models import NodeTasks  # noqa: E501
+from framework.src.chain_factory.models.mongodb_models import Task  # noqa: E501
+from framework.src.chain_factory.common.settings import parked_tasks_redis_key  # noqa: E501
 from ...auth.depends import CheckScope, get_username
 from .utils import (
     add_fields, facet, get_allowed_namespaces,
@@ -38,6 +41,33 @@ async def active_tasks(
     return tasks_result
 
 
+@api.get("/parked", dependencies=[user_role])
+async def parked_tasks(
+    namespace: str,
+    namespaces: List[Namespace] = Depends(get_allowed_namespaces),
+    redis_client: Redis = Depends(get_redis_client),
+):
+    """
+    Returns the tasks, which are parked,
+    because no alive node has registered them
+    """
+    parked = []
+    for namespace_obj in namespaces:
+        domain_snake_case = namespace_obj.domain.replace(".", "_")
+        redis_key = (
+            namespace_obj.namespace + "_" +
+            domain_snake_case + "_" +
+            parked_tasks_redis_key
+        )
+        for task_json, parked_time in redis_client.zrange(redis_key, 0, -1, withscores=True):  # noqa: E501
+            parked.append({
+                "namespace": namespace_obj.namespace,
+                "parked_date": datetime.utcfromtimestamp(parked_time),
+                "task": Task.parse_raw(task_json),
+            })
+    return parked
+
+
 async def nodes(
     namespace: str,
     username: str,
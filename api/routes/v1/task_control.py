@@ -89,6 +89,7 @@ async def new_task(
                                             name=task_name,
                                             arguments=input_arguments,
                                             tags=json_body.tags,
+                                            priority=json_body.priority,
                                             workflow_id=str(wf_saved.inserted_id),  # noqa: E501
                                         )
                                         # update workflow with workflow id
@@ -98,7 +99,7 @@ async def new_task(
                                         )
                                         del new_task.task_id
                                         for _ in range(0, 10):
-                                            response = await rabbitmq_client.send(new_task.json())  # noqa: E501
+                                            response = await rabbitmq_client.send(new_task.json(), routing_key=new_task.name, priority=new_task.priority)  # noqa: E501
                                             LOGGER.debug(f"Response: {response}")  # noqa: E501
                                             if response:
                                                 return "Task created"
@@ -10,8 +10,11 @@ from odmantic import AIOEngine
 
 from framework.src.chain_factory.common.settings import heartbeat_redis_key
 from framework.src.chain_factory.common.settings import heartbeat_sleep_time
+from framework.src.chain_factory.common.settings import task_routing
+from framework.src.chain_factory.common.settings import task_max_priority
 from framework.src.chain_factory.models.redis_models import Heartbeat  # noqa: E501
 from framework.src.chain_factory.wrapper.rabbitmq import RabbitMQ
+from framework.src.chain_factory.wrapper.rabbitmq import priority_queue_options  # noqa: E501
 from ...auth.depends import get_username
 from .models.namespace import Namespace
 
@@ -185,6 +188,8 @@ async def get_rabbitmq_client(vhost: str, rabbitmq_url: str) -> RabbitMQ:
             url=url,
             queue_name="it_queue",
             rmq_type="publisher",
+            task_routing=task_routing,
+            queue_options=priority_queue_options(task_max_priority),
         )
         await client.init()
         rabbitmq_connection_pool[url] = client
@@ -211,11 +211,13 @@ async def restart_workflow(
                         name = ""
                         arguments = {}
                         node_names = []
+                        priority = 0
                         if first_task_obj.task is not None:
                             tags = first_task_obj.task.tags
                             name = first_task_obj.task.name
                             arguments = first_task_obj.task.arguments
                             node_names = first_task_obj.task.node_names
+                            priority = first_task_obj.task.priority
 
                         new_workflow = Workflow(
                             created_date=datetime.utcnow(),
@@ -234,12 +236,13 @@ async def restart_workflow(
                             name=name,
                             arguments=arguments,
                             node_names=node_names,
+                            priority=priority,
                             tags=tags,
                             workflow_id=str(wf_saved.inserted_id),  # noqa: E501
                         )
                         del new_task.task_id
 
-                        response = await rabbitmq_client.send(new_task.json())  # noqa: E501
+                        response = await rabbitmq_client.send(new_task.json(), routing_key=new_task.name, priority=new_task.priority)  # noqa: E501
                         if response:
                             return "Workflow restarted"
 
@@ -0,0 +1,54 @@
+"""
+Measures the time to encode and decode one task
+with the former pydantic json serialization and the task codecs,
+decoding with validation (external messages)
+and without validation (trusted messages published by the nodes)
+
+usage (from the framework directory):
+    PYTHONPATH=src python benchmarks/task_codec_benchmark.py [iterations]
+"""
+from sys import argv
+from timeit import timeit
+from typing import Callable
+
+from chain_factory.models.mongodb_models import Task
+from chain_factory.task_codec import JsonCodec
+from chain_factory.task_codec import MsgpackCodec
+from chain_factory.task_codec import msgpack
+
+
+def create_task() -> Task:
+    return Task(
+        name="benchmark_task",
+        arguments={"text": "x" * 200, "count": 42, "items": list(range(0, 20))},  # noqa: E501
+        workflow_id="0f4b1c5e6d7a8b9c",
+        parent_task_id="1a2b3c4d5e6f7a8b",
+        task_id="9c8b7a6d5e4f3a2b",
+        node_names=["node1", "node2"],
+        tags=["benchmark"],
+    )
+
+
+def measure(name: str, function: Callable[[], object], iterations: int):
+    duration = timeit(function, number=iterations)
+    print(f"{name:40} {duration / iterations * 1000000:8.2f} us")
+
+
+def main(iterations: int):
+    task = create_task()
+    measure("encode pydantic json", task.json, iterations)
+    body = task.json()
+    measure("decode pydantic json", lambda: Task.parse_raw(body), iterations)
+    codecs = [JsonCodec()]
+    if msgpack is not None:
+        codecs.append(MsgpackCodec())
+    for codec in codecs:
+        encoded = codec.encode(task)
+        measure(f"encode {codec.content_type}", lambda: codec.encode(task), iterations)  # noqa: E501
+        measure(f"decode {codec.content_type}", lambda: codec.decode(encoded), iterations)  # noqa: E501
+        measure(f"decode {codec.content_type} trusted", lambda: codec.decode(encoded, trusted=True), iterations)  # noqa: E501
+        print(f"{codec.content_type} size: {len(encoded)} bytes")
+
+
+if __name__ == "__main__":
+    main(int(argv[1]) if len(argv) > 1 else 20000)
@@ -0,0 +1,79 @@
+"""
+Measures the event loop wakeups and the cpu time of the event loop thread
+per task while waiting for running tasks,
+comparing the former 1 ms polling loop with the completion signalled
+by the task
+
+usage (from the framework directory):
+    PYTHONPATH=src python benchmarks/task_completion_benchmark.py [task_count] [task_duration]  # noqa: E501
+"""
+from asyncio import SelectorEventLoop
+from asyncio import gather
+from asyncio import sleep
+from io import BytesIO
+from sys import argv
+from time import perf_counter
+from time import thread_time
+
+from chain_factory.models.mongodb_models import Task
+from chain_factory.task_thread import TaskThread
+
+
+class CountingEventLoop(SelectorEventLoop):
+    """
+    Counts the iterations (wakeups) of the event loop
+    """
+    wakeups = 0
+
+    def _run_once(self):
+        self.wakeups = self.wakeups + 1
+        super()._run_once()
+
+
+def _task_thread(task_duration: float):
+    async def long_running_task():
+        await sleep(task_duration)
+    return TaskThread("long_running_task", long_running_task, {}, BytesIO(), {}, None, Task(name="long_running_task"))  # noqa: E501
+
+
+async def poll_until_finished(task_thread: TaskThread):
+    """
+    the former TaskRunner._control_task_thread
+    """
+    while task_thread._status not in [2, 3, 4, 5]:
+        await sleep(0.001)
+
+
+async def wait_until_finished(task_thread: TaskThread):
+    await task_thread.wait_finished()
+
+
+def benchmark(wait, task_count: int, task_duration: float):
+    loop = CountingEventLoop()
+
+    async def run_tasks():
+        task_threads = [_task_thread(task_duration) for _ in range(0, task_count)]  # noqa: E501
+        for task_thread in task_threads:
+            task_thread.bind_loop(loop)
+            task_thread.start()
+        await gather(*[wait(task_thread) for task_thread in task_threads])
+
+    start_time = perf_counter()
+    start_cpu_time = thread_time()
+    loop.run_until_complete(run_tasks())
+    cpu_time = thread_time() - start_cpu_time
+    elapsed_time = perf_counter() - start_time
+    loop.close()
+    wakeups = loop.wakeups / task_count / elapsed_time
+    cpu_milliseconds = cpu_time * 1000 / task_count / elapsed_time
+    return wakeups, cpu_milliseconds
+
+
+if __name__ == "__main__":
+    task_count = int(argv[1]) if len(argv) > 1 else 50
+    task_duration = float(argv[2]) if len(argv) > 2 else 2
+    print(f"tasks running for {task_duration} seconds, per task and second:")  # noqa: E501
+    for count in sorted(set([1, task_count])):
+        for name, wait in [("polling", poll_until_finished), ("signalled", wait_until_finished)]:  # noqa: E501
+            wakeups, cpu_milliseconds = benchmark(wait, count, task_duration)  # noqa: E501
+            print(f"{count:4d} tasks {name:10s} {wakeups:10.2f} loop wakeups {cpu_milliseconds:8.3f} ms cpu")  # noqa: E501
@@ -0,0 +1,62 @@
+"""
+Compares the throughput of no-op tasks (tasks/sec)
+between a new TaskThread per task and the pooled task threads
+
+usage (from the framework directory):
+    PYTHONPATH=src python benchmarks/task_thread_pool_benchmark.py [task_count] [worker_count]  # noqa: E501
+"""
+from io import BytesIO
+from sys import argv
+from time import perf_counter
+
+from chain_factory.models.mongodb_models import Task
+from chain_factory.task_thread import TaskThread
+from chain_factory.task_thread_pool import TaskThreadPool
+
+
+async def noop():
+    return None
+
+
+def _task_thread():
+    return TaskThread("noop", noop, {}, BytesIO(), {}, None, Task(name="noop"))  # noqa: E501
+
+
+def _run_batches(task_count: int, worker_count: int, start):
+    """
+    runs the tasks in batches of worker_count concurrent tasks,
+    like the worker slots do on a node
+    """
+    for _ in range(0, task_count // worker_count):
+        task_threads = [_task_thread() for _ in range(0, worker_count)]
+        for task_thread in task_threads:
+            start(task_thread)
+        for task_thread in task_threads:
+            task_thread.join()
+
+
+def benchmark_thread_per_task(task_count: int, worker_count: int) -> float:
+    start_time = perf_counter()
+    _run_batches(task_count, worker_count, lambda t: t.start())
+    return task_count / (perf_counter() - start_time)
+
+
+def benchmark_task_thread_pool(task_count: int, worker_count: int) -> float:
+    task_thread_pool = TaskThreadPool(worker_count)
+    task_thread_pool.start()
+    start_time = perf_counter()
+    _run_batches(task_count, worker_count, task_thread_pool.submit)
+    tasks_per_second = task_count / (perf_counter() - start_time)
+    task_thread_pool.shutdown()
+    return tasks_per_second
+
+
+if __name__ == "__main__":
+    task_count = int(argv[1]) if len(argv) > 1 else 5000
+    worker_count = int(argv[2]) if len(argv) > 2 else 4
+    thread_per_task = benchmark_thread_per_task(task_count, worker_count)
+    pooled = benchmark_task_thread_pool(task_count, worker_count)
+    print(f"{task_count} no-op tasks, {worker_count} concurrent")
+    print(f"thread per task:     {thread_per_task:10.0f} tasks/sec")
+    print(f"pooled task threads: {pooled:10.0f} tasks/sec")
+    print(f"speedup:             {pooled / thread_per_task:10.2f}x")
@@ -0,0 +1,243 @@
+from datetime import datetime
+from inspect import Parameter
+from inspect import signature
+from json import JSONDecodeError
+from json import loads
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+from typing import get_type_hints
+from pydantic import BaseModel
+from pydantic import ValidationError
+
+# models
+from .models.mongodb_models import ArgumentType
+from .models.mongodb_models import CallbackType
+
+ConverterType = Callable[[str, Any], Any]
+
+
+class ArgumentConversionError(TypeError):
+    """
+    Raised, if an argument can not be converted
+    to the type annotated in the task function
+    """
+
+    def __init__(self, argument: str, value: Any, expected: str, reason: str = ""):  # noqa: E501
+        message = f"argument '{argument}' with value {value!r} can not be converted to {expected}"  # noqa: E501
+        if reason:
+            message = f"{message}: {reason}"
+        TypeError.__init__(self, message)
+        self.argument = argument
+        self.value = value
+        self.expected = expected
+
+
+def _convert_int(argument: str, value: Any) -> int:
+    if type(value) is int:
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            raise ArgumentConversionError(argument, value, "int")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    raise ArgumentConversionError(argument, value, "int")
+
+
+def _convert_float(argument: str, value: Any) -> float:
+    if type(value) is float:
+        return value
+    if isinstance(value, (str, int)) and not isinstance(value, bool):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    raise ArgumentConversionError(argument, value, "float")
+
+
+_true_values = ["true", "1", "yes", "on"]
+_false_values = ["false", "0", "no", "off"]
+
+
+def _convert_bool(argument: str, value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in _true_values:
+            return True
+        if lowered in _false_values:
+            return False
+    if type(value) is int and value in [0, 1]:
+        return value == 1
+    raise ArgumentConversionError(argument, value, "bool")
+
+
+def _convert_datetime(argument: str, value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            # fromisoformat only understands the "Z" suffix since python 3.11
+            return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))  # noqa: E501
+        except ValueError as e:
+            raise ArgumentConversionError(argument, value, "datetime", str(e))  # noqa: E501
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value)
+    raise ArgumentConversionError(argument, value, "datetime")
+
+
+def _load_json(argument: str, value: str, expected: str) -> Any:
+    try:
+        return loads(value)
+    except JSONDecodeError as e:
+        raise ArgumentConversionError(argument, value, expected, str(e))
+
+
+def _list_converter(item_converter: Optional[ConverterType]) -> ConverterType:  # noqa: E501
+    def convert(argument: str, value: Any) -> List[Any]:
+        if isinstance(value, str):
+            value = _load_json(argument, value, "list")
+        if isinstance(value, tuple):
+            value = list(value)
+        if not isinstance(value, list):
+            raise ArgumentConversionError(argument, value, "list")
+        if item_converter is None:
+            return value
+        return [item_converter(argument, item) for item in value]
+    return convert
+
+
+def _dict_converter(value_converter: Optional[ConverterType]) -> ConverterType:  # noqa: E501
+    def convert(argument: str, value: Any) -> Dict[Any, Any]:
+        if isinstance(value, str):
+            value = _load_json(argument, value, "dict")
+        if not isinstance(value, dict):
+            raise ArgumentConversionError(argument, value, "dict")
+        if value_converter is None:
+            return value
+        return {key: value_converter(argument, item) for key, item in value.items()}  # noqa: E501
+    return convert
+
+
+def _model_converter(model: type) -> ConverterType:
+    def convert(argument: str, value: Any) -> BaseModel:
+        if isinstance(value, model):
+            return value
+        try:
+            if isinstance(value, str):
+                return model.parse_raw(value)  # type: ignore
+            if isinstance(value, dict):
+                return model.parse_obj(value)  # type: ignore
+        except ValidationError as e:
+            raise ArgumentConversionError(argument, value, model.__name__, str(e))  # noqa: E501
+        raise ArgumentConversionError(argument, value, model.__name__)
+    return convert
+
+
+def _optional_converter(converter: ConverterType) -> ConverterType:
+    def convert(argument: str, value: Any) -> Any:
+        if value is None:
+            return None
+        return converter(argument, value)
+    return convert
+
+
+_converters: Dict[Any, ConverterType] = {
+    int: _convert_int,
+    float: _convert_float,
+    bool: _convert_bool,
+    datetime: _convert_datetime,
+}
+
+
+def _converter_for(annotation: Any) -> Optional[ConverterType]:
+    """
+    Returns the converter for the annotated type,
+    None, if the value should be passed through unchanged
+    """
+    if annotation in _converters:
+        return _converters[annotation]
+    if annotation is list:
+        return _list_converter(None)
+    if annotation is dict:
+        return _dict_converter(None)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_converter(annotation)
+    # typing.get_origin/get_args are not available in python 3.7
+    origin = getattr(annotation, "__origin__", None)
+    type_arguments = getattr(annotation, "__args__", None) or ()
+    if origin is list:
+        return _list_converter(_converter_for(type_arguments[0]) if type_arguments else None)  # noqa: E501
+    if origin is dict:
+        return _dict_converter(_converter_for(type_arguments[1]) if len(type_arguments) == 2 else None)  # noqa: E501
+    if origin is Union:
+        # only Optional[X] is supported, other unions are passed through
+        not_none = [argument for argument in type_arguments if argument is not type(None)]  # noqa: E501
+        if len(not_none) == 1:
+            converter = _converter_for(not_none[0])
+            if converter is not None:
+                return _optional_converter(converter)
+    return None
+
+
+def _type_hints(callback: CallbackType) -> Dict[str, Any]:
+    try:
+        return get_type_hints(callback)
+    except Exception:
+        # e.g. a forward reference, which can not be resolved,
+        # fall back to the annotations, which are not strings
+        annotations = getattr(callback, "__annotations__", {})
+        return {name: annotation for name, annotation in annotations.items() if not isinstance(annotation, str)}  # noqa: E501
+
+
+class ArgumentConverter():
+    """
+    Converts the arguments of a task (mostly strings, if sent over the api)
+    to the types annotated in the task function
+    The conversion plan is built once, when the task is registered,
+    supported are int, float, bool, datetime, list, dict,
+    List[X], Dict[str, X], Optional[X] and pydantic models
+    """
+
+    def __init__(self, callback: CallbackType):
+        self._plan: List[Tuple[str, ConverterType]] = ArgumentConverter._build_plan(callback)  # noqa: E501
+
+    @staticmethod
+    def _build_plan(callback: CallbackType) -> List[Tuple[str, ConverterType]]:  # noqa: E501
+        try:
+            parameters = signature(callback).parameters
+        except (TypeError, ValueError):
+            # e.g. a builtin without a signature
+            return []
+        type_hints = _type_hints(callback)
+        plan: List[Tuple[str, ConverterType]] = []
+        for name, parameter in parameters.items():
+            if parameter.kind in [Parameter.VAR_POSITIONAL, Parameter.VAR_KEYWORD]:  # noqa: E501
+                continue
+            if name not in type_hints:
+                continue
+            converter = _converter_for(type_hints[name])
+            if converter is not None:
+                plan.append((name, converter))
+        return plan
+
+    def convert(self, arguments: ArgumentType) -> Dict[str, Any]:
+        """
+        Returns a copy of the arguments converted to the annotated types,
+        empty strings are passed through unchanged,
+        raises ArgumentConversionError, if an argument is invalid
+        """
+        converted: Dict[str, Any] = dict(arguments)
+        for name, converter in self._plan:
+            if name in converted:
+                value = converted[name]
+                if value != "":
+                    converted[name] = converter(name, value)
+        return converted
@@ -0,0 +1,111 @@
+from hashlib import sha256
+from logging import debug
+from typing import Any
+from typing import Dict
+from typing import Optional
+from gridfs.errors import NoFile
+from pymongo.errors import PyMongoError
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+# direct imports
+from .task_codec import JsonCodec
+
+# settings
+from .common.settings import claim_check_threshold
+from .common.settings import claim_check_bucket
+
+# models
+from .models.mongodb_models import ArgumentType
+
+# key of the reference, which replaces an offloaded argument
+CLAIM_CHECK_KEY = "__claim_check__"
+
+
+class ArgumentLoadError(Exception):
+    """
+    Raised, if an offloaded argument can not be loaded from GridFS
+    """
+
+
+def is_claim_check(value: Any) -> bool:
+    return isinstance(value, dict) and CLAIM_CHECK_KEY in value
+
+
+class ArgumentStore():
+    """
+    Stores the arguments of the tasks above threshold bytes (claim check)
+    content addressed in GridFS, the argument is replaced by a reference
+    {"__claim_check__": "<sha256>", "size": <bytes>}
+    so the messages and the task/workflow associations only carry
+    the reference and an argument passed along the workflow
+    is only stored once
+    """
+
+    def __init__(self, threshold: int = claim_check_threshold):
+        self.threshold = threshold
+        self._bucket: Optional[AsyncIOMotorGridFSBucket] = None
+        self._codec = JsonCodec()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0 and self._bucket is not None
+
+    def init(self, database: AsyncIOMotorDatabase, bucket_name: str = claim_check_bucket):  # noqa: E501
+        if self.threshold > 0:
+            self._bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)  # noqa: E501
+
+    async def offload(self, arguments: ArgumentType) -> ArgumentType:
+        """
+        Returns the arguments with the arguments above threshold bytes
+        replaced by references
+        """
+        if not self.enabled or not arguments:
+            return arguments
+        # the excluded arguments (e.g. secrets) never reach the database
+        excluded = arguments.get("exclude") or []
+        offloaded: Dict[str, Any] = {}
+        for name, value in arguments.items():
+            # the names of the excluded arguments are read by the nodes
+            if name == "exclude" or name in excluded or is_claim_check(value):  # noqa: E501
+                offloaded[name] = value
+                continue
+            data = self._codec.dumps(value)
+            if len(data) <= self.threshold:
+                offloaded[name] = value
+                continue
+            offloaded[name] = {CLAIM_CHECK_KEY: await self._store(data), "size": len(data)}  # noqa: E501
+        return offloaded
+
+    async def _store(self, data: bytes) -> str:
+        """
+        Stores the data, if it is not stored yet,
+        returns the sha256 of the data
+        """
+        digest = sha256(data).hexdigest()
+        if self._bucket is None:
+            raise Exception("argument store is not initialized")
+        async for _ in self._bucket.find({"filename": digest}, limit=1):
+            debug(f"argument {digest} is already stored")
+            return digest
+        await self._bucket.upload_from_stream(digest, data)
+        return digest
+
+    async def load(self, arguments: ArgumentType) -> ArgumentType:
+        """
+        Returns the arguments with the references replaced by the arguments
+        """
+        if not arguments or not any(is_claim_check(value) for value in arguments.values()):  # noqa: E501
+            return arguments
+        if self._bucket is None:
+            raise ArgumentLoadError("the arguments contain claim checks, but the argument store is not initialized")  # noqa: E501
+        loaded: Dict[str, Any] = {}
+        for name, value in arguments.items():
+            if is_claim_check(value):
+                try:
+                    stream = await self._bucket.open_download_stream_by_name(value[CLAIM_CHECK_KEY])  # noqa: E501
+                    value = self._codec.loads(await stream.read())
+                except (NoFile, PyMongoError, ValueError) as e:
+                    raise ArgumentLoadError(f"argument '{name}' can not be loaded: {e}") from e  # noqa: E501
+            loaded[name] = value
+        return loaded
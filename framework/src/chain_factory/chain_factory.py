@@ -12,6 +12,7 @@ from typing import Type
 
 # direct imports
 from .task_queue_handlers import TaskQueueHandlers
+from .drain_report import DrainReport
 
 # data types
 from .models.mongodb_models import ErrorCallbackType
@@ -22,6 +23,7 @@ from .common.settings import task_timeout as default_task_timeout
 from .common.settings import task_repeat_on_timeout as default_task_repeat_on_timeout  # noqa: E501
 from .common.settings import namespace as default_namespace
 from .common.settings import namespace_key as default_namespace_key
+from .common.settings import task_executor as default_task_executor
 
 
 class ChainFactory():
@@ -70,7 +72,12 @@ class ChainFactory():
             task_timeout=self.task_timeout,
         )
 
-    def task(self, name: str = "", repeat_on_timeout: bool = default_task_repeat_on_timeout):  # noqa: E501
+    def task(
+        self,
+        name: str = "",
+        repeat_on_timeout: bool = default_task_repeat_on_timeout,
+        executor: str = default_task_executor,
+    ):
         """
         Decorator to register a new task in the framework
 
@@ -78,6 +85,10 @@ class ChainFactory():
             - using the function name as the task name
             - using the function as the task handler,
               which will be wrapped internally in a TaskRunner class
+            - using the executor to run the task:
+              "thread" runs the task in a separate thread,
+              "async" runs an `async def` task directly on the event loop,
+              "process" runs the task in a worker process (cpu bound tasks)
         - also adds a special `.s` method to the function,
           which can be used to start the function as a task
           from inside another task (for chaining of tasks)
@@ -90,7 +101,7 @@ class ChainFactory():
                 temp_name = func.__name__
             # register the function
             # using the function name
-            self.task_queue_handlers.add_task(temp_name, func, repeat_on_timeout)  # noqa: E501
+            self.task_queue_handlers.add_task(temp_name, func, repeat_on_timeout, executor)  # noqa: E501
             return func
         return wrapper
 
@@ -98,14 +109,15 @@ class ChainFactory():
         self,
         func,
         name: str = "",
-        repeat_on_timeout: bool = default_task_repeat_on_timeout
+        repeat_on_timeout: bool = default_task_repeat_on_timeout,
+        executor: str = default_task_executor,
     ):
         """
         Method to add tasks, which cannot be added using the decorator
 
         - Calls the `task` decorator
         """
-        outer_wrapper = self.task(name, repeat_on_timeout)
+        outer_wrapper = self.task(name, repeat_on_timeout, executor)
         outer_wrapper(func)
 
     def add_error_context(self):
@@ -121,12 +133,13 @@ class ChainFactory():
             return func
         return wrapper
 
-    async def shutdown(self):
+    async def shutdown(self) -> DrainReport:
         """
-        Shuts down the framework
+        Shuts down the framework,
+        the running tasks are drained before (see DRAIN_TIMEOUT)
         """
         print("Shutting down the framework")
-        await self.task_queue_handlers.stop_node()
+        return await self.task_queue_handlers.stop_node()
 
     def add_error_handler(self, exc_type: Type[Exception], func: ErrorCallbackType):  # noqa: E501
         """
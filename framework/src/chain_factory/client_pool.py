@@ -13,7 +13,7 @@ from .models.mongodb_models import WorkflowStatus
 # wrapper
 from .wrapper.mongodb_client import MongoDBClient
 from .wrapper.redis_client import RedisClient
-from .wrapper.rabbitmq import RabbitMQ
+from .wrapper.rabbitmq import RabbitMQConnection
 
 
 class ClientPool():
@@ -22,7 +22,7 @@ class ClientPool():
     ):
         self.mongodb_client: Optional[MongoDBClient] = None
         self.redis_clients: Dict[str, RedisClient] = {}
-        self.rabbitmq_clients: Dict[str, RabbitMQ] = {}
+        self.rabbitmq_clients: Dict[str, RabbitMQConnection] = {}
         self.loop: Optional[AbstractEventLoop] = None
 
     async def init(
@@ -58,6 +58,24 @@ class ClientPool():
             self.redis_clients[redis_url] = await self._init_redis(redis_url, key_prefix)  # noqa: E501
         return self.redis_clients[redis_url]
 
+    async def rabbitmq_connection(
+        self,
+        rabbitmq_url: str,
+        loop: Optional[AbstractEventLoop] = None,
+    ) -> RabbitMQConnection:
+        """
+        return the connection specific to the given rabbitmq url,
+        shared by all consumers and publishers using the same url
+        if no connection exists, create and connect a new one
+        """
+        if not self.loop:
+            self.loop = loop
+        if rabbitmq_url not in self.rabbitmq_clients:
+            connection = RabbitMQConnection(rabbitmq_url, loop=self.loop)
+            await connection.connect()
+            self.rabbitmq_clients[rabbitmq_url] = connection
+        return self.rabbitmq_clients[rabbitmq_url]
+
     async def _init_mongodb(self, mongodb_url: str) -> MongoDBClient:
         """
         returns a new mongodb client object
@@ -119,7 +137,7 @@ class ClientPool():
                 await redis_client.close()
         if self.mongodb_client:
             await self.mongodb_client.close()
-        for rabbitmq_client in self.rabbitmq_clients.values():
-            rabbitmq_client.stop_callback()
-            if rabbitmq_client:
-                await rabbitmq_client.close()
+        for rabbitmq_connection in self.rabbitmq_clients.values():
+            if rabbitmq_connection:
+                await rabbitmq_connection.close()
+        self.rabbitmq_clients = {}
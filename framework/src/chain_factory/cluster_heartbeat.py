@@ -2,15 +2,22 @@ from _thread import interrupt_main
 from datetime import datetime
 from asyncio import sleep
 from asyncio import AbstractEventLoop
+from logging import exception
+from typing import Awaitable
+from typing import Callable
+from typing import Optional
 
 # direct imports
 from .client_pool import ClientPool
+from .worker_slots import WorkerSlots
 
 # models
 from .models.redis_models import Heartbeat
 
 # wrapper
 from .wrapper.redis_client import RedisClient
+from .wrapper.message_compression import published_sizes
+from .wrapper.message_compression import compressed_sizes
 
 # settings
 from .common.settings import heartbeat_redis_key
@@ -23,9 +30,14 @@ class ClusterHeartbeat():
         namespace: str,
         node_name: str,
         client_pool: ClientPool,
-        loop: AbstractEventLoop
+        loop: AbstractEventLoop,
+        worker_slots: Optional[WorkerSlots] = None,
+        on_heartbeat: Optional[Callable[[], Awaitable[None]]] = None,
     ):
         self._client_pool = client_pool
+        self._worker_slots = worker_slots
+        # called after each heartbeat, when the node is seen as alive
+        self._on_heartbeat = on_heartbeat
         self.node_name = node_name
         self.namespace = namespace
         self.heartbeat_running = False
@@ -60,6 +72,12 @@ class ClusterHeartbeat():
             namespace=self.namespace,
             last_time_seen=self._current_timestamp()
         )
+        if self._worker_slots is not None:
+            # report the current worker slot usage
+            heartbeat.worker_count = self._worker_slots.worker_count
+            heartbeat.running_tasks = self._worker_slots.in_use
+        heartbeat.message_sizes = published_sizes.snapshot()
+        heartbeat.compressed_message_sizes = compressed_sizes.snapshot()
         return heartbeat.json()
 
     async def _set_heartbeat(self, redis_client: RedisClient):
@@ -84,4 +102,9 @@ class ClusterHeartbeat():
         redis_client = await self._client_pool.redis_client()
         while self.heartbeat_running:
             await self._set_heartbeat(redis_client)
+            if self._on_heartbeat is not None:
+                try:
+                    await self._on_heartbeat()
+                except Exception as e:
+                    exception(e)
             await sleep(heartbeat_sleep_time)
@@ -4,20 +4,157 @@ wait_time ==>       Time to wait after a task has been
 prefetch_count ==>  Global setting to control the QoS in the amqp library,
                     it specifies how many messages whould be prefetched
                     from the server.
-worker_count ==>    Amount of worker threads to spawn.
+worker_count ==>    Amount of tasks, which are executed concurrently on a node.
+                    The consumer prefetch count will be raised
+                    to match the worker count.
                     Later there can be configured spcific blocklists
                     of functions to only run e.g. on nodes,
                     which have more threads for smaller tasks
 """
+from os import cpu_count
 from os import getenv
 
 
+def getenv_bool(name: str, default: bool) -> bool:
+    """
+    the flag is set by 1/true/yes, any other value unsets it
+    """
+    value = getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes")
+
+
 # seconds to wait between each queue fetch
 wait_time = int(getenv("WAIT_TIME", 60))
 # how many tasks should be prefetched by amqp library
 prefetch_count = int(getenv("PREFETCH_COUNT", 1))
-# number of threads to listen on the queue
+# maximum number of channels the publishers of a node are sharing
+amqp_channel_pool_size = int(getenv("AMQP_CHANNEL_POOL_SIZE", 8))
+# maximum number of messages published without waiting for the
+# confirmations of the broker
+publish_batch_size = int(getenv("PUBLISH_BATCH_SIZE", 500))
+# seconds to collect single messages to publish them as one batch,
+# 0 publishes every message directly
+publish_batch_window = float(getenv("PUBLISH_BATCH_WINDOW", 0))
+# seconds a handled message waits for its ack, the acks of the messages
+# handled meanwhile are sent together as one ack (multiple=True),
+# a message is redelivered, if the node stops before it has been acked,
+# 0 acks every message directly
+ack_batch_interval = float(getenv("ACK_BATCH_INTERVAL", 0))
+# maximum amount of pending acks, limited by the prefetch count
+ack_batch_size = int(getenv("ACK_BATCH_SIZE", 100))
+# the messages, which could not be published, because the connection
+# to the broker is lost, are kept in an outbox and published in order,
+# when the connection is back
+# maximum amount of messages in the outbox in memory,
+# the tasks publishing more messages wait for the outbox
+outbox_max_size = int(getenv("OUTBOX_MAX_SIZE", 10000))
+# path of a sqlite database, which holds the outbox instead of the memory,
+# the messages are published after a restart of the node
+outbox_path = getenv("OUTBOX_PATH", "")
+# seconds between two attempts to publish the messages of the outbox
+outbox_retry_interval = float(getenv("OUTBOX_RETRY_INTERVAL", 1))
+# seconds to wait for the outbox to be published, when the node stops
+outbox_close_timeout = float(getenv("OUTBOX_CLOSE_TIMEOUT", 5))
+# publish the tasks to a queue per task name, which is only consumed
+# by the nodes having registered the task, instead of the shared task queue,
+# tasks no node has registered are still published to the task queue
+task_routing = getenv_bool("TASK_ROUTING", False)
+# declare the task queues as priority queues with priorities 0 to
+# task_max_priority, the tasks with a higher priority are delivered first,
+# an existing queue has to be deleted, when this option is changed,
+# 0 declares normal (FIFO) queues
+task_max_priority = int(getenv("TASK_MAX_PRIORITY", 0))
+# serializer of the tasks published by the nodes
+# json    => json, encoded with orjson, if it is installed
+# msgpack => msgpack, needs the msgpack package on all nodes
+# the nodes decode the tasks by the content type of the message,
+# so nodes with different codecs can share a queue
+task_codec = getenv("TASK_CODEC", "json")
+# decode the tasks published by the nodes without validating them again,
+# the tasks are signed (hmac sha256) with trusted_tasks_key,
+# the tasks sent by the api and by external clients are always validated
+trust_internal_tasks = getenv_bool("TRUST_INTERNAL_TASKS", True)
+# key signing the trusted tasks, has to be the same on all nodes
+# to trust the tasks of the other nodes, keep it secret,
+# if empty, every node uses a random key and only trusts its own tasks
+trusted_tasks_key = getenv("TRUSTED_TASKS_KEY", "")
+# arguments of a task larger than this many bytes (json encoded)
+# are stored once in GridFS and only referenced in the task (claim check),
+# they are loaded on the node running the task,
+# 0 keeps all arguments in the task
+claim_check_threshold = int(getenv("CLAIM_CHECK_THRESHOLD", 0))
+# GridFS bucket of the offloaded arguments
+claim_check_bucket = getenv("CLAIM_CHECK_BUCKET", "task_arguments")
+# compression of the message bodies larger than
+# message_compression_threshold bytes
+# ""   => no compression
+# gzip => gzip
+# zstd => zstd, needs the zstandard package
+# all nodes decompress the messages by their content encoding,
+# enable it after all nodes have been updated
+message_compression = getenv("MESSAGE_COMPRESSION", "")
+message_compression_threshold = int(getenv("MESSAGE_COMPRESSION_THRESHOLD", 4096))  # noqa: E501
+# number of tasks, which can run concurrently on a node
 worker_count = int(getenv("WORKER_COUNT", 1))
+# run the tasks on a pool of worker_count long-lived threads,
+# instead of starting a new thread and event loop for every task
+task_thread_pool = getenv_bool("TASK_THREAD_POOL", False)
+# default executor of the tasks, can be overridden per task
+# thread  => run the task in a separate thread with its own event loop
+# async   => run `async def` tasks as asyncio.Task on the node event loop
+# process => run the task in a pool of worker processes (cpu bound tasks)
+task_executor = getenv("TASK_EXECUTOR", "thread")
+# number of worker processes for tasks using the process executor
+task_process_count = int(getenv("TASK_PROCESS_COUNT", cpu_count() or 1))
+# multiprocessing start method of the worker processes
+task_process_start_method = getenv("TASK_PROCESS_START_METHOD", "spawn")
+# seconds to wait for a terminated worker process to exit, until it is killed
+task_process_terminate_timeout = int(getenv("TASK_PROCESS_TERMINATE_TIMEOUT", 5))  # noqa: E501
+# seconds to wait for the running tasks to finish, when the node shuts down,
+# the tasks still running after that are stopped and requeued
+drain_timeout = int(getenv("DRAIN_TIMEOUT", 60))
+# publish the next task of a workflow before the task and workflow status
+# have been saved, the status writes are saved in the background
+# in the order they occured and are flushed, when the node shuts down
+write_behind_status = getenv_bool("WRITE_BEHIND_STATUS", False)
+# path of a sqlite database keeping the pending status writes,
+# so they are saved after a crash or a restart of the node,
+# if empty, the pending status writes are only kept in memory
+write_behind_path = getenv("WRITE_BEHIND_PATH", "")
+# run the next task of a workflow directly on this node,
+# if it is registered, not blocked and allowed to run on this node,
+# instead of sending it through the task queue,
+# at most local_chain_max_depth tasks in a row (0 disables it)
+local_chain_max_depth = int(getenv("LOCAL_CHAIN_MAX_DEPTH", 0))
+# redis key of the sorted set holding the planned tasks until they are due
+planned_tasks_redis_key = getenv("PLANNED_TASKS_REDIS_KEY", "planned_tasks")
+# maximum seconds between two checks for due planned tasks
+delay_scheduler_interval = float(getenv("DELAY_SCHEDULER_INTERVAL", 1))
+# park the tasks, which no alive node has registered, in redis,
+# instead of rejecting them between the task queue and the wait queue,
+# they are released, when a node, which can run them, is up
+park_tasks = getenv_bool("PARK_TASKS", False)
+# redis key of the sorted set holding the parked tasks
+parked_tasks_redis_key = getenv("PARKED_TASKS_REDIS_KEY", "parked_tasks")
+# seconds between two releases of the parked tasks by a node,
+# the first release happens with the first heartbeat of the node
+parked_tasks_release_interval = float(getenv("PARKED_TASKS_RELEASE_INTERVAL", 10))  # noqa: E501
+# seconds a failed task waits, before it is retried,
+# the n-th retry waits in the n-th tier, later retries in the last tier,
+# e.g. "1,5,30,300,1800",
+# if empty, the failed tasks wait max_task_age_wait_queue seconds
+retry_tiers = [float(tier) for tier in getenv("RETRY_TIERS", "").split(",") if tier.strip()]  # noqa: E501
+# maximum number of retries of a task, until its workflow is stopped,
+# 0 retries the task forever
+retry_max_attempts = int(getenv("RETRY_MAX_ATTEMPTS", 0))
+# the wait time of a retry is randomly varied by up to this fraction,
+# so that the tasks failed at the same time are not retried at the same time
+retry_jitter = float(getenv("RETRY_JITTER", 0.2))
+# number of queues per tier with wait times spread over the jitter,
+# a retry is sent to a random one of them
+retry_jitter_queues = int(getenv("RETRY_JITTER_QUEUES", 3))
 # when should a waiting task be put back to the main/task queue (in seconds)
 max_task_age_wait_queue: int = int(getenv("MAX_TASK_AGE_WAIT_QUEUE", 60))
 # if sticky_tasks option is set,
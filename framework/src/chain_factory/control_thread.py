@@ -4,8 +4,7 @@ from typing import Union
 from logging import exception
 from logging import debug
 from asyncio import AbstractEventLoop
-# , run as run_asyncio
-from time import sleep
+from asyncio import sleep
 from traceback import print_exc
 from sys import stdout
 
@@ -59,7 +58,8 @@ class ControlThread():
                 if msg is not None:
                     if await self._control_task_thread_handle_channel(msg):
                         break
-                sleep(0.1)
+                # wait without blocking the event loop
+                await sleep(0.1)
             await self.redis_client.unsubscribe(self.control_channel)
         except ThreadAbortException:
             debug("ControlThread::run_async() ThreadAbortException")
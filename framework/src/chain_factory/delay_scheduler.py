@@ -0,0 +1,131 @@
+from asyncio import AbstractEventLoop
+from asyncio import Event
+from asyncio import Task as AsyncTask
+from asyncio import TimeoutError as AsyncTimeoutError
+from asyncio import gather
+from asyncio import wait_for
+from datetime import datetime
+from datetime import timezone
+from logging import debug
+from logging import exception
+from time import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Optional
+
+# wrapper
+from .wrapper.redis_client import RedisClient
+
+# settings
+from .common.settings import planned_tasks_redis_key
+from .common.settings import delay_scheduler_interval
+
+# models
+from .models.mongodb_models import Task
+
+SendType = Callable[[Task], Awaitable[Any]]
+
+
+class DelayScheduler():
+    """
+    Holds the planned tasks in a redis sorted set,
+    scored by their planned date, until they are due
+    and sends them to the task queue again
+    Every node runs the scheduler, a due task is claimed
+    by removing it from the sorted set, so that only one node sends it
+    """
+
+    def __init__(
+        self,
+        redis_client: RedisClient,
+        send: SendType,
+        interval: float = delay_scheduler_interval,
+        batch_size: int = 100,
+    ):
+        self.redis_client = redis_client
+        self._send = send
+        self.interval = interval
+        self.batch_size = max(batch_size, 1)
+        self._wakeup: Optional[Event] = None
+        self._worker: Optional[AsyncTask] = None
+
+    @staticmethod
+    def _score(planned_date: datetime) -> float:
+        """
+        the planned dates are naive utc dates
+        """
+        return planned_date.replace(tzinfo=timezone.utc).timestamp()
+
+    async def schedule(self, task: Task):
+        """
+        Holds the task until its planned date
+        """
+        score = self._score(task.planned_date)
+        await self.redis_client.zadd(planned_tasks_redis_key, {task.json(): score})  # noqa: E501
+        debug(f"planned task {task.name} for {task.planned_date}")
+        if self._wakeup is not None:
+            # the task could be due before the next check
+            self._wakeup.set()
+
+    def start(self, loop: AbstractEventLoop):
+        self._wakeup = Event()
+        self._worker = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await gather(self._worker, return_exceptions=True)
+            self._worker = None
+
+    async def _run(self):
+        while True:
+            try:
+                sleep_time = await self.release_due()
+            except Exception as e:
+                exception(e)
+                sleep_time = self.interval
+            await self._sleep(sleep_time)
+
+    async def _sleep(self, sleep_time: float):
+        if self._wakeup is None:
+            return
+        try:
+            await wait_for(self._wakeup.wait(), sleep_time)
+        except AsyncTimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def release_due(self) -> float:
+        """
+        Sends the tasks, which are due,
+        returns the seconds until the next task is due
+        """
+        now = time()
+        due = await self.redis_client.zrangebyscore(planned_tasks_redis_key, "-inf", now, start=0, num=self.batch_size)  # noqa: E501
+        for member in due:
+            if await self.redis_client.zrem(planned_tasks_redis_key, member) != 1:  # noqa: E501
+                # claimed by another node
+                continue
+            await self._release(member, now)
+        if len(due) >= self.batch_size:
+            # there are more tasks due
+            return 0
+        upcoming = await self.redis_client.zrange(planned_tasks_redis_key, 0, 0, withscores=True)  # noqa: E501
+        if not upcoming:
+            return self.interval
+        return min(max(upcoming[0][1] - time(), 0), self.interval)
+
+    async def _release(self, member: Any, now: float):
+        try:
+            task = Task.parse_raw(member)
+        except Exception as e:
+            exception(e)
+            return
+        try:
+            debug(f"planned task {task.name} is due")
+            await self._send(task)
+        except Exception as e:
+            exception(e)
+            # try it again with the next check
+            await self.redis_client.zadd(planned_tasks_redis_key, {member: now})  # noqa: E501
@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+
+
+class DrainReport(BaseModel):
+    """
+    What happened, while the node has been drained before shutting down
+    """
+    # messages, which have been handled completely during the drain
+    completed: int = 0
+    # messages, which have been given back to the broker
+    requeued: int = 0
+    # tasks, which were still running after the deadline and were stopped
+    stopped: int = 0
+    # log lines, which could not be saved before the deadline
+    pending_log_writes: int = 0
+    # task/workflow status writes, which could not be saved before the deadline
+    pending_status_writes: int = 0
+    # True, if the deadline expired before all messages were handled
+    timed_out: bool = False
+    # seconds the drain took
+    duration: float = 0.0
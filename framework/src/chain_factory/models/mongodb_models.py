@@ -122,6 +122,13 @@ class Task(EmbeddedModel):
     tags: Optional[List[str]] = []
     # not required, should be omitted, when starting a new task
     reject_counter: int = Field(default=0)
+    # not required, number of times the task has been retried
+    # selects the retry tier, the task waits in
+    retry_counter: int = Field(default=0)
+    # tasks with a higher priority are delivered first,
+    # if the task queue is a priority queue (task_max_priority),
+    # a message priority is an octet
+    priority: int = Field(default=0, ge=0, le=255)
     # planned date for timed tasks, can be ommited (optional)
     planned_date: datetime = Field(default_factory=datetime.utcnow)
 
@@ -162,6 +169,9 @@ class Task(EmbeddedModel):
     def check_rejected(self):
         return self.reject_counter > reject_limit
 
+    def increase_retried(self):
+        self.retry_counter = self.retry_counter + 1
+
     def check_node_filter(self, node_name: str):
         return (
             len(self.node_names) > 0 and
@@ -181,6 +191,7 @@ class Task(EmbeddedModel):
         self.parent_task_id = other_task.task_id
         self.workflow_id = other_task.workflow_id
         self.node_names = other_task.node_names
+        self.priority = other_task.priority
 
     def has_parent_task(self):
         return len(self.parent_task_id) > 0
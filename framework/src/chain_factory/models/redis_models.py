@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Dict
 from pydantic import BaseModel
 from pydantic import Field
 
@@ -7,6 +8,13 @@ class Heartbeat(BaseModel):
     node_name: str
     namespace: str
     last_time_seen: datetime = Field(default_factory=datetime.utcnow)
+    # worker slots of the node and how many of them are currently in use
+    worker_count: int = 1
+    running_tasks: int = 0
+    # histograms of the message bodies published by the node,
+    # before and after compression (bucket upper bound in bytes => count)
+    message_sizes: Dict[str, int] = {}
+    compressed_message_sizes: Dict[str, int] = {}
 
 
 class TaskControlMessage(BaseModel):
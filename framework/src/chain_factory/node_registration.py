@@ -108,3 +108,6 @@ class NodeRegistration():
 
     async def register(self):
         await self.register_tasks()
+        # receive only the tasks registered on this node (task routing)
+        await self.task_handler.bind_task_queues(list(self.task_handler.registered_tasks))  # noqa: E501
+        await self.task_handler.bind_node_queue(self.node_name)
@@ -0,0 +1,66 @@
+from datetime import datetime
+from random import shuffle
+from time import monotonic
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# wrapper
+from .wrapper.redis_client import RedisClient
+
+# settings
+from .common.settings import heartbeat_redis_key
+from .common.settings import heartbeat_sleep_time
+
+# models
+from .models.redis_models import Heartbeat
+
+
+class NodeSelector():
+    """
+    Selects the node a task with node_names is sent to directly,
+    among the nodes, which have updated their heartbeat recently
+    The state of a node is cached for one heartbeat interval,
+    so that sending many tasks does not query redis for every task
+    """
+
+    def __init__(
+        self,
+        redis_client: RedisClient,
+        max_heartbeat_age: float = heartbeat_sleep_time * 30,
+        cache_time: float = heartbeat_sleep_time,
+    ):
+        self.redis_client = redis_client
+        self.max_heartbeat_age = max_heartbeat_age
+        self.cache_time = cache_time
+        # node_name -> (time of the lookup, node is alive)
+        self._alive: Dict[str, Tuple[float, bool]] = {}
+
+    async def select(self, node_names: List[str]) -> Optional[str]:
+        """
+        Returns one of the alive nodes in a random order,
+        None, if none of the nodes is alive
+        """
+        candidates = list(node_names)
+        shuffle(candidates)
+        for node_name in candidates:
+            if await self.alive(node_name):
+                return node_name
+        return None
+
+    async def alive(self, node_name: str) -> bool:
+        cached = self._alive.get(node_name)
+        if cached is not None and monotonic() - cached[0] < self.cache_time:
+            return cached[1]
+        alive = await self._heartbeat_alive(node_name)
+        self._alive[node_name] = (monotonic(), alive)
+        return alive
+
+    async def _heartbeat_alive(self, node_name: str) -> bool:
+        heartbeat_json = await self.redis_client.get(heartbeat_redis_key + "_" + node_name)  # noqa: E501
+        if not heartbeat_json:
+            return False
+        heartbeat = Heartbeat.parse_raw(heartbeat_json)
+        age = datetime.utcnow() - heartbeat.last_time_seen
+        return age.total_seconds() <= self.max_heartbeat_age
@@ -1,21 +1,42 @@
 from abc import abstractmethod
 from asyncio import AbstractEventLoop
+from asyncio import Task as AsyncTask
+from asyncio import current_task
+from asyncio import gather
 from datetime import datetime
 from logging import error
 from logging import debug
+from logging import info
 from traceback import print_exc
 from sys import exit
 from sys import stderr
+from typing import Dict
+from typing import List
+from typing import Optional
 from typing import Union
+from time import monotonic
 from aio_pika.exceptions import AMQPConnectionError
 
+# direct imports
+from .worker_slots import WorkerSlots
+from .drain_report import DrainReport
+from .task_codec import decode_task
+from .task_codec import encode_task
+
 # decorators
 from .decorators.parse_catcher import parse_catcher
 
 # wrapper
 from .wrapper.rabbitmq import RabbitMQ
 from .wrapper.rabbitmq import Message
+from .wrapper.rabbitmq import RabbitMQConnection
 from .wrapper.rabbitmq import getConsumer
+from .wrapper.rabbitmq import priority_queue_options
+
+# settings
+from .common.settings import prefetch_count
+from .common.settings import task_routing
+from .common.settings import task_max_priority
 
 # models
 from .models.mongodb_models import Task
@@ -28,13 +49,27 @@ class QueueHandler:
     """
     def __init__(self):
         self.rabbitmq: Union[RabbitMQ, None] = None
+        self.worker_slots: Union[WorkerSlots, None] = None
+        # set, when the node is shutting down
+        self._draining = False
+        # the messages, which are waiting for a free worker slot
+        self._waiting_for_slot: Dict[AsyncTask, Message] = {}
 
-    async def init(self, url: str, queue_name: str, loop: AbstractEventLoop):
+    async def init(
+        self,
+        url: str,
+        queue_name: str,
+        loop: AbstractEventLoop,
+        worker_count: int = 1,
+        rabbitmq_connection: Optional[RabbitMQConnection] = None,
+    ):
         """
         Separate init logic to be able to use lazy initialisation
         """
         self.queue_name = queue_name
-        await self._connect(url=url, loop=loop)
+        # the slots are limiting the amount of concurrently handled messages
+        self.worker_slots = WorkerSlots(worker_count)
+        await self._connect(url=url, loop=loop, connection=rabbitmq_connection)  # noqa: E501
 
     def stop_listening(self):
         if self.rabbitmq:
@@ -45,12 +80,16 @@ class QueueHandler:
             print("Closing queue handler")
             await self.rabbitmq.close()
 
-    async def _connect(self, url: str, loop: AbstractEventLoop):
+    async def _connect(self, url: str, loop: AbstractEventLoop, connection: Optional[RabbitMQConnection] = None):  # noqa: E501
         """
-        Connects to rabbitmq
+        Connects to rabbitmq,
+        using the shared connection, if one is given
         """
         try:
-            self.rabbitmq = getConsumer(rabbitmq_url=url, queue_name=self.queue_name, callback=self._on_message, loop=loop)  # noqa: E501
+            # prefetch as many messages as there are worker slots
+            worker_count = self.worker_slots.worker_count if self.worker_slots else 1  # noqa: E501
+            consumer_prefetch_count = max(prefetch_count, worker_count)
+            self.rabbitmq = getConsumer(rabbitmq_url=url, queue_name=self.queue_name, callback=self._on_message, loop=loop, prefetch_count=consumer_prefetch_count, connection=connection, task_routing=task_routing, queue_options=priority_queue_options(task_max_priority))  # noqa: E501
             await self.rabbitmq.init()
         except AMQPConnectionError:
             print_exc(file=stderr)
@@ -78,14 +117,57 @@ class QueueHandler:
         return datetime.utcnow()
 
     @staticmethod
-    async def send_to_queue(task: Task, rabbitmq: Union[RabbitMQ, None]):
+    async def send_to_queue(task: Task, rabbitmq: Union[RabbitMQ, None], node_name: Optional[str] = None):  # noqa: E501
         """
-        Send a task to the specified queue
+        Send a task to the specified queue,
+        or directly to the given node (task routing)
         """
         task.received_date = QueueHandler._now()
         if rabbitmq is None:
             raise ValueError("RabbitMQ is not initialized")
-        return await rabbitmq.send(message=task.json())
+        encoded = encode_task(task)
+        return await rabbitmq.send(message=encoded.body, routing_key=task.name, node_name=node_name, priority=task.priority, content_type=encoded.content_type, headers=encoded.headers)  # noqa: E501
+
+    async def _target_node(self, task: Task) -> Optional[str]:
+        """
+        Returns the node, the task should be sent to directly,
+        None sends the task to any node, which can run it
+        """
+        return None
+
+    @staticmethod
+    async def send_many_to_queue(tasks: List[Task], rabbitmq: Union[RabbitMQ, None]) -> List[bool]:  # noqa: E501
+        """
+        Send the tasks to the specified queue,
+        returns for every task, if it has been published
+        """
+        if rabbitmq is None:
+            raise ValueError("RabbitMQ is not initialized")
+        received_date = QueueHandler._now()
+        for task in tasks:
+            task.received_date = received_date
+        encoded = [encode_task(task) for task in tasks]
+        if not encoded:
+            return []
+        return await rabbitmq.send_many([task.body for task in encoded], [task.name for task in tasks], priorities=[task.priority for task in tasks], content_type=encoded[0].content_type, headers=encoded[0].headers)  # noqa: E501
+
+    async def bind_task_queues(self, task_names: List[str]):
+        """
+        Binds the queues of the given tasks,
+        so that the tasks are only delivered to nodes, which can run them
+        """
+        if self.rabbitmq is None:
+            raise ValueError("RabbitMQ is not initialized")
+        await self.rabbitmq.bind_task_queues(task_names)
+
+    async def bind_node_queue(self, node_name: str):
+        """
+        Binds the queue of the node,
+        to receive the tasks sent directly to the node
+        """
+        if self.rabbitmq is None:
+            raise ValueError("RabbitMQ is not initialized")
+        await self.rabbitmq.bind_node_queue(node_name)
 
     async def ack(self, message: Message):
         """
@@ -93,6 +175,10 @@ class QueueHandler:
         """
         if self.rabbitmq is None:
             raise ValueError("RabbitMQ is not initialized")
+        if message.processed:
+            # e.g. the tasks of a local chain share the message of the first
+            debug("message has already been acknowledged")
+            return
         await self.rabbitmq.ack(message=message)
 
     async def nack(self, message: Message):
@@ -125,11 +211,77 @@ class QueueHandler:
         method will be invoked by the amqp library, when a new message comes in
         """
         debug("callback_impl in queue_handler called")
-        # parse the message body to Task
-        task = self._parse_json(body=message.body)
-        task_json = task.json() if task is not None else "None"
-        debug(f"task: {task_json}")
-        return await self._on_message_check_task(task, message)
+        # decode the message body to Task
+        task = self._decode_task(message)
+        debug(f"task: {task}")
+        if self._draining:
+            return await self._requeue(message)
+        if self.worker_slots is None:
+            return await self._on_message_check_task(task, message)
+        # wait for a free worker slot,
+        # if worker_count tasks are already running
+        waiting = current_task()
+        self._waiting_for_slot[waiting] = message
+        try:
+            await self.worker_slots.acquire()
+        finally:
+            self._waiting_for_slot.pop(waiting, None)
+        try:
+            return await self._on_message_check_task(task, message)
+        finally:
+            self.worker_slots.release()
+
+    async def _requeue(self, message: Message) -> str:
+        debug("node is draining, requeueing message")
+        await self.nack(message)
+        return ""
+
+    async def drain(self, timeout: float) -> DrainReport:
+        """
+        Stops consuming and waits up to timeout seconds
+        for the messages in flight to be handled,
+        the messages still in flight after the timeout are requeued
+        and their tasks are stopped
+        """
+        started = monotonic()
+        report = DrainReport()
+        self._draining = True
+        if self.rabbitmq is None:
+            return report
+        await self.rabbitmq.stop_consuming()
+        # the messages waiting for a worker slot are not started anymore
+        report.requeued = await self._requeue_waiting_for_slot()
+        in_flight = len(self.rabbitmq.in_flight())
+        info(f"draining node, waiting for {in_flight} messages in flight")
+        report.timed_out = not await self.rabbitmq.wait_in_flight(timeout)
+        leftover = self.rabbitmq.in_flight()
+        for message in leftover:
+            if not message.processed:
+                await self.nack(message)
+                report.requeued = report.requeued + 1
+        # send the deferred acks of the completed messages
+        self.rabbitmq.flush_acks()
+        if leftover:
+            report.stopped = self._stop_running_tasks()
+            await self.rabbitmq.cancel_in_flight()
+        report.completed = in_flight - len(leftover)
+        report.duration = monotonic() - started
+        return report
+
+    async def _requeue_waiting_for_slot(self) -> int:
+        waiting = dict(self._waiting_for_slot)
+        for task, message in waiting.items():
+            await self.nack(message)
+            task.cancel()
+        await gather(*waiting.keys(), return_exceptions=True)
+        return len(waiting)
+
+    def _stop_running_tasks(self) -> int:
+        """
+        Stops the tasks, which are still running after the drain timeout,
+        returns the amount of stopped tasks
+        """
+        return 0
 
     async def _on_message_check_task(self, task: Union[Task, None], message: Message):  # noqa: E501
         if task is not None and len(task.name) > 0:
@@ -139,9 +291,15 @@ class QueueHandler:
 
     @staticmethod
     @parse_catcher((AttributeError, TypeError, Exception))
-    def _parse_json(body: str) -> Union[None, Task]:
+    def _decode_task(message: Message) -> Union[None, Task]:
+        """
+        decodes the task with the codec of the content type of the message,
+        the body has already been decompressed
+        """
+        incoming_message = message.message
+        body = message.body
         if len(body) > 0:
-            return Task.parse_raw(body)
+            return decode_task(body, incoming_message.content_type, incoming_message.headers)  # noqa: E501
         else:
             return None
 
@@ -153,19 +311,12 @@ class QueueHandler:
         """
         debug("on_task will be called")
         result = await self.on_task(task, message)
-        return self._on_task_check_task_result(result)
-
-    def _on_task_check_task_result(self, result: Union[Task, None]):
-        if result is None:
-            return self._on_none_task_result()
-        else:
-            return self._on_task_result(result)
-
-    def _on_task_result(self, result: Task):
-        result_json = result.json()
-        debug(f"result: {result_json}")
-        # return the result as json to the queue
-        return result_json
+        if result is not None:
+            debug(f"result: {result}")
+            # the next task is encoded with the task codec
+            # and, with task routing, routed to the nodes, which can run it
+            await self.send_to_queue(result, self.rabbitmq, await self._target_node(result))  # noqa: E501
+        return self._on_none_task_result()
 
     def _on_none_task_result(self):
         debug("result: None")
@@ -0,0 +1,121 @@
+from asyncio import AbstractEventLoop
+from random import choice
+from typing import List
+from typing import Optional
+
+# direct imports
+from .task_codec import encode_task
+
+# wrapper
+from .wrapper.rabbitmq import RabbitMQ
+from .wrapper.rabbitmq import RabbitMQConnection
+from .wrapper.rabbitmq import getPublisher
+
+# settings
+from .common.settings import retry_tiers
+from .common.settings import retry_max_attempts
+from .common.settings import retry_jitter
+from .common.settings import retry_jitter_queues
+
+# models
+from .models.mongodb_models import Task
+
+
+class RetryTiers():
+    """
+    The wait queues of the failed tasks, one queue per wait time,
+    which dead letters the tasks back to the task queue, when they expire
+    The tier is selected by the retry counter of the task,
+    so that the wait time grows with every retry
+    Every tier has jitter_queues queues with wait times spread
+    over the jitter, the wait time is a queue ttl, because the broker
+    only expires the messages at the head of a queue
+    """
+
+    def __init__(
+        self,
+        delays: List[float] = retry_tiers,
+        max_attempts: int = retry_max_attempts,
+        jitter: float = retry_jitter,
+        jitter_queues: int = retry_jitter_queues,
+    ):
+        self.delays = delays
+        self.max_attempts = max_attempts
+        self.jitter = jitter
+        self.jitter_queues = max(jitter_queues, 1)
+        # the publishers of the jitter queues of every tier
+        self._publishers: List[List[RabbitMQ]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.delays) > 0
+
+    async def init(
+        self,
+        url: str,
+        wait_queue_name: str,
+        queue_name: str,
+        loop: AbstractEventLoop,
+        connection: Optional[RabbitMQConnection] = None,
+    ):
+        """
+        Declares the queues of every tier, e.g. dlx.iw_queue.4.5s
+        """
+        for delay in self.delays:
+            publishers: List[RabbitMQ] = []
+            for queue_delay in self.queue_delays(delay):
+                publisher = getPublisher(
+                    rabbitmq_url=url,
+                    queue_name=f"dlx.{wait_queue_name}.{queue_delay:g}s",
+                    loop=loop,
+                    connection=connection,
+                    queue_options={
+                        # dead letter the expired messages to the task queue
+                        "x-dead-letter-exchange": queue_name,
+                        "x-dead-letter-routing-key": queue_name,
+                        "x-message-ttl": int(queue_delay * 1000),
+                    }
+                )
+                await publisher.init()
+                publishers.append(publisher)
+            self._publishers.append(publishers)
+
+    def queue_delays(self, delay: float) -> List[float]:
+        """
+        wait times of the queues of a tier,
+        spread evenly from delay * (1 - jitter) to delay * (1 + jitter)
+        """
+        if self.jitter <= 0 or self.jitter_queues == 1:
+            return [delay]
+        steps = self.jitter_queues - 1
+        return [
+            round(delay * (1 - self.jitter + 2 * self.jitter * step / steps), 3)  # noqa: E501
+            for step in range(0, self.jitter_queues)
+        ]
+
+    def tier(self, task: Task) -> int:
+        """
+        index of the tier for the next retry of the task
+        """
+        return min(max(task.retry_counter, 1), len(self.delays)) - 1
+
+    def exhausted(self, task: Task) -> bool:
+        """
+        the task has been retried max_attempts times
+        """
+        return self.max_attempts > 0 and task.retry_counter > self.max_attempts  # noqa: E501
+
+    async def send(self, task: Task):
+        """
+        Sends the task to a random queue of its tier,
+        the retry counter has to be increased before
+        """
+        publisher = choice(self._publishers[self.tier(task)])
+        encoded = encode_task(task)
+        await publisher.send(encoded.body, priority=task.priority, content_type=encoded.content_type, headers=encoded.headers)  # noqa: E501
+
+    async def close(self):
+        for publishers in self._publishers:
+            for publisher in publishers:
+                await publisher.close()
+        self._publishers = []
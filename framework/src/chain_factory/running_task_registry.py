@@ -0,0 +1,91 @@
+from threading import Lock
+from typing import Dict
+from typing import List
+from typing import Optional
+
+# direct imports
+from .task_execution import TaskExecution
+
+
+class _Stripe():
+    """
+    A part of the registry with its own lock
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        # task_id -> task execution
+        self.tasks: Dict[str, TaskExecution] = {}
+        # workflow_id -> task_id -> task execution
+        self.workflows: Dict[str, Dict[str, TaskExecution]] = {}
+
+
+class RunningTaskRegistry():
+    """
+    The tasks, which are currently running on the node,
+    keyed by task id and indexed by workflow id,
+    so that several tasks of the same workflow (e.g. scheduled using .s())
+    can run at the same time
+    The entries are spread over several stripes with their own lock,
+    so that adding/removing tasks does not contend on a single lock
+    """
+
+    def __init__(self, stripe_count: int = 16):
+        self._stripes = [_Stripe() for _ in range(0, max(stripe_count, 1))]
+
+    def _stripe(self, key: str) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def add(self, task_id: str, workflow_id: str, task_execution: TaskExecution):  # noqa: E501
+        task_stripe = self._stripe(task_id)
+        with task_stripe.lock:
+            task_stripe.tasks[task_id] = task_execution
+        workflow_stripe = self._stripe(workflow_id)
+        with workflow_stripe.lock:
+            workflow_stripe.workflows.setdefault(workflow_id, {})[task_id] = task_execution  # noqa: E501
+
+    def remove(self, task_id: str, workflow_id: str) -> Optional[TaskExecution]:  # noqa: E501
+        task_stripe = self._stripe(task_id)
+        with task_stripe.lock:
+            task_execution = task_stripe.tasks.pop(task_id, None)
+        workflow_stripe = self._stripe(workflow_id)
+        with workflow_stripe.lock:
+            workflow_tasks = workflow_stripe.workflows.get(workflow_id)
+            if workflow_tasks is not None:
+                workflow_tasks.pop(task_id, None)
+                if not workflow_tasks:
+                    del workflow_stripe.workflows[workflow_id]
+        return task_execution
+
+    def get(self, task_id: str) -> Optional[TaskExecution]:
+        task_stripe = self._stripe(task_id)
+        with task_stripe.lock:
+            return task_stripe.tasks.get(task_id)
+
+    def by_workflow(self, workflow_id: str) -> List[TaskExecution]:
+        """
+        Returns all running tasks of the workflow
+        """
+        workflow_stripe = self._stripe(workflow_id)
+        with workflow_stripe.lock:
+            return list(workflow_stripe.workflows.get(workflow_id, {}).values())  # noqa: E501
+
+    def count(self) -> int:
+        """
+        Amount of running tasks, without taking the locks,
+        the value could be outdated as soon as it is returned anyway
+        """
+        return sum(len(stripe.tasks) for stripe in self._stripes)
+
+    def snapshot(self) -> Dict[str, TaskExecution]:
+        """
+        Returns a copy of all running tasks, keyed by task id
+        """
+        tasks: Dict[str, TaskExecution] = {}
+        for stripe in self._stripes:
+            with stripe.lock:
+                tasks.update(stripe.tasks)
+        return tasks
+
+    def __len__(self) -> int:
+        return self.count()
@@ -0,0 +1,172 @@
+"""
+Encodes the tasks sent through the message queue
+and decodes them by the content type of the message
+- application/json    => json, encoded with orjson, if it is installed
+- application/msgpack => msgpack, needs the msgpack package
+- text/plain          => json, sent by former versions and external clients
+The tasks encoded by a node are signed
+and are decoded without validating them again, if the signature matches
+"""
+from dataclasses import dataclass
+from dataclasses import field
+from datetime import datetime
+from hashlib import sha256
+from hmac import compare_digest
+from hmac import new as hmac_new
+from json import dumps as json_dumps
+from json import loads as json_loads
+from os import urandom
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Union
+from pydantic.json import pydantic_encoder
+
+# settings
+from .common.settings import task_codec as task_codec_default
+from .common.settings import trust_internal_tasks
+from .common.settings import trusted_tasks_key
+
+# models
+from .models.mongodb_models import Task
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+JSON_CONTENT_TYPE = "application/json"
+MSGPACK_CONTENT_TYPE = "application/msgpack"
+# header with the signature of a task encoded by a node
+TRUSTED_HEADER = "x-chain-factory-trusted"
+# without a shared key, only the tasks of this process are trusted
+_signing_key = trusted_tasks_key.encode("utf-8") if trusted_tasks_key else urandom(32)  # noqa: E501
+# fields, which are not json types and have to be restored
+# when the validation is skipped
+_DATETIME_FIELDS = ["received_date", "planned_date"]
+
+
+@dataclass
+class EncodedTask():
+    body: bytes
+    content_type: str
+    headers: Dict[str, Any] = field(default_factory=dict)
+
+
+class TaskCodec():
+    content_type = ""
+
+    def dumps(self, data: Any) -> bytes:
+        raise NotImplementedError()
+
+    def loads(self, body: Union[str, bytes]) -> Any:
+        raise NotImplementedError()
+
+    def encode(self, task: Task) -> bytes:
+        # the fields of the task are flat, the values are encoded directly,
+        # instead of copying them with task.dict()
+        return self.dumps(task.__dict__)
+
+    def decode(self, body: Union[str, bytes], trusted: bool = False) -> Task:
+        data = self.loads(body)
+        if trusted:
+            return _construct_task(data)
+        return Task.parse_obj(data)
+
+
+class JsonCodec(TaskCodec):
+    content_type = JSON_CONTENT_TYPE
+
+    def dumps(self, data: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(data, default=pydantic_encoder)
+        return json_dumps(data, default=pydantic_encoder).encode("utf-8")
+
+    def loads(self, body: Union[str, bytes]) -> Any:
+        if orjson is not None:
+            return orjson.loads(body)
+        return json_loads(body)
+
+
+class MsgpackCodec(TaskCodec):
+    content_type = MSGPACK_CONTENT_TYPE
+
+    def dumps(self, data: Any) -> bytes:
+        if msgpack is None:
+            raise Exception("the msgpack package is not installed")
+        return msgpack.packb(data, default=pydantic_encoder)
+
+    def loads(self, body: bytes) -> Any:
+        if msgpack is None:
+            raise Exception("the msgpack package is not installed")
+        return msgpack.unpackb(body)
+
+
+_codecs: Dict[str, TaskCodec] = {
+    JSON_CONTENT_TYPE: JsonCodec(),
+    MSGPACK_CONTENT_TYPE: MsgpackCodec(),
+}
+_codec_names: Dict[str, str] = {
+    "json": JSON_CONTENT_TYPE,
+    "msgpack": MSGPACK_CONTENT_TYPE,
+}
+
+
+def _construct_task(data: Dict[str, Any]) -> Task:
+    """
+    creates the task without validating the fields
+    """
+    for name in _DATETIME_FIELDS:
+        value = data.get(name)
+        if isinstance(value, str):
+            data[name] = datetime.fromisoformat(value)
+    return Task.construct(**data)
+
+
+def _sign(body: Union[str, bytes]) -> str:
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hmac_new(_signing_key, body, sha256).hexdigest()
+
+
+def _trusted(body: Union[str, bytes], headers: Optional[Dict[str, Any]]) -> bool:  # noqa: E501
+    """
+    the header is set by the publisher, it is only trusted,
+    if it is the signature of the body
+    """
+    if not trust_internal_tasks:
+        return False
+    signature = (headers or {}).get(TRUSTED_HEADER)
+    return isinstance(signature, str) and compare_digest(signature, _sign(body))  # noqa: E501
+
+
+def codec_for(content_type: Optional[str]) -> TaskCodec:
+    """
+    the codec of the content type,
+    messages without a known content type are json
+    """
+    return _codecs.get(content_type or "", _codecs[JSON_CONTENT_TYPE])
+
+
+def default_codec(name: str = task_codec_default) -> TaskCodec:
+    if name == "msgpack" and msgpack is None:
+        raise Exception("TASK_CODEC is msgpack, but msgpack is not installed")  # noqa: E501
+    return _codecs[_codec_names.get(name, JSON_CONTENT_TYPE)]
+
+
+def encode_task(task: Task, codec: Optional[TaskCodec] = None) -> EncodedTask:  # noqa: E501
+    if codec is None:
+        codec = default_codec()
+    body = codec.encode(task)
+    headers: Dict[str, Any] = {}
+    if trust_internal_tasks:
+        headers[TRUSTED_HEADER] = _sign(body)
+    return EncodedTask(body, codec.content_type, headers)
+
+
+def decode_task(body: Union[str, bytes], content_type: Optional[str] = None, headers: Optional[Dict[str, Any]] = None) -> Task:  # noqa: E501
+    return codec_for(content_type).decode(body, _trusted(body, headers))
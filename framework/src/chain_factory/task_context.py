@@ -0,0 +1,27 @@
+from contextvars import ContextVar
+from typing import Optional
+
+# models
+from .models.mongodb_models import Task
+
+
+class TaskContext():
+    """
+    State of a single task run, which is needed by the task function itself,
+    e.g. to schedule a follow-up task with .s()
+    every run gets its own context, so concurrently running tasks
+    do not overwrite the state of each other
+    """
+
+    def __init__(self, task: Task):
+        self.task = task
+        # set to False, if the task scheduled a follow-up task using .s(),
+        # then the workflow must not be marked as stopped,
+        # when the task finishes
+        self.can_be_marked_as_stopped = True
+
+
+# the context of the task run, which is executed in the current context,
+# asyncio tasks are inheriting it automatically,
+# the task threads are running the task function in a copy of it
+current_task_context: ContextVar[Optional[TaskContext]] = ContextVar("current_task_context", default=None)  # noqa: E501
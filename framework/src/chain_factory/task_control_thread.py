@@ -1,8 +1,11 @@
+from logging import exception
 from logging import warning
+from typing import Dict
+from typing import Union
 
 # direct imports
 from .control_thread import ControlThread
-from .task_thread import TaskThread
+from .running_task_registry import RunningTaskRegistry
 
 # wrapper
 from .wrapper.redis_client import RedisClient
@@ -10,32 +13,41 @@ from .wrapper.redis_client import RedisClient
 # settings
 from .common.settings import task_control_channel_redis_key
 
+# models
+from .models.redis_models import TaskControlMessage
+
 
 class TaskControlThread(ControlThread):
     """
-    TaskControlThread is a thread that listens to a redis channel for control
-    messages. It is used to stop or abort a task.
+    TaskControlThread listens to a redis channel for control messages.
+    It is used to stop or abort the running tasks of a workflow.
+    There is a single listener per node for all running tasks,
+    which looks up the tasks of the workflow in the RunningTaskRegistry
     ControlThread is a base class that is used to implement the redis broadcast
     listener.
     """
-    def __init__(self, workflow_id: str, task_thread: TaskThread, redis_client: RedisClient, namespace: str):  # noqa: E501
-        self.task_thread = task_thread
+    def __init__(self, running_tasks: RunningTaskRegistry, redis_client: RedisClient, namespace: str):  # noqa: E501
+        self.running_tasks = running_tasks
 
-        def stop_task():
+        def stop_tasks(workflow_id: str):
             """
-            Stops the task thread by calling the stop() method
-            on the task thread
+            Stops the running tasks of the workflow
+            by calling the stop() method
+            on the task threads
             """
-            warning("stopping task")
-            self.task_thread.stop()
+            for task_thread in self.running_tasks.by_workflow(workflow_id):
+                warning("stopping task")
+                task_thread.stop()
 
-        def abort_task():
+        def abort_tasks(workflow_id: str):
             """
-            Aborts the task thread by calling the abort() method
-            on the task thread
+            Aborts the running tasks of the workflow
+            by calling the abort() method
+            on the task threads
             """
-            warning("aborting task")
-            self.task_thread.abort()
+            for task_thread in self.running_tasks.by_workflow(workflow_id):
+                warning("aborting task")
+                task_thread.abort()
 
         # the control channel has the format
         # <namespace>_<task_control_channel_redis_key>
@@ -43,9 +55,34 @@ class TaskControlThread(ControlThread):
         control_channel = namespace_ + task_control_channel_redis_key
         ControlThread.__init__(
             self,
-            workflow_id=workflow_id,
-            control_actions={"stop": stop_task, "abort": abort_task},
+            workflow_id="",
+            control_actions={"stop": stop_tasks, "abort": abort_tasks},
             redis_client=redis_client,
             control_channel=control_channel,
             thread_name="TaskControlThread"
         )
+
+    async def _control_task_thread_handle_channel(self, msg: Union[None, Dict]):  # noqa: E501
+        """
+        The listener is shared by all tasks of the node,
+        so it keeps listening after a command or an invalid message
+        """
+        try:
+            await self._control_task_thread_handle_data(msg)
+        except Exception as e:
+            exception(e)
+        return False
+
+    async def _control_task_thread_handle_data(
+        self,
+        msg: Union[None, Dict]
+    ):
+        if msg is None:
+            return False
+        data: bytes = msg["data"]
+        if type(data) == bytes:
+            parsed_data = TaskControlMessage.parse_raw(data.decode("utf-8"))
+            control_action = self.control_actions.get(parsed_data.command)
+            if control_action is not None:
+                control_action(parsed_data.workflow_id)
+        return False
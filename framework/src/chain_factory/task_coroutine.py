@@ -0,0 +1,103 @@
+from asyncio import CancelledError
+from asyncio import get_running_loop
+from io import BytesIO
+from logging import debug
+from logging import exception
+from typing import Callable
+from typing import Optional
+
+# direct imports
+from .task_execution import TaskExecution
+from .task_output import redirect_task_output
+
+# data types
+from .models.mongodb_models import ErrorCallbackMappingType
+from .models.mongodb_models import Workflow
+from .models.mongodb_models import Task
+
+# wrapper
+from .wrapper.interruptable_thread import ThreadAbortException
+
+
+class TaskCoroutine(TaskExecution):
+    """
+    Runs an `async def` task as an asyncio.Task on the event loop of the node,
+    instead of a separate thread with its own event loop.
+    Stop, abort and timeout are cancelling the asyncio.Task.
+    The log records and the output of the task are written to the buffer,
+    the task must not block the event loop
+    """
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable,
+        arguments,
+        buffer: BytesIO,
+        error_handlers: ErrorCallbackMappingType,
+        workflow: Optional[Workflow],
+        task: Task,
+    ):
+        TaskExecution.__init__(self, name, callback, arguments, buffer, error_handlers, workflow, task)  # noqa: E501
+
+    def start(self):
+        """
+        Schedules the task on the running event loop
+        """
+        self.async_task = get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        # the asyncio task runs in its own copy of the context,
+        # so only the output of this task is routed to the buffer
+        try:
+            with redirect_task_output(self._buffer):
+                await self._run_callback()
+        finally:
+            self._signal_finished()
+
+    async def _run_callback(self):
+        try:
+            self._status = 1
+            self.result = await self._callback(**self._arguments)
+            self._status = 2
+        except CancelledError:
+            # the result and status have already been set
+            # by stop(), abort() or abort_timeout()
+            debug("TaskCoroutine::_run() cancelled")
+        # catch all exceptions to prevent a crash of the node
+        except Exception as e:
+            # check if there is a custom error handler for this exception
+            self.result = await self.try_error_handler(e)
+            if self.result is Exception:
+                exception(e)
+            self._status = 2
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        Nothing to wait for, the task runs on the event loop of the caller,
+        which already waited for the task to finish
+        """
+        return
+
+    def _cancel(self):
+        self._signal_finished()
+        if self.async_task is not None:
+            self.async_task.cancel()
+
+    def stop(self):
+        self._status = 3
+        self.result = KeyboardInterrupt
+        debug("Stopping task coroutine")
+        self._cancel()
+
+    def abort(self):
+        self.result = ThreadAbortException
+        self._status = 4
+        debug("Aborting task coroutine")
+        self._cancel()
+
+    def abort_timeout(self):
+        self.result = TimeoutError
+        self._status = 5
+        debug("Aborting task coroutine due to timeout")
+        self._cancel()
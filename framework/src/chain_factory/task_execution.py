@@ -0,0 +1,116 @@
+from asyncio import AbstractEventLoop
+from asyncio import Future
+from asyncio import shield
+from contextvars import copy_context
+from inspect import iscoroutinefunction
+from io import BytesIO
+from logging import debug
+from typing import Callable
+from typing import Optional
+from typing import Union
+
+# data types
+from .models.mongodb_models import ErrorCallbackMappingType
+from .models.mongodb_models import ErrorContext
+from .models.mongodb_models import NormalizedTaskReturnType
+from .models.mongodb_models import TaskReturnType
+from .models.mongodb_models import TaskThreadReturnType
+from .models.mongodb_models import Workflow
+from .models.mongodb_models import Task
+
+
+class TaskExecution():
+    """
+    State of a single task run, which is shared by all executors
+    (TaskThread, TaskCoroutine)
+    the executors are providing start(), join(), stop(), abort()
+    and abort_timeout()
+    """
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable,
+        arguments,
+        buffer: BytesIO,
+        error_handlers: ErrorCallbackMappingType,
+        workflow: Optional[Workflow],
+        task: Task,
+    ):
+        self._name = name
+        self._callback = callback
+        self._arguments = arguments
+        self._error_handlers = error_handlers
+        self.result: TaskThreadReturnType = None
+        self.workflow = workflow
+        self.task = task
+        self.async_task = None
+        # current task status
+        # 0 means not run
+        # 1 means started
+        # 2 means finished
+        # 3 means stopped
+        # 4 means aborted
+        # 5 means aborted due to timeout
+        self._status = 0
+        self._buffer = buffer
+        # the context (e.g. the TaskContext) of the caller,
+        # a thread does not inherit it, so the task function is run in it
+        self._context = copy_context()
+        # resolved on the event loop of the TaskRunner,
+        # when the task has exited, been stopped or aborted
+        self._loop: Optional[AbstractEventLoop] = None
+        self._completion: Optional[Future] = None
+
+    def bind_loop(self, loop: AbstractEventLoop):
+        """
+        Creates the completion future on the event loop,
+        which waits for the task, has to be called before start()
+        """
+        self._loop = loop
+        self._completion = loop.create_future()
+
+    def _signal_finished(self):
+        """
+        Resolves the completion future,
+        can be called from any thread
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._resolve_completion)
+
+    def _resolve_completion(self):
+        if self._completion is not None and not self._completion.done():
+            self._completion.set_result(self._status)
+
+    async def wait_finished(self):
+        """
+        Waits until the task has exited, been stopped or aborted
+        """
+        if self._completion is None:
+            raise Exception("bind_loop() has not been called")
+        await shield(self._completion)
+
+    async def try_error_handler(self, e) -> Union[NormalizedTaskReturnType, TaskReturnType]:  # noqa: E501
+        debug(f"Trying to find error handler for exception: {e}, {type(e)}")
+        for type_kind, exc_handler in self._error_handlers.items():
+            # debug(f"Trying error handler for exception: {e}, {type_kind}")
+            if isinstance(e, type_kind):
+                debug(f"Found error handler for exception: {e}")
+                can_accept_error_context = getattr(exc_handler, "error_context", False)  # noqa: E501
+                error_context = ErrorContext()
+                if self.workflow is not None:
+                    error_context.workflow = self.workflow
+                if self.task is not None:
+                    error_context.task = self.task
+                if iscoroutinefunction(exc_handler):
+                    if can_accept_error_context:
+                        return await exc_handler(error_context, e, self._name, self._arguments)  # noqa: E501
+                    return await exc_handler(e, self._name, self._arguments)  # noqa: E501
+                else:
+                    if can_accept_error_context:
+                        name = self._name
+                        arguments = self._arguments
+                        return exc_handler(error_context, e, name, arguments)  # type: ignore  # noqa: E501
+                    return exc_handler(e, self._name, self._arguments)  # type: ignore  # noqa: E501
+        return Exception
@@ -2,7 +2,6 @@ from typing import Dict, Optional, Type
 from typing import Union
 from typing import List
 from datetime import datetime
-from time import sleep
 from logging import info
 from logging import debug
 from logging import warning
@@ -10,16 +9,38 @@ from logging import error
 from odmantic import AIOEngine
 from inspect import signature
 from asyncio import AbstractEventLoop
+from asyncio import Task as AsyncTask
+from asyncio import CancelledError
 from asyncio import ensure_future
+from asyncio import get_running_loop
+from asyncio import run_coroutine_threadsafe
+from asyncio import sleep
+from time import monotonic
 
 # direct imports
 from .task_runner import TaskRunner
+from .running_task_registry import RunningTaskRegistry
+from .task_control_thread import TaskControlThread
+from .task_thread_pool import TaskThreadPool
+from .task_process_pool import TaskProcessPool
 from .queue_handler import QueueHandler
 from .argument_excluder import ArgumentExcluder
+from .drain_report import DrainReport
+from .write_behind_queue import WriteBehindQueue
+from .write_behind_queue import StatusWrite
+from .task_context import TaskContext
+from .task_context import current_task_context
+from .node_selector import NodeSelector
+from .delay_scheduler import DelayScheduler
+from .retry_tiers import RetryTiers
+from .argument_store import ArgumentStore
+from .task_parking import TaskParking
+from .task_codec import encode_task
 
 # wrapper
 from .wrapper.rabbitmq import RabbitMQ
 from .wrapper.rabbitmq import Message
+from .wrapper.rabbitmq import RabbitMQConnection
 from .wrapper.rabbitmq import getPublisher
 from .wrapper.redis_client import RedisClient
 from .wrapper.bytes_io_wrapper import BytesIOWrapper
@@ -28,9 +49,15 @@ from .wrapper.list_handler import ListHandler
 
 # settings
 from .common.settings import sticky_tasks
+from .common.settings import write_behind_status
+from .common.settings import local_chain_max_depth
+from .common.settings import task_thread_pool
+from .common.settings import task_executor
+from .common.settings import task_process_count
 from .common.settings import wait_time
 from .common.settings import max_task_age_wait_queue
 from .common.settings import incoming_block_list_redis_key
+from .common.settings import park_tasks
 
 # data types
 from .models.mongodb_models import ArgumentType
@@ -61,7 +88,27 @@ class TaskHandler(QueueHandler):
         self.task_timeout: int = -1
         self.namespace: str = namespace
         self.node_name: str = node_name
-        self._current_task: Union[Task, None] = None
+        self._task_thread_pool: Union[TaskThreadPool, None] = None
+        self._task_process_pool: Union[TaskProcessPool, None] = None
+        # the tasks, which are currently running on the node
+        self.running_tasks = RunningTaskRegistry()
+        # one listener for the stop/abort commands of all running tasks
+        self._task_control_thread: Union[TaskControlThread, None] = None
+        self._task_control_task: Union[AsyncTask, None] = None
+        # saves the task/workflow status in the background,
+        # if the write_behind_status option is set
+        self._status_writes = WriteBehindQueue(self._apply_status_write, owner=f"{namespace}/{node_name}")  # noqa: E501
+        # selects an alive node for the tasks with node_names (task routing)
+        self._node_selector: Union[NodeSelector, None] = None
+        # holds the planned tasks in redis until they are due
+        self._delay_scheduler: Union[DelayScheduler, None] = None
+        # the wait queues of the failed tasks, one per retry tier
+        self._retry_tiers = RetryTiers()
+        # stores the large arguments once in GridFS (claim check)
+        self._argument_store = ArgumentStore()
+        # holds the tasks, which no alive node can run,
+        # if the park_tasks option is set
+        self._task_parking: Union[TaskParking, None] = None
 
     async def init(
         self,
@@ -72,6 +119,8 @@ class TaskHandler(QueueHandler):
         blocked_queue_name: str,
         loop: AbstractEventLoop,
         rabbitmq_url: str,
+        worker_count: int = 1,
+        rabbitmq_connection: Optional[RabbitMQConnection] = None,
     ):
         """
         Initialize the task handler
@@ -82,18 +131,21 @@ class TaskHandler(QueueHandler):
         # the mongodb connection and to run the task threads
         self.loop = loop
         self.mongodb_client = mongodb_client
+        self._argument_store.init(mongodb_client.database)
 
         # setting the queue names
         self.wait_queue_name = wait_queue_name
         self.blocked_queue_name = blocked_queue_name
 
-        # Initialize the queue handler
+        # Initialize the queue handler,
+        # worker_count tasks will be executed concurrently
         await QueueHandler.init(
-            self, url=rabbitmq_url, queue_name=queue_name, loop=loop)
+            self, url=rabbitmq_url, queue_name=queue_name, loop=loop,
+            worker_count=worker_count, rabbitmq_connection=rabbitmq_connection)
 
         # Initialize the amqp publishers,
         # to send messages to the wait and blocked queue
-        await self._init_amqp_publishers(rabbitmq_url)
+        await self._init_amqp_publishers(rabbitmq_url, rabbitmq_connection)
 
         # Initialize the block list,
         # which can be specified in redis to block
@@ -105,6 +157,97 @@ class TaskHandler(QueueHandler):
         )
         await self.block_list.init()
 
+        # Send the tasks with node_names directly to an alive node
+        self._node_selector = NodeSelector(redis_client)
+
+        # Park the tasks, which no alive node can run,
+        # if the park_tasks option is set
+        if park_tasks:  # settings.park_tasks
+            self._task_parking = TaskParking(redis_client, mongodb_client, self.namespace, self._node_selector, self._schedule_task)  # noqa: E501
+
+        # Send the planned tasks to the queue, when they are due
+        self._delay_scheduler = DelayScheduler(redis_client, self._schedule_task)  # noqa: E501
+        self._delay_scheduler.start(loop)
+
+        # Listen for stop/abort commands for the running tasks
+        self._task_control_thread = TaskControlThread(self.running_tasks, redis_client, self.namespace)  # noqa: E501
+        self._task_control_task = loop.create_task(self._task_control_thread.run_async(loop))  # noqa: E501
+
+        # Save the task/workflow status in the background,
+        # if the write_behind_status option is set
+        if write_behind_status:  # settings.write_behind_status
+            await self._status_writes.start(loop)
+
+        # Initialize the pool of reusable task threads,
+        # if the task_thread_pool option is set
+        if task_thread_pool:  # settings.task_thread_pool
+            self._init_task_thread_pool(worker_count)
+
+        # Initialize the worker processes,
+        # if any of the registered tasks uses the process executor
+        if any(runner.executor == "process" for runner in self.registered_tasks.values()):  # noqa: E501
+            self._init_task_process_pool()
+
+    def _init_task_thread_pool(self, worker_count: int):
+        """
+        Start one pooled task thread per worker slot
+        and let all registered tasks run on them
+        """
+        self._task_thread_pool = TaskThreadPool(worker_count)
+        self._task_thread_pool.start()
+        for _, runner in self.registered_tasks.items():
+            runner.set_task_thread_pool(self._task_thread_pool)
+
+    def _init_task_process_pool(self):
+        """
+        Start the worker processes for the tasks using the process executor
+        """
+        self._task_process_pool = TaskProcessPool(task_process_count)
+        self._task_process_pool.start()
+        for _, runner in self.registered_tasks.items():
+            runner.set_task_process_pool(self._task_process_pool)
+
+    async def drain(self, timeout: float) -> DrainReport:
+        """
+        Waits for the running tasks like QueueHandler.drain,
+        for the pending status writes and the log lines of the tasks
+        """
+        started = monotonic()
+        report = await QueueHandler.drain(self, timeout)
+        remaining = max(timeout - (monotonic() - started), 0)
+        report.pending_status_writes = await self._status_writes.flush(remaining)  # noqa: E501
+        remaining = max(timeout - (monotonic() - started), 0)
+        report.pending_log_writes = await BytesIOWrapper.flush_pending(remaining)  # noqa: E501
+        report.duration = monotonic() - started
+        return report
+
+    def _stop_running_tasks(self) -> int:
+        running_tasks = self.running_tasks.snapshot()
+        for task_thread in running_tasks.values():
+            task_thread.stop()
+        return len(running_tasks)
+
+    async def close(self):
+        """
+        Close the queue handler, stop listening for control commands,
+        stop the pooled task threads and the worker processes
+        """
+        if self._delay_scheduler is not None:
+            await self._delay_scheduler.stop()
+        await QueueHandler.close(self)
+        await self._retry_tiers.close()
+        await self._status_writes.close()
+        if self._task_control_thread is not None:
+            self._task_control_thread.stop()
+            await self._task_control_task
+            self._task_control_thread = None
+        if self._task_thread_pool is not None:
+            self._task_thread_pool.shutdown()
+            self._task_thread_pool = None
+        if self._task_process_pool is not None:
+            self._task_process_pool.shutdown()
+            self._task_process_pool = None
+
     def update_task_timeout(self):
         """
         Update the task timeout value for all registered tasks
@@ -119,10 +262,11 @@ class TaskHandler(QueueHandler):
         for _, runner in self.registered_tasks.items():
             runner.update_error_handlers(self.error_handlers)
 
-    async def _init_amqp_publishers(self, url: str):
+    async def _init_amqp_publishers(self, url: str, connection: Optional[RabbitMQConnection] = None):  # noqa: E501
         """
         Initialize the amqp publishers,
         to send messages to the wait and blocked queue
+        the publishers are sharing the connection of the consumer, if given
         """
         # Initialize the amqp publisher,
         # to send messages to the wait queue
@@ -130,6 +274,7 @@ class TaskHandler(QueueHandler):
             rabbitmq_url=url,
             queue_name="dlx." + self.wait_queue_name,
             loop=self.loop,
+            connection=connection,
             queue_options={
                 # publish dead lettered messages to the task queue again
                 "x-dead-letter-exchange": self.queue_name,
@@ -145,6 +290,7 @@ class TaskHandler(QueueHandler):
             rabbitmq_url=url,
             queue_name="dlx." + self.blocked_queue_name,
             loop=self.loop,
+            connection=connection,
             queue_options={
                 # publish dead lettered messages to the task queue again
                 "x-dead-letter-exchange": self.queue_name,
@@ -154,6 +300,10 @@ class TaskHandler(QueueHandler):
             }
         )
         await self.amqp_blocked.init()
+        # Initialize the retry tiers,
+        # the failed tasks are waiting longer with every retry
+        if self._retry_tiers.enabled:
+            await self._retry_tiers.init(url, self.wait_queue_name, self.queue_name, self.loop, connection)  # noqa: E501
 
     async def _check_blocklist(self, task: Task, message: Message) -> bool:
         """
@@ -166,20 +316,26 @@ class TaskHandler(QueueHandler):
             warning("could not retrieve blocklist from redis, rejecting all tasks")  # noqa: E501
             await self.nack(message)
             # if the blocklist couldn't be retrieved from redis,
-            # wait for 5 seconds and try again
-            sleep(wait_time)
+            # wait before the next message, without blocking the loop,
+            # the other messages, the acks and the heartbeat go on
+            await sleep(wait_time)
             return True
         # check if the task is in the blocklist
-        for item in blocklist.list_items:
+        if self._is_blocked(task, blocklist.list_items):
+            info(f"task '{task.name}' is in block list, ""dispatching to blocked_queue")  # noqa: E501
+            task.update_time()
+            # reschedule task, which is in incoming block list
+            await self.send_to_queue(task, self.amqp_blocked)
+            # and acknowledge the message to remove it from the queue
+            await self.ack(message)
+            return True
+        return False
+
+    def _is_blocked(self, task: Task, list_items) -> bool:
+        for item in list_items:
             node_name = item.name
             task_name = item.content
             if task_name == task.name and node_name in [self.node_name, "*"]:  # noqa: E501
-                info(f"task '{task.name}' is in block list, ""dispatching to blocked_queue")  # noqa: E501
-                task.update_time()
-                # reschedule task, which is in incoming block list
-                await self.send_to_queue(task, self.amqp_blocked)
-                # and acknowledge the message to remove it from the queue
-                await self.ack(message)
                 return True
         return False
 
@@ -229,11 +385,9 @@ class TaskHandler(QueueHandler):
             raise Exception("mongodb client is not initialized")
         # buffer to redirect stdout/stderr to the database
         log_buffer = BytesIOWrapper(task_id, task.workflow_id, self.mongodb_client, loop=self.loop)  # noqa: E501
-        self._current_task = task
-        self._can_be_marked_as_stopped = True
         info(f"running task '{task_name}' with task_id '{task_id}'")
-        # run the task, the loop has already been set in the constructor of the TaskRunner  # noqa: E501
-        result = await self.registered_tasks[task_name].run(workflow, task, log_buffer)  # noqa: E501
+        # run the task, the task signals its completion on the loop of the node  # noqa: E501
+        result = await self.registered_tasks[task_name].run(workflow, task, log_buffer, self.loop)  # noqa: E501
         info(f"task '{task_name}' with task_id {task_id} finished")
         return result
 
@@ -286,11 +440,28 @@ class TaskHandler(QueueHandler):
         # remove current task id on error
         # generate a new one on next run
         task.cleanup_task()
-        task.arguments = new_arguments
+        task.arguments = await self._argument_store.offload(new_arguments)
         # send task to wait queue
-        await self.amqp_wait.send(task.json())
+        await self._send_to_wait_queue(task)
         return None
 
+    async def _send_to_wait_queue(self, task: Task):
+        """
+        Sends the task to the wait queue, to be retried later,
+        with retry tiers, the wait time grows with every retry
+        and the workflow is stopped, when the task has been retried too often
+        """
+        if not self._retry_tiers.enabled:
+            encoded = encode_task(task)
+            await self.amqp_wait.send(encoded.body, priority=task.priority, content_type=encoded.content_type, headers=encoded.headers)  # noqa: E501
+            return
+        task.increase_retried()
+        if self._retry_tiers.exhausted(task):
+            error(f"giving up task {task.name} after {self._retry_tiers.max_attempts} retries")  # noqa: E501
+            await self._mark_workflow_as_stopped(task.workflow_id, "RetryLimit")  # noqa: E501
+            return
+        await self._retry_tiers.send(task)
+
     async def _save_first_task_as_workflow(self, task: Task):
         """
         Report the first task in the workflow as the workflow to the database
@@ -312,28 +483,46 @@ class TaskHandler(QueueHandler):
             status=result,
             created_date=datetime.utcnow()
         )
-        if self.mongodb_client is None:
-            raise Exception("mongodb client is not initialized")
         # save the task status/result object to the database
-        await self.mongodb_client.save(task_status)
+        await self._write_status(StatusWrite("task_status", task_status.json()))  # noqa: E501
 
     async def _mark_workflow_as_stopped(self, workflow_id: str, status: str):
         """
         Report the workflow as stopped to the database
         """
+        workflow_status = WorkflowStatus(
+            workflow_id=workflow_id,
+            namespace=self.namespace,
+            status=status,
+            created_date=datetime.utcnow(),
+        )
+        await self._write_status(StatusWrite("workflow_status", workflow_status.json()))  # noqa: E501
+
+    async def _write_status(self, write: StatusWrite):
+        """
+        Saves the status either right away
+        or in the background in the order of the calls,
+        if the write_behind_status option is set
+        """
+        if self._status_writes.started:
+            await self._status_writes.put(write.kind, write.data)
+        else:
+            await self._apply_status_write(write)
+
+    async def _apply_status_write(self, write: StatusWrite):
         if self.mongodb_client is None:
             raise Exception("mongodb client is not initialized")
-        # check, if the workflow is already marked as stopped
-        if not await WorkflowStatus.get(self.mongodb_client, workflow_id, self.namespace):  # noqa: E501
-            # if the workflow is not marked as stopped, mark it as stopped
-            workflow_status = WorkflowStatus(
-                workflow_id=workflow_id,
-                namespace=self.namespace,
-                status=status,
-                created_date=datetime.utcnow(),
-            )
-            # save the workflow status to the database
-            await self.mongodb_client.save(workflow_status)
+        mongodb_client = self.mongodb_client
+        if write.kind == "task_status":
+            await mongodb_client.save(TaskStatus.parse_raw(write.data))
+        elif write.kind == "workflow_status":
+            workflow_status = WorkflowStatus.parse_raw(write.data)
+            # check, if the workflow is already marked as stopped
+            if not await WorkflowStatus.get(mongodb_client, workflow_status.workflow_id, workflow_status.namespace):  # noqa: E501
+                # if the workflow is not marked as stopped, mark it as stopped
+                await mongodb_client.save(workflow_status)
+        else:
+            raise ValueError(f"unknown status write '{write.kind}'")
 
     async def _handle_workflow_stopped(self, result: str, task: Task, can_be_marked_as_stopped: bool):  # noqa: E501
         """
@@ -362,6 +551,7 @@ class TaskHandler(QueueHandler):
         arguments: ArgumentType,
         message: Message,
         task: Task,
+        task_context: TaskContext,
     ) -> Union[Task, None]:
         """
         Handle the result of a task, if the task is finished running
@@ -379,7 +569,7 @@ class TaskHandler(QueueHandler):
         elif task_result is TimeoutError:
             if self.registered_tasks[task.name].task_repeat_on_timeout:
                 return await self._handle_repeat_task(task, arguments, "Timeout")  # noqa: E501
-            return await self._handle_workflow_stopped("Timeout", task, self._can_be_marked_as_stopped)  # noqa: E501
+            return await self._handle_workflow_stopped("Timeout", task, task_context.can_be_marked_as_stopped)  # noqa: E501
 
         # check, if the task result is a ThreadAbortException,
         # which means, the task was aborted using a redis broadcast
@@ -400,15 +590,17 @@ class TaskHandler(QueueHandler):
             # there has been no error and no new task should be scheduled
             # => mark the workflow as stopped
             if task_result is None:
-                return await self._handle_workflow_stopped("None", task, self._can_be_marked_as_stopped)  # noqa: E501
+                return await self._handle_workflow_stopped("None", task, task_context.can_be_marked_as_stopped)  # noqa: E501
             # Exception means an exception occured during the task run
             elif task_result is Exception:
-                return await self._handle_workflow_stopped("Exception", task, self._can_be_marked_as_stopped)  # noqa: E501
-            # Task means, a new/next task has been returned,
-            # to be scheduled to the queue
-            elif task_result is Task:
+                return await self._handle_workflow_stopped("Exception", task, task_context.can_be_marked_as_stopped)  # noqa: E501
+            # a task name, a task function or a Task means,
+            # a new/next task has been returned, to be scheduled to the queue
+            elif isinstance(task_result, (str, Task)) or callable(task_result):
                 await self._save_task_result(task.task_id, "Task")
-                return self._return_new_task(task, arguments, task_result)
+                new_task = self._return_new_task(task, arguments, task_result)
+                new_task.arguments = await self._argument_store.offload(new_task.arguments)  # noqa: E501
+                return new_task
 
             # if the task result is not
             # None,
@@ -436,6 +628,9 @@ class TaskHandler(QueueHandler):
         """
         # generate a new task id
         task.generate_task_id()
+        # store the large arguments (e.g. sent by the api) once,
+        # the next tasks and the retries only carry the references
+        task.arguments = await self._argument_store.offload(task.arguments)
         # save the task to the database
         await self._prepare_task_in_database(task)
         # return the prepared task
@@ -467,30 +662,101 @@ class TaskHandler(QueueHandler):
         """
         will be executed, when the task is valid,
         which means it has a valid workflow id
-        - generates a unique task id and
-        - saves the association to the workflow in the database
         - runs the task
-        - returns a function to handle the task result
+        - runs the next tasks on this node, if the local chain is enabled
+        - returns the next task, which should be sent to the queue
+        """
+        next_task = await self._run_and_handle_task(task, message)
+        depth = 0
+        # settings.local_chain_max_depth, 0 disables the local chain
+        while (
+            next_task is not None and
+            depth < local_chain_max_depth and
+            await self._can_run_locally(next_task)
+        ):
+            depth = depth + 1
+            local_task = next_task.copy(deep=True)
+            try:
+                next_task = await self._run_locally(next_task, message)
+            except CancelledError:
+                # the node is drained, the message of the first task
+                # has already been acknowledged, so the next task
+                # is only known to this node
+                await self.send_to_queue(local_task, self.rabbitmq, await self._target_node(local_task))  # noqa: E501
+                raise
+        return next_task
+
+    async def _can_run_locally(self, task: Task) -> bool:
+        """
+        Checks, if the next task can be run directly on this node,
+        the same checks as for an incoming task
+        """
+        if self._draining or task.name not in self.registered_tasks:
+            return False
+        if task.check_node_filter(self.node_name) or task.is_planned_task():
+            return False
+        blocklist = await self.block_list.get()
+        if blocklist is None or blocklist.list_items is None:
+            # let the queue handle the task, if the blocklist is unknown
+            return False
+        return not self._is_blocked(task, blocklist.list_items)
+
+    async def _run_locally(self, task: Task, message: Message) -> Union[Task, None]:  # noqa: E501
+        """
+        Runs the next task of the workflow on this node,
+        the task and its association to the workflow are saved
+        like for a task received from the queue
+        """
+        info(f"running next task '{task.name}' on this node")
+        task.update_time()
+        task.reset_rejected()
+        task = await self._prepare_task(task)
+        if await task.is_stopped(self.namespace, self.mongodb_client):
+            return await self._handle_stopped(task, message)
+        return await self._run_and_handle_task(task, message)
+
+    async def _run_and_handle_task(
+        self,
+        task: Task,
+        message: Message
+    ) -> Union[Task, None]:
+        """
+        - runs the task
+        - handles the task result and returns the next task
         """
         workflow = await self._get_workflow(task.workflow_id)
-        task_runner_result = await self._run_task(task, workflow)
+        # every task run gets its own context,
+        # the task function reads it, when it calls .s()
+        task_context = TaskContext(task)
+        token = current_task_context.set(task_context)
+        try:
+            task_runner_result = await self._run_task(task, workflow)
+        finally:
+            current_task_context.reset(token)
         if task_runner_result:
             task_result, arguments = task_runner_result
             # handle task result and return new Task
-            return await self._handle_task_result(task_result, arguments, message, task)  # noqa: E501
+            return await self._handle_task_result(task_result, arguments, message, task, task_context)  # noqa: E501
         else:
-            # error occured converting the arguments from Dict[str, str]
+            # error occured loading the offloaded arguments or
+            # converting the arguments from Dict[str, str]
             # to Dict[str, Any] -> to the actual type expected from the task
             error("An Error occured during the task run")
+            await self.ack(message)
+            # the task can not run with these arguments, stop the workflow
+            await self._handle_workflow_stopped("Exception", task, True)
             return None
 
     async def _handle_planned_task(self, task: Task, message: Message):
         """
-        sends the task to the delayed queue with an ttl of planned_date - now
+        holds the task in the delay scheduler until its planned date,
+        the message is acknowledged, so that the task does not occupy
+        a worker slot, while it is waiting
         """
-        # TODO: not implemented yet
-        # planned tasks are not implemented yet
-        error("planning tasks is not implemented yet")
+        if self._delay_scheduler is None:
+            raise Exception("delay scheduler is None")
+        await self._delay_scheduler.schedule(task)
+        await self.ack(message)
         return None
 
     async def _handle_incoming_task(
@@ -515,6 +781,12 @@ class TaskHandler(QueueHandler):
             debug("prepare workflow")
             return await self._prepare_workflow(task, message)
 
+        # the planned task is prepared, when it is due
+        debug("is_planned_task")
+        if task.is_planned_task():
+            debug("task is planned. handle_planned_task")
+            return await self._handle_planned_task(task, message)
+
         debug("prepare task")
         task = await self._prepare_task(task)
         debug("is_stopped")
@@ -522,11 +794,6 @@ class TaskHandler(QueueHandler):
             debug("task is stopped. handle_stopped")
             return await self._handle_stopped(task, message)
 
-        debug("is_planned_task")
-        if task.is_planned_task():
-            debug("task is planned. handle_planned_task")
-            return await self._handle_planned_task(task, message)
-
         debug("handle_run_task")
         return await self._handle_run_task(task, message)
 
@@ -555,22 +822,48 @@ class TaskHandler(QueueHandler):
         await self.ack(message)
         if queue is None:
             raise Exception("_send_to_queue: RabbitMQ is None")
-        await queue.send(task.json())
+        encoded = encode_task(task)
+        await queue.send(encoded.body, routing_key=task.name, node_name=await self._target_node(task), priority=task.priority, content_type=encoded.content_type, headers=encoded.headers)  # noqa: E501
 
     async def _handle_rejected(self, requested_task: Task, message: Message):
         """
         Increases the reject counter and requeues the task to the message queue
         """
+        if await self._park_task(requested_task, message):
+            return None
         # task rejected, increase reject counter
         requested_task.increase_rejected()
         if requested_task.check_rejected():
             requested_task.reset_rejected()
-            await self._send_to_queue(self.amqp_wait, message, requested_task)  # noqa: E501
+            await self.ack(message)
+            await self._send_to_wait_queue(requested_task)
             # await self._send_to_queue(self.rabbitmq_wait, message, requested_task)  # noqa: E501
         else:
             await self._send_to_queue(self.rabbitmq, message, requested_task)
         return None
 
+    async def _park_task(self, task: Task, message: Message) -> bool:
+        """
+        Parks the task, if no alive node can run it,
+        instead of rejecting it again
+        """
+        if self._task_parking is None:
+            return False
+        if await self._task_parking.can_run(task):
+            return False
+        await self._task_parking.park(task)
+        await self.ack(message)
+        return True
+
+    async def release_parked_tasks(self, task_names: List[str]):
+        """
+        Sends the parked tasks, which this node can run, to the queue again,
+        at most every parked_tasks_release_interval seconds
+        """
+        # a draining node does not receive the released tasks anymore
+        if self._task_parking is not None and not self._draining:
+            await self._task_parking.release_due(self.node_name, task_names)
+
     async def check_rejected_task(self, task: Task, message: Message):
         """
         Checks if the task has been rejected too often
@@ -614,12 +907,15 @@ class TaskHandler(QueueHandler):
         # return None to indicate no next task should be scheduled
         return None
 
-    def add_task(self, name: str, callback: CallbackType, repeat_on_timeout: bool):  # noqa: E501
+    def add_task(self, name: str, callback: CallbackType, repeat_on_timeout: bool, executor: str = task_executor):  # noqa: E501
         """
         Register a new task/task function
         """
-        task = TaskRunner(name, callback, self.namespace)
+        task = TaskRunner(name, callback, self.namespace, executor)
         task.update_task_repeat_on_timeout(repeat_on_timeout)
+        task.set_task_thread_pool(self._task_thread_pool)
+        task.set_running_task_registry(self.running_tasks)
+        task.set_argument_store(self._argument_store)
         self.registered_tasks[name] = task
         self.add_schedule_task_shortcut(name, callback)
         debug(f"registered task: {name}")
@@ -648,6 +944,8 @@ class TaskHandler(QueueHandler):
         """
         async def schedule_task(*args, **kwargs):
             debug(f"schedule_task: {name}")
+            # reserved keyword to override the priority of the parent task
+            priority = kwargs.pop("_priority", None)
             if (args and len(args) > 0):
                 # create kwargs from args
                 # get keywords from registered callback function
@@ -657,17 +955,57 @@ class TaskHandler(QueueHandler):
                 # add kwargs to kwargs_args
                 kwargs.update(kwargs_args)
             task = Task(name=name, arguments=kwargs)
-            if self._current_task is None:
-                raise Exception("self.current_task has been not set while scheduling a task")  # noqa: E501
-            task.set_parent_task(self._current_task)
+            # the context of the task run, which called .s()
+            task_context = current_task_context.get()
+            if task_context is None:
+                raise Exception("no task is running in the current context while scheduling a task")  # noqa: E501
+            task.set_parent_task(task_context.task)
+            if priority is not None:
+                if not 0 <= priority <= 255:
+                    raise ValueError(f"_priority has to be between 0 and 255, got {priority}")  # noqa: E501
+                task.priority = priority
             debug(f"scheduled task:{task.json()}")
-            self._can_be_marked_as_stopped = False
-            coroutine = self.send_to_queue(task, self.rabbitmq)
-            ensure_future(coroutine, loop=self.loop)
+            task_context.can_be_marked_as_stopped = False
+            coroutine = self._schedule_task(task)
+            if self._on_node_loop():
+                ensure_future(coroutine, loop=self.loop)
+            else:
+                # called from a task thread, which runs its own event loop
+                run_coroutine_threadsafe(coroutine, self.loop)
 
         setattr(callback, "s", schedule_task)
         return schedule_task
 
+    async def _schedule_task(self, task: Task):
+        task.arguments = await self._argument_store.offload(task.arguments)
+        await self.send_to_queue(task, self.rabbitmq, await self._target_node(task))  # noqa: E501
+
+    async def _target_node(self, task: Task) -> Optional[str]:
+        """
+        Returns an alive node of the node_names of the task,
+        if there is none, the task is sent to any node, which can run it
+        and is rejected there until one of the nodes is back
+        """
+        if not task.node_names or self._node_selector is None:
+            return None
+        if self.rabbitmq is None or not self.rabbitmq.task_routing:
+            return None
+        if (
+            self.node_name in task.node_names and
+            task.name in self.registered_tasks and
+            not self._draining
+        ):
+            # e.g. sticky tasks
+            return self.node_name
+        return await self._node_selector.select(task.node_names)
+
+    def _on_node_loop(self) -> bool:
+        try:
+            return get_running_loop() is self.loop
+        except RuntimeError:
+            # no running event loop
+            return False
+
     def task_set_redis_client(self, redis_client: RedisClient):
         """
         Set the redis client for all registered tasks
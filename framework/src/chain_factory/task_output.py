@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from io import BytesIO
+from logging import Handler
+from logging import LogRecord
+from logging import getLogger
+from threading import Lock
+from typing import Iterator
+from typing import Optional
+import sys
+
+
+class TaskOutput():
+    """
+    Collects the output of a single task run
+    and writes it line by line to the buffer of the task
+    """
+
+    def __init__(self, buffer: BytesIO):
+        self._buffer = buffer
+        self._pending = ""
+
+    def write(self, text: str) -> int:
+        lines = (self._pending + text).split("\n")
+        # the last element is the unterminated rest of the output
+        self._pending = lines.pop()
+        for line in lines:
+            self._write_line(line)
+        return len(text)
+
+    def write_line(self, line: str):
+        self.flush()
+        self._write_line(line)
+
+    def _write_line(self, line: str):
+        self._buffer.write(line.encode("utf-8") + b"\n")
+
+    def flush(self):
+        if self._pending:
+            pending = self._pending
+            self._pending = ""
+            self._buffer.write(pending.encode("utf-8"))
+
+
+# the output of the task run, which is executed in the current context,
+# the task threads are running the task function in their own context
+# and the asyncio tasks are getting their own copy of the context,
+# so the lookup is a single context variable read per record/write
+current_task_output: ContextVar[Optional[TaskOutput]] = ContextVar("current_task_output", default=None)  # noqa: E501
+
+
+class TaskLogHandler(Handler):
+    """
+    The only log handler for all task runs,
+    writes the record to the output of the task,
+    which emitted it, records outside of a task are ignored
+    """
+
+    def emit(self, record: LogRecord):
+        task_output = current_task_output.get()
+        if task_output is not None:
+            task_output.write_line(record.getMessage())
+
+
+class TaskStdio():
+    """
+    Replacement for sys.stdout/sys.stderr,
+    which writes to the output of the current task,
+    outside of a task everything is written to the original stream
+    """
+
+    def __init__(self, original):
+        self._original = original
+
+    def write(self, text: str) -> int:
+        task_output = current_task_output.get()
+        if task_output is None:
+            return self._original.write(text)
+        return task_output.write(text)
+
+    def flush(self):
+        if current_task_output.get() is None:
+            self._original.flush()
+
+    def __getattr__(self, name: str):
+        return getattr(self._original, name)
+
+
+_install_lock = Lock()
+
+
+def install_task_output():
+    """
+    Installs the log handler and the stdout/stderr replacements once,
+    they are checked on every call,
+    because e.g. sys.stdout could have been replaced in the meantime
+    """
+    with _install_lock:
+        root_logger = getLogger()
+        if not any(isinstance(handler, TaskLogHandler) for handler in root_logger.handlers):  # noqa: E501
+            root_logger.addHandler(TaskLogHandler())
+        if not isinstance(sys.stdout, TaskStdio):
+            sys.stdout = TaskStdio(sys.stdout)  # type: ignore
+        if not isinstance(sys.stderr, TaskStdio):
+            sys.stderr = TaskStdio(sys.stderr)  # type: ignore
+
+
+@contextmanager
+def redirect_task_output(buffer: BytesIO) -> Iterator[TaskOutput]:
+    """
+    Routes the log records and stdout/stderr
+    of the current context to the buffer
+    """
+    install_task_output()
+    task_output = TaskOutput(buffer)
+    token = current_task_output.set(task_output)
+    try:
+        yield task_output
+    finally:
+        task_output.flush()
+        current_task_output.reset(token)
@@ -0,0 +1,135 @@
+from logging import exception
+from logging import info
+from time import monotonic
+from time import time
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from odmantic import AIOEngine
+
+# direct imports
+from .node_selector import NodeSelector
+
+# wrapper
+from .wrapper.redis_client import RedisClient
+
+# settings
+from .common.settings import parked_tasks_redis_key
+from .common.settings import heartbeat_sleep_time
+from .common.settings import parked_tasks_release_interval
+
+# models
+from .models.mongodb_models import NodeTasks
+from .models.mongodb_models import Task
+
+SendType = Callable[[Task], Awaitable[None]]
+
+
+class TaskParking():
+    """
+    Holds the tasks, which no alive node can run,
+    in a redis sorted set (score = unix time the task has been parked),
+    instead of rejecting them between the task queue and the wait queue,
+    until a node, which can run them, is up
+    The nodes, which can run a task, are read from the node registrations
+    (NodeTasks) and are alive, if their heartbeat is recent
+    """
+
+    def __init__(
+        self,
+        redis_client: RedisClient,
+        database: AIOEngine,
+        namespace: str,
+        node_selector: NodeSelector,
+        send: SendType,
+        cache_time: float = heartbeat_sleep_time,
+        release_interval: float = parked_tasks_release_interval,
+    ):
+        self.redis_client = redis_client
+        self.database = database
+        self.namespace = namespace
+        self.node_selector = node_selector
+        self._send = send
+        self.cache_time = cache_time
+        self.release_interval = release_interval
+        self._last_release: Optional[float] = None
+        # task name -> (time of the lookup, nodes having registered the task)
+        self._registered_nodes: Dict[str, Tuple[float, List[str]]] = {}
+
+    async def can_run(self, task: Task) -> bool:
+        """
+        Checks, if an alive node has registered the task
+        and is one of the node_names of the task
+        """
+        for node_name in await self._nodes_registering(task.name):
+            if task.node_names and node_name not in task.node_names:
+                continue
+            if await self.node_selector.alive(node_name):
+                return True
+        return False
+
+    async def _nodes_registering(self, task_name: str) -> List[str]:
+        cached = self._registered_nodes.get(task_name)
+        if cached is not None and monotonic() - cached[0] < self.cache_time:
+            return cached[1]
+        node_tasks = await self.database.find(NodeTasks, (
+            (NodeTasks.namespace == self.namespace)
+        ))
+        node_names = [
+            registration.node_name
+            for registration in node_tasks
+            if any(task.name == task_name for task in registration.tasks)
+        ]
+        self._registered_nodes[task_name] = (monotonic(), node_names)
+        return node_names
+
+    async def park(self, task: Task):
+        info(f"parking task {task.name}, no alive node can run it")
+        task.reset_rejected()
+        await self.redis_client.zadd(parked_tasks_redis_key, {task.json(): time()})  # noqa: E501
+
+    async def release_due(self, node_name: str, task_names: List[str]) -> int:  # noqa: E501
+        """
+        Releases the parked tasks, if the last release is older than
+        release_interval seconds, a task, which has been parked again,
+        because another node has not seen this node yet, is released
+        with one of the next releases
+        """
+        now = monotonic()
+        if self._last_release is not None and now - self._last_release < self.release_interval:  # noqa: E501
+            return 0
+        self._last_release = now
+        return await self.release(node_name, task_names)
+
+    async def release(self, node_name: str, task_names: List[str]) -> int:
+        """
+        Sends the parked tasks, which the node can run,
+        to the task queue again, returns the amount of released tasks
+        """
+        # the registrations may have changed
+        self._registered_nodes = {}
+        members = await self.redis_client.zrange(parked_tasks_redis_key, 0, -1)  # noqa: E501
+        released = 0
+        for member in members:
+            task = Task.parse_raw(member)
+            if task.name not in task_names:
+                continue
+            if task.node_names and node_name not in task.node_names:
+                continue
+            # claim the task, another node may release it at the same time
+            if await self.redis_client.zrem(parked_tasks_redis_key, member) == 0:  # noqa: E501
+                continue
+            try:
+                await self._send(task)
+            except Exception as e:
+                exception(e)
+                # park the task again, it is released with the next node
+                await self.redis_client.zadd(parked_tasks_redis_key, {member: time()})  # noqa: E501
+                continue
+            released = released + 1
+        if released:
+            info(f"released {released} parked tasks for node {node_name}")
+        return released
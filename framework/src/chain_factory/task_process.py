@@ -0,0 +1,138 @@
+from asyncio import new_event_loop
+from io import BytesIO
+from logging import debug
+from logging import error
+from logging import getLogger
+from threading import Thread
+from typing import Callable
+from typing import Optional
+
+# direct imports
+from .task_execution import TaskExecution
+from .task_process_pool import TaskProcessPool
+from .task_process_pool import TaskProcessWorker
+
+# data types
+from .models.mongodb_models import ErrorCallbackMappingType
+from .models.mongodb_models import Workflow
+from .models.mongodb_models import Task
+
+# wrapper
+from .wrapper.interruptable_thread import ThreadAbortException
+
+
+class TaskProcess(Thread, TaskExecution):
+    """
+    Runs the task in a process of the TaskProcessPool,
+    to run cpu bound tasks without being limited by the GIL.
+    The thread relays the output of the process to the buffer
+    and receives the result.
+    Stop, abort and timeout are terminating the process,
+    which is then replaced by a new one
+    """
+
+    def __init__(
+        self,
+        name: str,
+        callback: Callable,
+        arguments,
+        buffer: BytesIO,
+        error_handlers: ErrorCallbackMappingType,
+        workflow: Optional[Workflow],
+        task: Task,
+        task_process_pool: TaskProcessPool,
+    ):
+        Thread.__init__(self)
+        TaskExecution.__init__(self, name, callback, arguments, buffer, error_handlers, workflow, task)  # noqa: E501
+        self.daemon = True
+        self._task_process_pool = task_process_pool
+        self._worker: Optional[TaskProcessWorker] = None
+
+    def run(self):
+        worker = self._task_process_pool.acquire()
+        self._worker = worker
+        if self._status != 0:
+            # the task has been stopped/aborted, before it has been started
+            self._task_process_pool.release(worker)
+            self._signal_finished()
+            return
+        recycle = False
+        try:
+            self._status = 1
+            worker.connection.send((self._callback, self._arguments, getLogger().level))  # noqa: E501
+            self._relay(worker)
+        except (EOFError, OSError):
+            # the process has been terminated by stop/abort/timeout
+            # or died unexpectedly
+            recycle = True
+            if self._status == 1:
+                error("task process died unexpectedly")
+                self.result = Exception
+                self._status = 2
+        except Exception as e:
+            # e.g. the callback or the arguments can not be pickled
+            recycle = True
+            self._handle_error(e, "")
+        finally:
+            self._task_process_pool.release(worker, recycle)
+            self._signal_finished()
+
+    def _relay(self, worker: TaskProcessWorker):
+        """
+        Writes the output of the process to the buffer
+        until the result has been received
+        """
+        while True:
+            message = worker.connection.recv()
+            kind = message[0]
+            if kind == "output":
+                self._buffer.write(message[1])
+            elif kind == "result":
+                if self._status == 1:
+                    self.result = message[1]
+                    self._status = 2
+                return
+            elif kind == "error":
+                self._handle_error(message[1], message[2])
+                return
+
+    def _handle_error(self, e: Exception, formatted_exception: str):
+        if self._status != 1:
+            return
+        # check if there is a custom error handler for this exception
+        loop = new_event_loop()
+        try:
+            self.result = loop.run_until_complete(self.try_error_handler(e))
+        finally:
+            loop.close()
+        if self.result is Exception:
+            error(e)
+            self._buffer.write(formatted_exception.encode("utf-8"))
+        self._status = 2
+
+    def _terminate(self):
+        """
+        called on the event loop, only signals the process,
+        the relay thread waits for it and recycles the worker
+        """
+        self._signal_finished()
+        if self._worker is not None:
+            self._worker.signal_terminate()
+
+    def stop(self):
+        self._status = 3
+        self.result = KeyboardInterrupt
+        debug("Stopping task process")
+        self._terminate()
+
+    def abort(self):
+        self.result = ThreadAbortException
+        self._status = 4
+        debug("Aborting task process")
+        self._terminate()
+
+    def abort_timeout(self):
+        self.result = TimeoutError
+        self._status = 5
+        debug("Aborting task process due to timeout")
+        self._terminate()
@@ -0,0 +1,205 @@
+from asyncio import run as run_coroutine
+from inspect import iscoroutine
+from logging import Handler
+from logging import debug
+from logging import getLogger
+from logging import info
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from queue import Queue
+from threading import Lock
+from threading import Timer
+from traceback import format_exc
+from typing import List
+import sys
+
+# settings
+from .common.settings import task_process_start_method
+from .common.settings import task_process_terminate_timeout
+
+
+class _ConnectionWriter():
+    """
+    File like object, which streams everything written to it
+    as "output" message to the parent process
+    """
+
+    def __init__(self, connection: Connection, lock: Lock):
+        self._connection = connection
+        self._lock = lock
+
+    def write(self, message: str):
+        if len(message) > 0:
+            with self._lock:
+                self._connection.send(("output", message.encode("utf-8")))
+        return len(message)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class _ConnectionLogHandler(Handler):
+    """
+    Streams the log records to the parent process,
+    in the same format as the TaskLogHandler
+    """
+
+    def __init__(self, writer: _ConnectionWriter):
+        Handler.__init__(self)
+        self._writer = writer
+
+    def emit(self, record):
+        self._writer.write(record.getMessage() + "\n")
+
+
+def _process_worker_main(connection: Connection):
+    """
+    Entrypoint of the worker processes,
+    runs the jobs sent by the parent process one after another
+    and streams stdout/stderr and the log records back
+    """
+    lock = Lock()
+    writer = _ConnectionWriter(connection, lock)
+    sys.stdout = writer  # type: ignore
+    sys.stderr = writer  # type: ignore
+    root_logger = getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_ConnectionLogHandler(writer))
+    while True:
+        job = connection.recv()
+        if job is None:
+            # None is the signal to shut down the worker
+            return
+        callback, arguments, log_level = job
+        root_logger.setLevel(log_level)
+        try:
+            result = callback(**arguments)
+            if iscoroutine(result):
+                result = run_coroutine(result)
+            message = ("result", result)
+        except Exception as e:
+            message = ("error", e, format_exc())
+        with lock:
+            try:
+                connection.send(message)
+            except Exception as e:
+                # the result or the exception could not be pickled
+                connection.send(("error", TypeError(f"task result can not be sent to the node: {e}"), format_exc()))  # noqa: E501
+
+
+class TaskProcessWorker():
+    """
+    A single worker process of the TaskProcessPool
+    and the connection to send jobs to it
+    """
+
+    def __init__(self, start_method: str, terminate_timeout: float = task_process_terminate_timeout):  # noqa: E501
+        self.terminate_timeout = terminate_timeout
+        context = get_context(start_method)
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_process_worker_main, args=(child_connection, ), daemon=True)  # noqa: E501
+        self.process.start()
+        # the parent does not need the child end of the pipe
+        child_connection.close()
+
+    def signal_terminate(self):
+        """
+        Sends SIGTERM to the worker process without waiting for it,
+        a timer kills it (SIGKILL), if it does not exit in time,
+        safe to call on the event loop
+        """
+        if self.process.is_alive():
+            debug(f"terminating task process {self.process.pid}")
+            self.process.terminate()
+            timer = Timer(self.terminate_timeout, self._kill)
+            timer.daemon = True
+            timer.start()
+
+    def _kill(self):
+        if self.process.is_alive():
+            debug(f"killing task process {self.process.pid}")
+            self.process.kill()
+
+    def terminate(self):
+        """
+        Terminates the worker process (SIGTERM),
+        kills it (SIGKILL), if it does not exit in time,
+        blocks until the process has exited
+        """
+        if self.process.is_alive():
+            debug(f"terminating task process {self.process.pid}")
+            self.process.terminate()
+            self.process.join(self.terminate_timeout)
+            if self.process.is_alive():
+                self._kill()
+                self.process.join()
+        self.connection.close()
+
+    def shutdown(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(self.terminate_timeout)
+        self.terminate()
+
+
+class TaskProcessPool():
+    """
+    Pool of worker processes to run cpu bound tasks on all cores,
+    a terminated worker (abort/timeout) will be replaced by a new one
+    """
+
+    def __init__(self, process_count: int, start_method: str = task_process_start_method, terminate_timeout: float = task_process_terminate_timeout):  # noqa: E501
+        self.process_count = max(process_count, 1)
+        self.start_method = start_method
+        self.terminate_timeout = terminate_timeout
+        self._idle: "Queue[TaskProcessWorker]" = Queue()
+        self._workers: List[TaskProcessWorker] = []
+        self._lock = Lock()
+
+    def start(self):
+        for _ in range(0, self.process_count):
+            self._release(self._new_worker())
+        info(f"started task process pool with {self.process_count} processes")  # noqa: E501
+
+    def _new_worker(self) -> TaskProcessWorker:
+        worker = TaskProcessWorker(self.start_method, self.terminate_timeout)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def acquire(self) -> TaskProcessWorker:
+        """
+        Returns an idle worker, waits until one is available
+        """
+        return self._idle.get()
+
+    def _release(self, worker: TaskProcessWorker):
+        self._idle.put(worker)
+
+    def release(self, worker: TaskProcessWorker, recycle: bool = False):
+        """
+        Returns the worker to the pool,
+        a terminated or broken worker is replaced by a new process,
+        blocks until the old process has exited, called by the relay thread
+        """
+        if recycle or not worker.process.is_alive():
+            worker.terminate()
+            with self._lock:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+            worker = self._new_worker()
+        self._release(worker)
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers = []
+        for worker in workers:
+            worker.shutdown()
+        info("stopped task process pool")
@@ -1,7 +1,6 @@
 from asyncio import AbstractEventLoop
 from logging import info
 from logging import shutdown as shutdown_log
-from time import sleep
 from typing import Optional
 from typing import Union
 
@@ -10,6 +9,7 @@ from .client_pool import ClientPool
 from .node_registration import NodeRegistration
 from .credentials_pool import CredentialsPool
 from .cluster_heartbeat import ClusterHeartbeat
+from .drain_report import DrainReport
 # queue handlers
 from .task_handler import TaskHandler
 
@@ -20,6 +20,8 @@ from .models.mongodb_models import ErrorCallbackType
 from .common.settings import wait_queue as wait_queue_default
 from .common.settings import task_queue as task_queue_default
 from .common.settings import incoming_blocked_queue as incoming_blocked_queue_default  # noqa: E501
+from .common.settings import task_executor as task_executor_default
+from .common.settings import drain_timeout as drain_timeout_default
 
 
 class TaskQueueHandlers():
@@ -46,8 +48,8 @@ class TaskQueueHandlers():
         self.loop: Optional[AbstractEventLoop] = loop
         self.cluster_heartbeat: Union[ClusterHeartbeat, None] = None
 
-    def add_task(self, name: str, callback, repeat_on_timeout: bool = False):  # noqa: E501
-        self._task_handler.add_task(name, callback, repeat_on_timeout)
+    def add_task(self, name: str, callback, repeat_on_timeout: bool = False, executor: str = task_executor_default):  # noqa: E501
+        self._task_handler.add_task(name, callback, repeat_on_timeout, executor)  # noqa: E501
 
     def add_error_handler(self, exc_type, callback: ErrorCallbackType):  # noqa: E501
         self._task_handler.add_error_handler(exc_type, callback)
@@ -123,6 +125,9 @@ class TaskQueueHandlers():
             wait_queue_name=self.wait_queue,
             blocked_queue_name=self.incoming_blocked_queue,
             loop=self.loop,
+            worker_count=self.worker_count,
+            # one connection per broker url, shared by consumer and publishers
+            rabbitmq_connection=await self.client_pool.rabbitmq_connection(rabbitmq_url, loop=self.loop),  # noqa: E501
         )
         self._task_handler.task_timeout = self.task_timeout
         self._task_handler.update_task_timeout()
@@ -134,7 +139,14 @@ class TaskQueueHandlers():
         """
         if self.loop is None:
             raise Exception("No loop provided")
-        self.cluster_heartbeat = ClusterHeartbeat(self.namespace, self.node_name, self.client_pool, self.loop)  # noqa: E501
+        self.cluster_heartbeat = ClusterHeartbeat(self.namespace, self.node_name, self.client_pool, self.loop, self._task_handler.worker_slots, self._release_parked_tasks)  # noqa: E501
+
+    async def _release_parked_tasks(self):
+        """
+        Releases the parked tasks, which this node can run,
+        called after each heartbeat, so the other nodes see this node alive
+        """
+        await self._task_handler.release_parked_tasks(list(self._task_handler.registered_tasks))  # noqa: E501
 
     async def listen(self):
         """
@@ -154,32 +166,30 @@ class TaskQueueHandlers():
             self.cluster_heartbeat.stop_heartbeat()
             print("stopped heartbeat")
 
-    async def stop_node(self):
+    async def stop_node(self, drain_timeout: float = drain_timeout_default) -> DrainReport:  # noqa: E501
+        """
+        Stops consuming, waits up to drain_timeout seconds for the running
+        tasks (the heartbeat keeps running meanwhile), requeues the rest
+        and closes all connections
+        """
         print("stopping node")
+        report = await self._task_handler.drain(drain_timeout)
         self.stop_listening()
-        running_workflows_counter = 0
-        task_runner_count = len(self._task_handler.registered_tasks)
-
-        while running_workflows_counter < task_runner_count:
-            running_workflows_counter = self.count_running_tasks()
-            sleep(0.1)
-        if running_workflows_counter >= task_runner_count:
-            info("node is dry")
-            await self.stop_heartbeat()
-            print("stopped heartbeat")
-            await self.client_pool.close()
-            await self._task_handler.close()
-            shutdown_log()
-            print("node stopped")
+        info(f"node is dry: {report.json()}")
+        await self.stop_heartbeat()
+        print("stopped heartbeat")
+        # the task handler is using the connections of the client pool
+        await self._task_handler.close()
+        await self.client_pool.close()
+        shutdown_log()
+        print("node stopped")
+        return report
 
     def count_running_tasks(self):
-        running_workflows_counter = 0
-        registered_tasks = self._task_handler.registered_tasks
-        for registered_task in registered_tasks:
-            task_runner = registered_tasks[registered_task]
-            if len(task_runner.running_workflows()) <= 0:
-                running_workflows_counter = running_workflows_counter + 1
-        return running_workflows_counter
+        """
+        Amount of tasks currently running on the node
+        """
+        return self._task_handler.running_tasks.count()
 
     async def _init_registration(self):
         if self.mongodb_client is None:
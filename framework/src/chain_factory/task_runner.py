@@ -1,26 +1,35 @@
-from asyncio import AbstractEventLoop, Future, get_event_loop, Task as AsyncTask, set_event_loop, wait_for
+from asyncio import AbstractEventLoop
+from asyncio import get_running_loop
 from typing import Dict, Optional
 from json import dumps
-from logging import error
 from logging import info
 from logging import debug
 from logging import exception
 from logging import warning
 from traceback import print_exc
 from sys import stdout
-from asyncio import sleep
-from time import time
 from io import BytesIO
-from threading import Lock
+from inspect import iscoroutinefunction
 
 # direct imports
+from .argument_converter import ArgumentConverter
+from .argument_store import ArgumentLoadError
+from .argument_store import ArgumentStore
 from .task_thread import TaskThread
-from .task_control_thread import TaskControlThread
+from .task_coroutine import TaskCoroutine
+from .task_process import TaskProcess
+from .task_process_pool import TaskProcessPool
+from .task_execution import TaskExecution
+from .running_task_registry import RunningTaskRegistry
+from .task_thread_pool import TaskThreadPool
+from .common.generate_random_id import generate_random_id
 
 # wrapper
-from .wrapper.interruptable_thread import ThreadAbortException
 from .wrapper.redis_client import RedisClient
 
+# settings
+from .common.settings import task_executor as default_task_executor
+
 # models
 from .models.mongodb_models import FreeTaskReturnType, Task, Workflow
 from .models.mongodb_models import ArgumentType
@@ -31,21 +40,72 @@ from .models.mongodb_models import ErrorCallbackMappingType
 
 
 class TaskRunner():
-    lock = Lock()
-
     def __init__(
         self,
         name: str,
         callback: CallbackType,
-        namespace: str
+        namespace: str,
+        executor: str = default_task_executor,
     ):
         self.callback: CallbackType = callback
         self._name: str = name
-        self._task_threads: Dict[str, TaskThread] = {}
+        self._executor = TaskRunner._check_executor(name, callback, executor)
+        # built once, instead of inspecting the callback on every run
+        self._argument_converter = ArgumentConverter(callback)
+        # the tasks of all runners of the node are registered here,
+        # replaced by the shared registry of the TaskHandler
+        self._running_tasks = RunningTaskRegistry()
         self._task_timeout: int = -1
         self._task_repeat_on_timeout = False
         self._namespace = namespace
         self._error_handlers: ErrorCallbackMappingType = {}
+        self._task_thread_pool: Optional[TaskThreadPool] = None
+        self._task_process_pool: Optional[TaskProcessPool] = None
+        self._argument_store: Optional[ArgumentStore] = None
+
+    @staticmethod
+    def _check_executor(name: str, callback: CallbackType, executor: str):
+        """
+        Checks, if the task callback can be run by the requested executor
+        - thread: runs the task in a separate thread (default)
+        - async: runs the task as asyncio.Task on the event loop of the node,
+          only for `async def` tasks
+        - process: runs the task in a worker process,
+          the task function, its arguments and its result must be picklable
+        """
+        if executor not in ["thread", "async", "process"]:
+            raise ValueError(f"unknown executor '{executor}' for task '{name}'")  # noqa: E501
+        if executor == "async" and not iscoroutinefunction(callback):
+            raise ValueError(f"task '{name}' must be an 'async def' function to use the async executor")  # noqa: E501
+        return executor
+
+    @property
+    def executor(self):
+        return self._executor
+
+    def set_task_thread_pool(self, task_thread_pool: Optional[TaskThreadPool]):  # noqa: E501
+        """
+        Run the tasks on the pooled threads instead of a new thread per task
+        """
+        self._task_thread_pool = task_thread_pool
+
+    def set_task_process_pool(self, task_process_pool: Optional[TaskProcessPool]):  # noqa: E501
+        """
+        The worker processes used by the process executor
+        """
+        self._task_process_pool = task_process_pool
+
+    def set_running_task_registry(self, running_tasks: RunningTaskRegistry):  # noqa: E501
+        """
+        The registry of the running tasks, shared by all runners of the node
+        """
+        self._running_tasks = running_tasks
+
+    def set_argument_store(self, argument_store: Optional[ArgumentStore]):  # noqa: E501
+        """
+        The store of the offloaded arguments (claim check)
+        """
+        self._argument_store = argument_store
 
     def set_redis_client(self, redis_client: RedisClient):
         self._redis_client = redis_client
@@ -67,93 +127,102 @@ class TaskRunner():
     def update_namespace(self, namespace: str):
         self._namespace = namespace
 
-    def running_workflows(self):
-        return self._task_threads
+    def running_workflows(self) -> Dict[str, TaskExecution]:
+        """
+        Returns the running tasks of this runner, keyed by task id
+        """
+        return {
+            task_id: task_thread
+            for task_id, task_thread in self._running_tasks.snapshot().items()
+            if task_thread._name == self._name
+        }
 
     async def run(
         self,
         workflow: Optional[Workflow],
         task: Task,
         buffer: BytesIO,
-        loop: Optional[AbstractEventLoop] = get_event_loop()
+        loop: Optional[AbstractEventLoop] = None
     ) -> TaskRunnerReturnType:
         workflow_id = task.workflow_id
+        # several tasks of the same workflow can run at the same time
+        task_id = task.task_id or generate_random_id()
         arguments = task.arguments
+        if loop is None:
+            loop = get_running_loop()
         try:
             debug(f"running task function {self._name} with arguments {dumps(arguments)}")  # noqa: E501
             info(f"running task with workflow_id: {workflow_id}")
             if arguments is None:
                 arguments = dict()
-            # self.convert_arguments could raise a TypeError
-            arguments = self.convert_arguments(arguments)
-            with TaskRunner.lock:
-                self._task_threads[workflow_id] = self._create_task_thread(arguments, buffer, workflow, task)  # noqa: E501
+            # self.convert_arguments could raise an ArgumentConversionError,
+            # self._load_arguments an ArgumentLoadError
+            # the converted arguments are only passed to the task function,
+            # the next task gets the (serializable) arguments as received,
+            # the offloaded arguments are only loaded for the task function
+            converted_arguments = self.convert_arguments(await self._load_arguments(arguments))  # noqa: E501
+            task_thread = self._create_task_thread(converted_arguments, buffer, workflow, task)  # noqa: E501
+            # the task signals its completion on this loop
+            task_thread.bind_loop(loop)
+        except (TypeError, ArgumentLoadError) as e:
+            exception(e)
+            print_exc(file=stdout)
+            # the reason is shown in the log of the task
+            buffer.write(f"{e}\n".encode("utf-8"))
+            return None
+        # stop/abort commands are looking up the task in the registry
+        self._running_tasks.add(task_id, workflow_id, task_thread)
+        try:
             # start the task
-            with TaskRunner.lock:
-                self._task_threads[workflow_id].start()
-            # start redis subscribe watcher
-            try:
-                task_control_thread = TaskControlThread(workflow_id, self._task_threads[workflow_id], self._redis_client, self._namespace)  # noqa: E501
-                if loop:
-                    print("starting task control thread")
-                    set_event_loop(loop)
-                    async_task = loop.create_task(task_control_thread.run_async(loop))  # noqa: E501
-                    await self._control_task_thread(workflow_id)
-                    await async_task
-            except ThreadAbortException:
-                debug("task control thread aborted")
-                pass
-
-            # await self._control_task_thread(workflow_id, None)
-
-            if self._task_threads[workflow_id]._status == 2:
+            self._start_task_thread(task_thread)
+            await self._control_task_thread(task_thread, loop)
+            if task_thread._status == 2:
                 # wait for task thread to normally exit
-                self._task_threads[workflow_id].join()
+                task_thread.join()
                 info(f"task with workflow id {workflow_id} finished")
             else:
                 warning("task aborted or stopped")
-            with TaskRunner.lock:
-                task_result = self._task_threads[workflow_id].result
-                del self._task_threads[workflow_id]
-            # parse the result to correctly return a result with arguments
-            return TaskRunner._parse_task_output(task_result, arguments)
-        except TypeError as e:
-            exception(e)
-            print_exc(file=stdout)
-            del self._task_threads[workflow_id]
-            return None
+        finally:
+            self._running_tasks.remove(task_id, workflow_id)
+        # parse the result to correctly return a result with arguments
+        return TaskRunner._parse_task_output(task_thread.result, arguments)
 
-    def _create_task_thread(self, arguments: ArgumentType, buffer: BytesIO, workflow: Optional[Workflow], task: Task):  # noqa: E501
+    def _create_task_thread(self, arguments: ArgumentType, buffer: BytesIO, workflow: Optional[Workflow], task: Task) -> TaskExecution:  # noqa: E501
+        if self._executor == "async":
+            return TaskCoroutine(self._name, self.callback, arguments, buffer, self._error_handlers, workflow, task)  # noqa: E501
+        if self._executor == "process":
+            if self._task_process_pool is None:
+                raise Exception("task process pool is not initialized")
+            return TaskProcess(self._name, self.callback, arguments, buffer, self._error_handlers, workflow, task, self._task_process_pool)  # noqa: E501
         return TaskThread(self._name, self.callback, arguments, buffer, self._error_handlers, workflow, task)  # noqa: E501
 
-    def _task_finished(self, workflow_id: str):
-        return self._task_threads[workflow_id]._status in [2, 3, 4, 5]
-
-    async def _control_task_thread(self, workflow_id: str):  # noqa: E501
+    def _start_task_thread(self, task_thread: TaskExecution):
         """
-        Subscribe to a redis key and listen for control messages
-        if there is a 'stop' control message, the thread will be aborted
-            => but only, if the 'stop' message
-            arrives during the thread's runtime
+        Starts the task either on the event loop, on a pooled thread
+        or in a new thread
         """
-        start_time = time()
-        while True:
-            current_time = time()
-            elapsed_time = current_time - start_time
-            if (
-                self._task_timeout != -1 and
-                elapsed_time > self._task_timeout
-            ):
-                self._task_threads[workflow_id].abort_timeout()
-                break
-            # check, if exited, stopped or aborted
-            if self._task_finished(workflow_id):
-                break
-            await sleep(0.001)
+        if not isinstance(task_thread, TaskThread):
+            task_thread.start()
+        elif self._task_thread_pool is not None:
+            self._task_thread_pool.submit(task_thread)
+        else:
+            task_thread.start()
 
-        # cancel the async task
-        # if async_task:
-        #     async_task.cancel()
+    async def _control_task_thread(self, task_thread: TaskExecution, loop: AbstractEventLoop):  # noqa: E501
+        """
+        Waits for the task to exit, be stopped or aborted
+        the task signals its completion, so there is no polling,
+        if a task timeout is configured, the task will be aborted
+        after the timeout by a timer on the event loop
+        """
+        timeout_handle = None
+        if self._task_timeout != -1:
+            timeout_handle = loop.call_later(self._task_timeout, task_thread.abort_timeout)  # noqa: E501
+        try:
+            await task_thread.wait_finished()
+        finally:
+            if timeout_handle is not None:
+                timeout_handle.cancel()
 
     @staticmethod
     def _parse_task_output(
@@ -188,24 +257,23 @@ class TaskRunner():
             task_result = task_result[0]
         return task_result, old_arguments
 
+    async def _load_arguments(self, arguments: ArgumentType) -> ArgumentType:  # noqa: E501
+        if self._argument_store is None:
+            return arguments
+        return await self._argument_store.load(arguments)
+
     def convert_arguments(self, arguments: ArgumentType) -> ArgumentType:
-        callback_arguments = list(self.callback.__code__.co_varnames)
-        callback_types = self.callback.__annotations__
-        for argument in arguments:
-            if argument in callback_arguments and argument in callback_types:
-                if callback_types[argument] == int and isinstance(arguments[argument], str):  # noqa: E501
-                    if len(arguments[argument]) > 0:  # type: ignore
-                        try:
-                            argument_value: str = arguments[argument]  # type: ignore  # noqa: E501
-                            arguments[argument] = int(argument_value)
-                        except Exception as e:
-                            error(e)
-        return arguments
+        """
+        Converts the arguments to the types annotated in the task function
+        """
+        return self._argument_converter.convert(arguments)
 
     def abort(self, workflow_id: str):
-        debug(f"aborting task with workflow id {workflow_id}")
-        self._task_threads[workflow_id].abort()
+        debug(f"aborting tasks with workflow id {workflow_id}")
+        for task_thread in self._running_tasks.by_workflow(workflow_id):
+            task_thread.abort()
 
     def stop(self, workflow_id: str):
-        debug(f"stopping task with workflow id {workflow_id}")
-        self._task_threads[workflow_id].stop()
+        debug(f"stopping tasks with workflow id {workflow_id}")
+        for task_thread in self._running_tasks.by_workflow(workflow_id):
+            task_thread.stop()
@@ -1,20 +1,17 @@
-from inspect import iscoroutinefunction
 from io import BytesIO
-from typing import Callable, Optional, Union
-from stdio_proxy import redirect_stdout
-from stdio_proxy import redirect_stderr
-from asyncio import new_event_loop, set_event_loop
-from logging import Handler, debug
+from typing import TYPE_CHECKING, Callable, Optional
+from asyncio import AbstractEventLoop, new_event_loop, set_event_loop
+from logging import debug
 from logging import exception
-from logging import getLogger
 from traceback import print_exc
-from sys import stdout
+from threading import Event
+
+# direct imports
+from .task_execution import TaskExecution
+from .task_output import redirect_task_output
 
 # data types
-from .models.mongodb_models import ErrorCallbackMappingType, ErrorContext
-from .models.mongodb_models import NormalizedTaskReturnType
-from .models.mongodb_models import TaskReturnType
-from .models.mongodb_models import TaskThreadReturnType
+from .models.mongodb_models import ErrorCallbackMappingType
 from .models.mongodb_models import Workflow
 from .models.mongodb_models import Task
 
@@ -22,8 +19,11 @@ from .models.mongodb_models import Task
 from .wrapper.interruptable_thread import InterruptableThread
 from .wrapper.interruptable_thread import ThreadAbortException
 
+if TYPE_CHECKING:
+    from .task_thread_pool import TaskThreadWorker
+
 
-class TaskThread(InterruptableThread):
+class TaskThread(InterruptableThread, TaskExecution):
     """
     The thread which actually runs the task
     the output of stdio will be redirected to a buffer
@@ -41,112 +41,115 @@ class TaskThread(InterruptableThread):
         task: Task,
     ):
         InterruptableThread.__init__(self)
-        self._name = name
-        self._callback = callback
-        self._arguments = arguments
-        self._error_handlers = error_handlers
-        self.result: TaskThreadReturnType = None
-        self.workflow = workflow
-        self.task = task
-        self.async_task = None
+        TaskExecution.__init__(self, name, callback, arguments, buffer, error_handlers, workflow, task)  # noqa: E501
         self.future = None
-        # current task status
-        # 0 means not run
-        # 1 means started
-        # 2 means finished
-        # 3 means stopped
-        # 4 means aborted
-        self._status = 0
-        self._buffer = buffer
-        self._log_handler = self.LogHandler(self)
-
-    class LogHandler(Handler):
-        def __init__(self, task_thread: "TaskThread"):
-            Handler.__init__(self)
-            self.task_thread = task_thread
-
-        def emit(self, record):
-            message = record.getMessage()
-            message_bytes = message.encode(encoding="utf-8")
-            self.task_thread._buffer.write(message_bytes)
-            self.task_thread._buffer.write(b"\n")
+        # set, when the task has been executed
+        self._finished = Event()
+        # set, if the task is executed by a TaskThreadPool
+        self._pooled = False
+        # the pooled thread, which executes the task
+        self._worker: Optional["TaskThreadWorker"] = None
 
     def run(self):
         try:
             new_loop = new_event_loop()
             set_event_loop(new_loop)
-            # redirect stdout and stderr to the buffer
-            with redirect_stdout(self._buffer), redirect_stderr(self._buffer):
-                root_logger = getLogger()
-                try:
-                    self._status = 1
-                    root_logger.addHandler(self._log_handler)
-                    self.result = new_loop.run_until_complete(self._callback(**self._arguments))  # noqa: E501
-                    print("result", self.result)
-                    root_logger.removeHandler(self._log_handler)
-                    self._status = 2
-                # catch ThreadAbortException,
-                # will be raised if the thread should be forcefully aborted
-                except ThreadAbortException as e:
-                    debug("TaskThread::run() ThreadAbortException (inner)")
-                    exception(e)
-                    self.result = ThreadAbortException
-                    self._status = 3
-                    root_logger.removeHandler(self._log_handler)
-                # catch all exceptions to prevent a crash of the node
-                except Exception as e:
-                    # check if there is a custom error handler for this exception  # noqa: E501
-                    self.result = new_loop.run_until_complete(self.try_error_handler(e))  # noqa: E501
-                    if self.result is Exception:
-                        exception(e)
-                        print_exc(file=stdout)
-                    self._status = 2
-                    root_logger.removeHandler(self._log_handler)
+            self.execute(new_loop)
         except ThreadAbortException as e:
             debug("TaskThread::run() ThreadAbortException (outer)")
             exception(e)
+            self._set_aborted()
+            return
+        finally:
+            self.set_finished()
+
+    def execute(self, loop: AbstractEventLoop):
+        """
+        Runs the task callback on the given event loop in the current thread,
+        either in the own thread (run) or on a pooled thread
+        """
+        self._context.run(self._execute, loop)
+
+    def _execute(self, loop: AbstractEventLoop):
+        # route the log records and stdout/stderr to the buffer
+        with redirect_task_output(self._buffer):
+            try:
+                self._status = 1
+                self.result = loop.run_until_complete(self._callback(**self._arguments))  # noqa: E501
+                print("result", self.result)
+                self._status = 2
+            # catch ThreadAbortException,
+            # will be raised if the thread should be forcefully aborted
+            except ThreadAbortException as e:
+                debug("TaskThread::run() ThreadAbortException (inner)")
+                exception(e)
+                self._set_aborted()
+            # catch all exceptions to prevent a crash of the node
+            except Exception as e:
+                # check if there is a custom error handler for this exception  # noqa: E501
+                self.result = loop.run_until_complete(self.try_error_handler(e))  # noqa: E501
+                if self.result is Exception:
+                    exception(e)
+                    # sys.stderr is routed to the buffer of the task
+                    print_exc()
+                self._status = 2
+
+    def _set_aborted(self):
+        # keep the result set by abort() or abort_timeout(),
+        # e.g. TimeoutError
+        if self._status in [0, 1]:
             self.result = ThreadAbortException
             self._status = 3
-            return
 
-    async def try_error_handler(self, e) -> Union[NormalizedTaskReturnType, TaskReturnType]:  # noqa: E501
-        debug(f"Trying to find error handler for exception: {e}, {type(e)}")
-        for type_kind, exc_handler in self._error_handlers.items():
-            # debug(f"Trying error handler for exception: {e}, {type_kind}")
-            if isinstance(e, type_kind):
-                debug(f"Found error handler for exception: {e}")
-                can_accept_error_context = getattr(exc_handler, "error_context", False)  # noqa: E501
-                error_context = ErrorContext()
-                if self.workflow is not None:
-                    error_context.workflow = self.workflow
-                if self.task is not None:
-                    error_context.task = self.task
-                if iscoroutinefunction(exc_handler):
-                    if can_accept_error_context:
-                        return await exc_handler(error_context, e, self._name, self._arguments)  # noqa: E501
-                    return await exc_handler(e, self._name, self._arguments)  # noqa: E501
-                else:
-                    if can_accept_error_context:
-                        name = self._name
-                        arguments = self._arguments
-                        return exc_handler(error_context, e, name, arguments)  # type: ignore  # noqa: E501
-                    return exc_handler(e, self._name, self._arguments)  # type: ignore  # noqa: E501
-        return Exception
+    def set_finished(self):
+        self._finished.set()
+        self._signal_finished()
+
+    def set_pooled(self):
+        self._pooled = True
+
+    def set_worker(self, worker: "TaskThreadWorker"):
+        self._worker = worker
+
+    def set_async_exc(self, exc, *args):
+        """
+        Injects the exception into the thread, which executes the task,
+        which is a pooled thread, if the task has been submitted to a pool
+        """
+        if self._pooled:
+            if self._worker is None:
+                # not yet picked up by a pooled thread,
+                # the worker will skip the task because of the status
+                return 0
+            return self._worker.set_async_exc_for(self, exc, *args)
+        return InterruptableThread.set_async_exc(self, exc, *args)
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        Waits for the task to finish
+        """
+        if self._pooled:
+            self._finished.wait(timeout)
+            return
+        InterruptableThread.join(self, timeout)
 
     def stop(self):
         self._status = 3
         self.result = KeyboardInterrupt
+        self._signal_finished()
         super().interrupt()
         super().exit()
 
     def abort(self):
         self.result = ThreadAbortException
         self._status = 4
+        self._signal_finished()
         debug("Aborting task thread")
         super().abort()
 
     def abort_timeout(self):
         self.result = TimeoutError
         self._status = 5
+        self._signal_finished()
         debug("Aborting task thread due to timeout")
         super().abort()
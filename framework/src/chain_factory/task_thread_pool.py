@@ -0,0 +1,162 @@
+from asyncio import AbstractEventLoop
+from asyncio import all_tasks
+from asyncio import gather
+from asyncio import new_event_loop
+from asyncio import set_event_loop
+from logging import debug
+from logging import info
+from queue import SimpleQueue
+from threading import Lock
+from typing import List
+from typing import Optional
+
+# direct imports
+from .task_thread import TaskThread
+
+# wrapper
+from .wrapper.interruptable_thread import InterruptableThread
+from .wrapper.interruptable_thread import ThreadAbortException
+
+
+class TaskThreadWorker(InterruptableThread):
+    """
+    Long-lived thread with its own persistent event loop,
+    which executes the task threads submitted to the TaskThreadPool
+    one after another
+    """
+
+    def __init__(self, jobs: "SimpleQueue[Optional[TaskThread]]", index: int):  # noqa: E501
+        InterruptableThread.__init__(self)
+        self.name = f"TaskThreadWorker-{index}"
+        self.daemon = True
+        self._jobs = jobs
+        self._loop: Optional[AbstractEventLoop] = None
+        self._current: Optional[TaskThread] = None
+        # protects _current, so that a stop/abort can only be injected
+        # while the task it is targeted at is running on this thread
+        self._lock = Lock()
+
+    def run(self):
+        self._loop = self._new_loop()
+        while True:
+            try:
+                task_thread = self._jobs.get()
+                if task_thread is None:
+                    # None is the signal to shut down the worker
+                    break
+                self._execute(task_thread)
+            except (ThreadAbortException, KeyboardInterrupt, SystemExit):
+                # a stop/abort has been injected, but arrived after the task
+                # already finished, the worker must keep running
+                debug(f"{self.name}: ignoring late stop/abort")
+                self._finish_current()
+                self._loop = self._recycle_loop(self._loop)
+        self._loop.close()
+
+    def _execute(self, task_thread: TaskThread):
+        with self._lock:
+            if task_thread._status != 0:
+                # the task has been stopped/aborted, before it has been started
+                task_thread.set_finished()
+                return
+            self._current = task_thread
+            task_thread.set_worker(self)
+        try:
+            task_thread.execute(self._loop)
+        except (ThreadAbortException, KeyboardInterrupt, SystemExit):
+            debug(f"{self.name}: task has been stopped or aborted")
+            # the exception could have interrupted the loop at any point,
+            # so the loop is replaced to not reuse a broken state
+            self._loop = self._recycle_loop(self._loop)
+        else:
+            self._cancel_leftover_tasks(self._loop)
+        finally:
+            self._finish_current()
+
+    def _finish_current(self):
+        with self._lock:
+            task_thread = self._current
+            self._current = None
+        if task_thread is not None:
+            task_thread.set_finished()
+
+    def set_async_exc_for(self, task_thread: TaskThread, exc, *args):
+        """
+        Injects the exception into this thread,
+        but only if the given task is currently running on it
+        """
+        with self._lock:
+            if self._current is not task_thread:
+                debug(f"{self.name}: task is not running, not injecting {exc}")  # noqa: E501
+                return 0
+            return InterruptableThread.set_async_exc(self, exc, *args)
+
+    @staticmethod
+    def _new_loop() -> AbstractEventLoop:
+        loop = new_event_loop()
+        set_event_loop(loop)
+        return loop
+
+    @staticmethod
+    def _recycle_loop(loop: Optional[AbstractEventLoop]) -> AbstractEventLoop:  # noqa: E501
+        if loop is not None and not loop.is_running():
+            loop.close()
+        return TaskThreadWorker._new_loop()
+
+    @staticmethod
+    def _cancel_leftover_tasks(loop: Optional[AbstractEventLoop]):
+        """
+        Cancels the asyncio tasks a task callback left behind,
+        so that they do not leak into the next task
+        """
+        if loop is None:
+            return
+        leftover_tasks = all_tasks(loop)
+        if not leftover_tasks:
+            return
+        for leftover_task in leftover_tasks:
+            leftover_task.cancel()
+        loop.run_until_complete(gather(*leftover_tasks, return_exceptions=True))  # noqa: E501
+
+
+class TaskThreadPool():
+    """
+    Pool of reusable task threads
+    to avoid creating a new thread and event loop for every task
+    """
+
+    def __init__(self, worker_count: int):
+        self.worker_count = max(worker_count, 1)
+        self._jobs: "SimpleQueue[Optional[TaskThread]]" = SimpleQueue()
+        self._workers: List[TaskThreadWorker] = []
+
+    def start(self):
+        """
+        Starts the pooled threads
+        """
+        for index in range(0, self.worker_count):
+            worker = TaskThreadWorker(self._jobs, index)
+            worker.start()
+            self._workers.append(worker)
+        info(f"started task thread pool with {self.worker_count} threads")
+
+    def submit(self, task_thread: TaskThread):
+        """
+        Schedules the task thread to be executed on one of the pooled threads,
+        task_thread.join() waits for the task to finish
+        """
+        # mark the task thread as pooled before it is picked up,
+        # so that join() does not wait on a never started thread
+        task_thread.set_pooled()
+        self._jobs.put(task_thread)
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """
+        Stops all pooled threads after the running tasks finished
+        """
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+        info("stopped task thread pool")
@@ -0,0 +1,59 @@
+from asyncio import Semaphore
+from logging import debug
+from typing import Dict
+
+
+class WorkerSlots():
+    """
+    Bounds the amount of tasks, which are running concurrently on a node
+
+    Every incoming message occupies a slot until it has been handled,
+    if all slots are busy, the next message waits for a free slot
+    (backpressure), the amqp prefetch count is set to the same value,
+    so the broker will not deliver more messages than there are slots
+    """
+
+    def __init__(self, worker_count: int):
+        self.worker_count = max(worker_count, 1)
+        self._semaphore = Semaphore(self.worker_count)
+        self._in_use = 0
+
+    @property
+    def in_use(self) -> int:
+        """
+        amount of slots currently occupied by a running task
+        """
+        return self._in_use
+
+    @property
+    def free(self) -> int:
+        """
+        amount of slots currently available
+        """
+        return self.worker_count - self._in_use
+
+    def usage(self) -> Dict[str, int]:
+        """
+        returns the current slot usage,
+        used to report the usage in the heartbeat
+        """
+        return {"worker_count": self.worker_count, "running_tasks": self._in_use}  # noqa: E501
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            debug(f"all {self.worker_count} worker slots are busy, waiting for a free slot")  # noqa: E501
+        await self._semaphore.acquire()
+        self._in_use = self._in_use + 1
+        debug(f"worker slots in use: {self._in_use}/{self.worker_count}")
+
+    def release(self):
+        self._in_use = self._in_use - 1
+        self._semaphore.release()
+        debug(f"worker slots in use: {self._in_use}/{self.worker_count}")
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -5,6 +5,11 @@ from typing import Optional
 from typing import Union
 from odmantic import AIOEngine
 from asyncio import AbstractEventLoop, run_coroutine_threadsafe
+from asyncio import wait
+from asyncio import wrap_future
+from concurrent.futures import Future
+from threading import Lock
+from typing import Set
 # from asyncio import ensure_future
 
 # models
@@ -19,6 +24,11 @@ class BytesIOWrapper(BytesIO):
     """
     Wrapper for BytesIO to write to stdout and mongodb
     """
+    # the log lines, which have not been saved to the database yet,
+    # of all task buffers, flushed when the node shuts down
+    _pending_writes: Set[Future] = set()
+    _pending_writes_lock = Lock()
+
     def __init__(
         self,
         task_id: str,
@@ -49,8 +59,29 @@ class BytesIOWrapper(BytesIO):
             # dataclass to json and parse to dict
             coroutine = self.mongodb_database.save(task_log)
             # ensure_future(coroutine, loop=self.loop)
-            run_coroutine_threadsafe(coroutine, self.loop)
+            future = run_coroutine_threadsafe(coroutine, self.loop)
+            with BytesIOWrapper._pending_writes_lock:
+                BytesIOWrapper._pending_writes.add(future)
+            future.add_done_callback(BytesIOWrapper._write_done)
         return super().write(b)
 
+    @staticmethod
+    def _write_done(future: Future):
+        with BytesIOWrapper._pending_writes_lock:
+            BytesIOWrapper._pending_writes.discard(future)
+
+    @staticmethod
+    async def flush_pending(timeout: Optional[float] = None) -> int:
+        """
+        Waits until the pending log lines have been saved to the database,
+        returns the amount of log lines, which are still pending
+        """
+        with BytesIOWrapper._pending_writes_lock:
+            pending_writes = list(BytesIOWrapper._pending_writes)
+        if not pending_writes:
+            return 0
+        _, pending = await wait([wrap_future(future) for future in pending_writes], timeout=timeout)  # noqa: E501
+        return len(pending)
+
     def remove_secrets(self, string: str) -> str:
         return sub("<s>(.*?)</s>", "REDACTED", string)
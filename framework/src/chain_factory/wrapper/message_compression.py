@@ -0,0 +1,88 @@
+"""
+Compresses the message bodies above a threshold
+and sets the content encoding of the message,
+the consumers decompress the bodies by their content encoding
+- gzip => gzip
+- zstd => zstd, needs the zstandard package
+"""
+from bisect import bisect_left
+from gzip import compress as gzip_compress
+from gzip import decompress as gzip_decompress
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# settings
+from ..common.settings import message_compression
+from ..common.settings import message_compression_threshold
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+
+class MessageSizeHistogram():
+    """
+    Counts the message bodies by size,
+    the buckets are labelled by their upper bound in bytes
+    """
+
+    def __init__(self, bounds: List[int] = [1024 * 4 ** i for i in range(0, 7)]):  # noqa: E501
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.total_bytes = 0
+
+    def record(self, size: int):
+        self.counts[bisect_left(self.bounds, size)] += 1
+        self.total_bytes = self.total_bytes + size
+
+    def snapshot(self) -> Dict[str, int]:
+        labels = [f"<={bound}" for bound in self.bounds]
+        labels.append(f">{self.bounds[-1]}")
+        return dict(zip(labels, self.counts))
+
+
+# the sizes of the published message bodies before compression
+published_sizes = MessageSizeHistogram()
+# the sizes of the compressed message bodies
+compressed_sizes = MessageSizeHistogram()
+
+
+def compress(body: bytes, encoding: str = message_compression, threshold: int = message_compression_threshold) -> Tuple[bytes, Optional[str]]:  # noqa: E501
+    """
+    Returns the body, compressed, if it is larger than threshold bytes,
+    and the content encoding of the returned body
+    """
+    published_sizes.record(len(body))
+    if not encoding or len(body) <= threshold:
+        return body, None
+    if encoding == "gzip":
+        compressed = gzip_compress(body, compresslevel=6)
+    elif encoding == "zstd":
+        if zstandard is None:
+            raise Exception("MESSAGE_COMPRESSION is zstd, but zstandard is not installed")  # noqa: E501
+        compressed = zstandard.ZstdCompressor().compress(body)
+    else:
+        raise ValueError(f"unknown message compression '{encoding}'")
+    if len(compressed) >= len(body):
+        return body, None
+    compressed_sizes.record(len(compressed))
+    return compressed, encoding
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    """
+    Returns the decompressed body,
+    bodies without content encoding are not compressed
+    """
+    if not encoding:
+        return body
+    if encoding == "gzip":
+        return gzip_decompress(body)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise Exception("received a zstd message, but zstandard is not installed")  # noqa: E501
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"unknown content encoding '{encoding}'")
@@ -0,0 +1,232 @@
+from asyncio import Event
+from asyncio import Task as AsyncTask
+from asyncio import ensure_future
+from asyncio import get_event_loop
+from asyncio import sleep
+from asyncio import wait_for
+from asyncio import TimeoutError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from json import dumps
+from json import loads
+from logging import error
+from logging import info
+from logging import warning
+from sqlite3 import connect
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Deque
+from typing import Optional
+from typing import Tuple
+from aio_pika import Message as AioPikaMessage
+
+# settings
+from ..common.settings import outbox_max_size
+from ..common.settings import outbox_path
+from ..common.settings import outbox_retry_interval
+from ..common.settings import outbox_close_timeout
+
+
+@dataclass
+class OutboxEntry():
+    message: AioPikaMessage
+    routing_key: Optional[str] = None
+    node_name: Optional[str] = None
+
+
+class _MemoryStore():
+    def __init__(self, max_size: int):
+        self.max_size = max(max_size, 1)
+        self._entries: Deque[Tuple[int, OutboxEntry]] = deque()
+        self._next_id = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self._entries) >= self.max_size
+
+    async def append(self, entry: OutboxEntry):
+        self._next_id = self._next_id + 1
+        self._entries.append((self._next_id, entry))
+
+    async def first(self) -> Optional[Tuple[int, OutboxEntry]]:
+        return self._entries[0] if self._entries else None
+
+    async def remove(self, entry_id: int):
+        if self._entries and self._entries[0][0] == entry_id:
+            self._entries.popleft()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def close(self):
+        pass
+
+
+class _SqliteStore():
+    """
+    keeps the entries in a sqlite database,
+    so they are published after a restart of the node,
+    the database is only used by a single thread after the start,
+    so the event loop does not wait for the commits
+    """
+
+    def __init__(self, path: str, queue_name: str):
+        self.queue_name = queue_name
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._connection = connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "queue_name TEXT, routing_key TEXT, node_name TEXT, "
+            "properties TEXT, body BLOB)"
+        )
+        self._connection.commit()
+        # counted once, len() is checked before every publish
+        self._count: int = self._connection.execute(
+            "SELECT COUNT(*) FROM outbox WHERE queue_name = ?",
+            (self.queue_name, ),
+        ).fetchone()[0]
+
+    @property
+    def full(self) -> bool:
+        return False
+
+    async def _run(self, function: Callable[..., Any], *args) -> Any:
+        return await get_event_loop().run_in_executor(self._executor, function, *args)  # noqa: E501
+
+    def _append(self, entry: OutboxEntry):
+        message = entry.message
+        properties = {
+            "headers": dict(message.headers or {}),
+            "content_type": message.content_type,
+            "content_encoding": message.content_encoding,
+            "delivery_mode": message.delivery_mode,
+            "priority": message.priority,
+            "expiration": message.expiration,
+        }
+        self._connection.execute(
+            "INSERT INTO outbox (queue_name, routing_key, node_name, properties, body) VALUES (?, ?, ?, ?, ?)",  # noqa: E501
+            (self.queue_name, entry.routing_key, entry.node_name, dumps(properties, default=str), message.body),  # noqa: E501
+        )
+        self._connection.commit()
+
+    def _first(self) -> Optional[Tuple[int, OutboxEntry]]:
+        row = self._connection.execute(
+            "SELECT id, routing_key, node_name, properties, body FROM outbox WHERE queue_name = ? ORDER BY id LIMIT 1",  # noqa: E501
+            (self.queue_name, ),
+        ).fetchone()
+        if row is None:
+            return None
+        entry_id, routing_key, node_name, properties, body = row
+        message = AioPikaMessage(body=body, **loads(properties))
+        return entry_id, OutboxEntry(message, routing_key, node_name)
+
+    def _remove(self, entry_id: int):
+        self._connection.execute("DELETE FROM outbox WHERE id = ?", (entry_id, ))  # noqa: E501
+        self._connection.commit()
+
+    async def append(self, entry: OutboxEntry):
+        self._count = self._count + 1
+        await self._run(self._append, entry)
+
+    async def first(self) -> Optional[Tuple[int, OutboxEntry]]:
+        return await self._run(self._first)
+
+    async def remove(self, entry_id: int):
+        await self._run(self._remove, entry_id)
+        self._count = self._count - 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    async def close(self):
+        await self._run(self._connection.close)
+        self._executor.shutdown(wait=False)
+
+
+class PublishOutbox():
+    """
+    Holds the messages, which could not be published,
+    because the connection to the broker is lost,
+    and publishes them in order, when the connection is back
+    - in memory, up to max_size messages, put() waits for free space
+    - in a sqlite database, if a path is given, kept over restarts
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[OutboxEntry], Awaitable[bool]],
+        queue_name: str,
+        max_size: int = outbox_max_size,
+        path: str = outbox_path,
+        retry_interval: float = outbox_retry_interval,
+    ):
+        self._publish = publish
+        self.queue_name = queue_name
+        self.retry_interval = retry_interval
+        self._store = _SqliteStore(path, queue_name) if path else _MemoryStore(max_size)  # noqa: E501
+        # created on the loop of the node, when the outbox is full
+        self._not_full: Optional[Event] = None
+        self._drain_task: Optional[AsyncTask] = None
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    async def put(self, entry: OutboxEntry):
+        """
+        Adds the message to the outbox,
+        waits, if the outbox is full
+        """
+        while self._store.full:
+            self._not_full = self._not_full or Event()
+            self._not_full.clear()
+            self.start()
+            await self._not_full.wait()
+        await self._store.append(entry)
+        self.start()
+
+    def start(self):
+        """
+        Starts publishing the messages in the outbox
+        """
+        if self._drain_task is None and len(self._store) > 0:
+            info(f"publishing {len(self._store)} messages from the outbox of {self.queue_name}")  # noqa: E501
+            self._drain_task = ensure_future(self._drain())
+
+    async def _drain(self):
+        try:
+            while True:
+                first = await self._store.first()
+                if first is None:
+                    break
+                entry_id, entry = first
+                try:
+                    published = await self._publish(entry)
+                except Exception as e:
+                    warning(f"publishing from the outbox of {self.queue_name} failed: {e}")  # noqa: E501
+                    published = False
+                if published:
+                    await self._store.remove(entry_id)
+                    if self._not_full is not None:
+                        self._not_full.set()
+                else:
+                    # the robust connection reconnects meanwhile
+                    await sleep(self.retry_interval)
+        finally:
+            self._drain_task = None
+
+    async def close(self, timeout: float = outbox_close_timeout):
+        """
+        Waits up to timeout seconds for the outbox to be published
+        """
+        drain_task = self._drain_task
+        if drain_task is not None:
+            try:
+                await wait_for(drain_task, timeout)
+            except TimeoutError:
+                pass
+        if len(self._store) > 0:
+            error(f"{len(self._store)} messages are left in the outbox of {self.queue_name}")  # noqa: E501
+        await self._store.close()
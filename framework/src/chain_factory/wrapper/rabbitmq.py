@@ -2,18 +2,32 @@ from asyncio import AbstractEventLoop, get_event_loop
 # from asyncio import get_event_loop
 from asyncio import new_event_loop
 from asyncio import ensure_future
+from asyncio import Task as AsyncTask
+from asyncio import current_task
+from asyncio import gather
+from asyncio import get_running_loop
+from asyncio import wait
+from asyncio import Future
+from asyncio import TimerHandle
+from bisect import insort
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from logging import debug
 from logging import error
 from logging import info
+from logging import warning
 import threading
 from traceback import print_exc
 from sys import stdout
 from typing import Awaitable
 from typing import Callable
 from typing import Dict
+from typing import List
 from typing import Any
 from typing import Optional
+from typing import Set
+from typing import Sequence
+from typing import Tuple
 from typing import Union
 from _thread import interrupt_main
 from _thread import start_new_thread
@@ -25,22 +39,319 @@ from aio_pika import DeliveryMode
 from aio_pika import Channel
 from aio_pika import ExchangeType
 from aio_pika.connection import Connection
+from aio_pika.pool import Pool
 from aio_pika.exceptions import AMQPConnectionError
 from aio_pika.exceptions import ChannelInvalidStateError
 from aio_pika.exceptions import DuplicateConsumerTag
+from pamqp.specification import Basic
+
+# direct imports
+from .message_compression import compress
+from .message_compression import decompress
+from .publish_outbox import OutboxEntry
+from .publish_outbox import PublishOutbox
 
 # settings
 from ..common.settings import prefetch_count
+from ..common.settings import amqp_channel_pool_size
+from ..common.settings import publish_batch_size
+from ..common.settings import publish_batch_window
+from ..common.settings import ack_batch_interval
+from ..common.settings import ack_batch_size
+from ..common.settings import task_max_priority
 
 
 @dataclass
 class Message():
-    body: str
+    # str, if the content type is a text format, otherwise bytes
+    body: Union[str, bytes]
     message: IncomingMessage
     delivery_tag: int
+    # the ack is sent later with the next batch of acks
+    ack_deferred: bool = False
+
+    @property
+    def processed(self) -> bool:
+        """
+        the message has been acked/nacked or its ack is deferred
+        """
+        return self.ack_deferred or self.message.processed
 
 
 FuncType = Callable[[Message], Awaitable[str]]
+PublishType = Callable[[List[AioPikaMessage], List[Optional[str]], List[Optional[str]]], Awaitable[List[bool]]]  # noqa: E501
+
+
+def _is_text(content_type: Optional[str]) -> bool:
+    """
+    messages without content type are sent as text by former versions
+    """
+    return (
+        not content_type or
+        content_type.startswith("text/") or
+        content_type == "application/json"
+    )
+
+
+def routing_exchange_name(queue_name: str) -> str:
+    """
+    direct exchange routing the tasks by name to the queues of the tasks
+    """
+    return queue_name + ".routing"
+
+
+def node_exchange_name(queue_name: str) -> str:
+    """
+    direct exchange routing the tasks by node name to the queues of the nodes
+    """
+    return queue_name + ".nodes"
+
+
+def unrouted_exchange_name(queue_name: str) -> str:
+    """
+    alternate exchange of the routing exchange,
+    receives the tasks no queue is bound for and passes them to the queue
+    """
+    return queue_name + ".unrouted"
+
+
+def task_queue_name(queue_name: str, task_name: str) -> str:
+    return queue_name + ".task." + task_name
+
+
+def node_queue_name(queue_name: str, node_name: str) -> str:
+    return queue_name + ".node." + node_name
+
+
+def priority_queue_options(max_priority: int) -> Dict[str, Any]:
+    """
+    queue arguments of a priority queue, 0 declares a normal queue
+    """
+    if max_priority > 0:
+        return {"x-max-priority": max_priority}
+    return {}
+
+
+def clamp_priority(priority: Optional[int], max_priority: int) -> Optional[int]:  # noqa: E501
+    """
+    limits the priority of a message to 0..max_priority,
+    the broker treats a higher priority as max_priority anyway,
+    without priority queues (0), the priority is only limited to an octet
+    """
+    if priority is None:
+        return None
+    if max_priority <= 0:
+        max_priority = 255
+    return min(max(priority, 0), max_priority)
+
+
+class _PublishBatcher():
+    """
+    Collects the messages sent one by one,
+    until batch_size messages are collected or the time window has passed,
+    and publishes them together
+    """
+
+    def __init__(self, publish: PublishType, batch_size: int, window: float):  # noqa: E501
+        self._publish = publish
+        self.batch_size = max(batch_size, 1)
+        self.window = window
+        self._pending: List[Tuple[AioPikaMessage, Optional[str], Optional[str], Future]] = []  # noqa: E501
+        self._flush_handle: Optional[TimerHandle] = None
+        self._publishing: Set[Future] = set()
+
+    async def send(self, message: AioPikaMessage, routing_key: Optional[str] = None, node_name: Optional[str] = None) -> bool:  # noqa: E501
+        """
+        Adds the message to the current batch
+        and waits until the broker has confirmed it
+        """
+        loop = get_running_loop()
+        future: Future = loop.create_future()
+        self._pending.append((message, routing_key, node_name, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush_pending)  # noqa: E501
+        return await future
+
+    def _flush_pending(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            publishing = ensure_future(self._publish_pending(pending))
+            self._publishing.add(publishing)
+            publishing.add_done_callback(self._publishing.discard)
+
+    async def _publish_pending(self, pending: List[Tuple[AioPikaMessage, Optional[str], Optional[str], Future]]):  # noqa: E501
+        try:
+            outcomes = await self._publish(
+                [message for message, _, _, _ in pending],
+                [routing_key for _, routing_key, _, _ in pending],
+                [node_name for _, _, node_name, _ in pending],
+            )
+        except Exception as e:
+            for _, _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, _, _, future), outcome in zip(pending, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+
+    async def flush(self):
+        """
+        Publishes the current batch
+        and waits for all batches, which are being published
+        """
+        self._flush_pending()
+        await gather(*self._publishing, return_exceptions=True)
+
+
+class _AckBatcher():
+    """
+    Defers the acks of the handled messages,
+    the completed messages are acked with a single ack (multiple=True)
+    on the highest delivery tag, below which all delivered messages
+    have been settled, when batch_size acks are pending
+    or interval seconds after the first pending ack
+    The acks behind a message still in flight are sent one by one,
+    so a message waits at most interval seconds for its ack
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = max(batch_size, 1)
+        # the delivery tags of the delivered messages, which are not acked
+        self._outstanding: List[int] = []
+        # the completed messages waiting for their ack
+        self._pending: Dict[int, IncomingMessage] = {}
+        # the outstanding messages acked/nacked on their own
+        self._settled: Set[int] = set()
+        # the delivery tags are numbered per channel
+        self._channel: Any = None
+        self._flush_handle: Optional[TimerHandle] = None
+
+    def delivered(self, message: IncomingMessage):
+        if message.channel is not self._channel:
+            # the channel has been reopened, the messages delivered
+            # on the previous channel are redelivered by the broker
+            self._reset(message.channel)
+        insort(self._outstanding, message.delivery_tag)
+
+    def _reset(self, channel: Any):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._channel = channel
+        self._outstanding = []
+        self._pending = {}
+        self._settled = set()
+
+    def ack(self, message: Message):
+        message.ack_deferred = True
+        self._pending[message.delivery_tag] = message.message
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = get_running_loop().call_later(self.interval, self.flush)  # noqa: E501
+
+    def settle(self, message: Message):
+        """
+        the message is acked/nacked without the batch
+        """
+        if message.message.channel is self._channel:
+            self._settled.add(message.delivery_tag)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        last_message: Optional[IncomingMessage] = None
+        while self._outstanding and (
+            self._outstanding[0] in self._pending or
+            self._outstanding[0] in self._settled
+        ):
+            delivery_tag = self._outstanding.pop(0)
+            self._settled.discard(delivery_tag)
+            if delivery_tag in self._pending:
+                last_message = self._pending.pop(delivery_tag)
+        try:
+            if last_message is not None:
+                last_message.ack(multiple=True).add_done_callback(self._acked)  # noqa: E501
+            for delivery_tag, message in self._pending.items():
+                self._outstanding.remove(delivery_tag)
+                message.ack().add_done_callback(self._acked)
+        except (AMQPConnectionError, ChannelInvalidStateError):
+            # the messages are redelivered by the broker
+            print_exc(file=stdout)
+        self._pending = {}
+
+    @staticmethod
+    def _acked(future: Future):
+        """
+        the ack is sent in the background,
+        a failed ack is only logged, the broker redelivers the messages
+        """
+        if not future.cancelled() and future.exception() is not None:
+            warning(f"sending the batched ack failed: {future.exception()}")  # noqa: E501
+
+
+class RabbitMQConnection():
+    """
+    A single robust connection to the broker,
+    shared by the consumer and the publishers of a node
+    The publishers are sending over a bounded pool of channels,
+    the consumers are getting a dedicated channel with its own qos
+    """
+
+    def __init__(
+        self,
+        url: str,
+        loop: Optional[AbstractEventLoop] = None,
+        channel_pool_size: int = amqp_channel_pool_size,
+    ):
+        self.url = url
+        self.loop = loop
+        self.channel_pool_size = max(channel_pool_size, 1)
+        self.connection: Optional[Connection] = None
+        self._channel_pool: Optional[Pool] = None
+
+    async def connect(self) -> Connection:
+        if self.connection is None:
+            self.connection = await RabbitMQ._connect(self.url, loop=self.loop)  # noqa: E501
+            self._channel_pool = Pool(self._open_pooled_channel, max_size=self.channel_pool_size, loop=self.loop)  # noqa: E501
+        return self.connection
+
+    async def _open_pooled_channel(self) -> Channel:
+        if self.connection is None:
+            raise Exception("connection is None")
+        return await self.connection.channel()
+
+    async def open_channel(self) -> Channel:
+        """
+        Opens a dedicated channel, e.g. for a consumer
+        """
+        connection = await self.connect()
+        return await connection.channel()
+
+    def acquire_channel(self):
+        """
+        Borrows a channel from the pool,
+        to be used as `async with connection.acquire_channel() as channel:`
+        """
+        if self._channel_pool is None:
+            raise Exception("connect() has not been called")
+        return self._channel_pool.acquire()
+
+    async def close(self):
+        if self._channel_pool is not None:
+            await self._channel_pool.close()
+            self._channel_pool = None
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
 
 
 class RabbitMQ:
@@ -52,26 +363,72 @@ class RabbitMQ:
         callback: Optional[FuncType] = None,
         queue_options: Dict[str, Any] = {},
         loop: Optional[AbstractEventLoop] = None,
+        prefetch_count: int = prefetch_count,
+        connection: Optional[RabbitMQConnection] = None,
+        batch_size: int = publish_batch_size,
+        batch_window: float = publish_batch_window,
+        task_routing: bool = False,
+        ack_batch_interval: float = ack_batch_interval,
+        ack_batch_size: int = ack_batch_size,
+        max_priority: int = task_max_priority,
     ):
         self.callback: Optional[FuncType] = callback
         self.queue_name: str = queue_name
         self.rmq_type = rmq_type
         self.url = url
         self.queue_options = queue_options
+        # the maximum priority of the task queues, the wait and blocked
+        # queues dead letter the messages with their priority to them
+        self.max_priority = max_priority
         self.loop = loop
+        self.prefetch_count = prefetch_count
         self.acked = []
         self.nacked = []
         self._consumer: Optional[_Consumer] = None
         self.sender_channel: Optional[_Consumer] = None
         self.connection: Optional[Connection] = None
+        # the connection shared with the other consumers/publishers,
+        # None means, this instance opens its own connection
+        self._shared_connection = connection
+        # the messages, which are currently handled by the callback,
+        # keyed by the asyncio task handling them
+        self._in_flight: Dict[AsyncTask, Message] = {}
+        # maximum amount of messages published without waiting
+        # for the confirmations of the broker
+        self.batch_size = max(batch_size, 1)
+        # send() collects the messages for batch_window seconds,
+        # 0 publishes every message directly
+        self._batcher: Optional[_PublishBatcher] = None
+        if batch_window > 0:
+            self._batcher = _PublishBatcher(self._publish_batch, self.batch_size, batch_window)  # noqa: E501
+        # publish the tasks with their name as routing key
+        # to the queues of the tasks, see bind_task_queues()
+        self.task_routing = task_routing
+        # the queues of the tasks registered on this node,
+        # consumed on the channel of the consumer
+        self._task_consumers: List[_Consumer] = []
+        # holds the messages, which could not be published,
+        # until the connection to the broker is back
+        self._outbox = PublishOutbox(self._publish_entry, queue_name)
+        # the consumer acks the handled messages in batches,
+        # 0 acks every message directly
+        self._acks: Optional[_AckBatcher] = None
+        if ack_batch_interval > 0 and rmq_type == "consumer":
+            # the deferred acks are counted by the prefetch count
+            self._acks = _AckBatcher(ack_batch_interval, min(ack_batch_size, prefetch_count))  # noqa: E501
 
     async def init(self):
         if self.loop is None and self.rmq_type == "consumer":
             raise Exception("loop is None and loop is required for consumer")
-        self.connection = await RabbitMQ._connect(self.url, loop=self.loop)  # noqa: E501
+        if self._shared_connection is not None:
+            self.connection = await self._shared_connection.connect()
+        else:
+            self.connection = await RabbitMQ._connect(self.url, loop=self.loop)  # noqa: E501
         if self.rmq_type == "consumer":
             await self.init_consumer()
         await self.init_sender()
+        # publish the messages left in the outbox (sqlite) by a former run
+        self._outbox.start()
 
     async def init_consumer(self):
         """
@@ -79,7 +436,7 @@ class RabbitMQ:
         """
         if self.connection is None:
             raise Exception("init_consumer: connection is None")
-        self._consumer = _Consumer(self.connection, self.queue_name)
+        self._consumer = _Consumer(self.connection, self.queue_name, self.queue_options)  # noqa: E501
         await self._consumer.init()
 
     async def init_sender(self):
@@ -88,20 +445,119 @@ class RabbitMQ:
         """
         if self.connection is None:
             raise Exception("init_sender: connection is None")
+        if self._shared_connection is not None:
+            # declare the queue on a pooled channel,
+            # the messages are sent over the pooled channels as well
+            async with self._shared_connection.acquire_channel() as channel:
+                self.sender_channel = _Consumer(self.connection, self.queue_name, self.queue_options, channel)  # noqa: E501
+                await self.sender_channel.init()
+                if self.task_routing:
+                    await self.sender_channel.declare_task_routing()
+            return
         self.sender_channel = _Consumer(self.connection, self.queue_name, self.queue_options)  # noqa: E501
         await self.sender_channel.init()
+        if self.task_routing:
+            await self.sender_channel.declare_task_routing()
+
+    async def bind_task_queues(self, task_names: List[str]):
+        """
+        Declares a queue for each of the tasks,
+        bound to the routing exchange with the task name as routing key,
+        the queues are consumed together with the main queue
+        on the channel of the consumer
+        """
+        if not self.task_routing:
+            return
+        if self._consumer is None or self.connection is None:
+            raise Exception("bind_task_queues: consumer is None")
+        bound = set(consumer.queue_name for consumer in self._task_consumers)  # noqa: E501
+        for task_name in task_names:
+            queue_name = task_queue_name(self.queue_name, task_name)
+            if queue_name in bound:
+                continue
+            task_consumer = _Consumer(self.connection, queue_name, self.queue_options, self._consumer.channel)  # noqa: E501
+            await task_consumer.init()
+            await task_consumer.bind_to_routing(routing_exchange_name(self.queue_name), task_name)  # noqa: E501
+            self._task_consumers.append(task_consumer)
+
+    async def bind_node_queue(self, node_name: str):
+        """
+        Declares the queue of this node,
+        which receives the tasks sent directly to this node (node_names),
+        the queue is consumed together with the main queue
+        """
+        if not self.task_routing:
+            return
+        if self._consumer is None or self.connection is None:
+            raise Exception("bind_node_queue: consumer is None")
+        queue_name = node_queue_name(self.queue_name, node_name)
+        if any(consumer.queue_name == queue_name for consumer in self._task_consumers):  # noqa: E501
+            return
+        node_consumer = _Consumer(self.connection, queue_name, self.queue_options, self._consumer.channel)  # noqa: E501
+        await node_consumer.init()
+        await node_consumer.bind_to_routing(node_exchange_name(self.queue_name), node_name)  # noqa: E501
+        self._task_consumers.append(node_consumer)
 
     def stop_callback(self):
         self.callback = None
 
+    async def stop_consuming(self):
+        """
+        Cancels the consumer, so that the broker stops delivering messages,
+        the messages already delivered are still handled
+        """
+        if self._consumer is not None:
+            await self._consumer.cancel()
+        for task_consumer in self._task_consumers:
+            await task_consumer.cancel()
+        self.flush_acks()
+
+    def flush_acks(self):
+        """
+        Sends the pending acks
+        """
+        if self._acks is not None:
+            self._acks.flush()
+
+    def in_flight(self) -> List[Message]:
+        """
+        Returns the messages, which are currently handled by the callback
+        """
+        return list(self._in_flight.values())
+
+    async def wait_in_flight(self, timeout: Optional[float]) -> bool:
+        """
+        Waits until all messages currently handled have been processed,
+        returns False, if the timeout expired before
+        """
+        in_flight = list(self._in_flight.keys())
+        if not in_flight:
+            return True
+        _, pending = await wait(in_flight, timeout=timeout)
+        return len(pending) == 0
+
+    async def cancel_in_flight(self):
+        """
+        Cancels the handling of the messages, which are still in flight,
+        the messages have to be nacked before, otherwise they are rejected
+        """
+        in_flight = list(self._in_flight.keys())
+        for task in in_flight:
+            task.cancel()
+        await gather(*in_flight, return_exceptions=True)
+
     async def close(self):
         """
         close all consumers and close the connection
         """
         self.callback = None
+        if self._batcher:
+            await self._batcher.flush()
+        await self._outbox.close()
+        self.flush_acks()
         if self._consumer:
             await self._consumer.close()
-        if self.connection:
+        if self.connection and self._shared_connection is None:
             await self.connection.close()
 
     @staticmethod
@@ -135,21 +591,56 @@ class RabbitMQ:
         callback function, which will be called
         everytime a new message is consumed by the pika/rabbitmq library
         """
-        async with message.process(ignore_processed=True):
+        delivery_tag: int = message.delivery_tag  # type: ignore
+        new_message: Message = Message(message.body, message, delivery_tag)
+        if self._acks is not None:
+            self._acks.delivered(message)
+        async with self._process(new_message):
             debug(f"body: {message.body}")
             if len(message.body) <= 0:
-                await message.ack()  # ignore empty messages
+                await self.ack(new_message)  # ignore empty messages
                 return
-            message_body: str = ""
-            if isinstance(message.body, bytes):
-                message_body = message.body.decode("utf-8")
-            else:
-                message_body = message.body
-            delivery_tag: int = message.delivery_tag  # type: ignore
-            new_message: Message = Message(message_body, message, delivery_tag)  # noqa: E501
-            if self.callback is not None:
+            message_body: Union[str, bytes] = decompress(message.body, message.content_encoding)  # noqa: E501
+            if isinstance(message_body, bytes) and _is_text(message.content_type):  # noqa: E501
+                message_body = message_body.decode("utf-8")
+            new_message.body = message_body
+            if self.callback is None:
+                # the consumer is being stopped, give the message back
+                # instead of acknowledging it without handling it
+                debug("callback has been stopped, requeueing message")
+                await self.nack(new_message)
+                return
+            task = current_task()
+            if task is not None:
+                self._in_flight[task] = new_message
+            try:
                 debug("invoking registered callback method")
                 await self._start_callback(new_message)
+            finally:
+                if task is not None:
+                    self._in_flight.pop(task, None)
+
+    @asynccontextmanager
+    async def _process(self, message: Message):
+        """
+        like IncomingMessage.process(ignore_processed=True),
+        acks the message after it has been handled,
+        unless it has been acked/nacked or its ack is deferred,
+        rejects the message, if the handling failed
+        """
+        try:
+            yield
+        except BaseException:
+            if not message.processed and not message.message.channel.is_closed:  # noqa: E501
+                self._settle(message)
+                await message.message.reject(requeue=False)
+            raise
+        if not message.processed:
+            await self.ack(message)
+
+    def _settle(self, message: Message):
+        if self._acks is not None:
+            self._acks.settle(message)
 
     def _start_callback_thread(self, new_message: Message):
         def callback_thread(new_message: Message):
@@ -176,20 +667,26 @@ class RabbitMQ:
 
     async def ack(self, message: Message):
         """
-        Acknowledges the specified message
+        Acknowledges the specified message,
+        with ack batching, the ack is sent with the next batch
         """
+        if self._acks is not None:
+            self._acks.ack(message)
+            return
         await message.message.ack()
 
     async def nack(self, message: Message):
         """
         Nacks/Rejects the specified message
         """
+        self._settle(message)
         await message.message.nack(requeue=True)
 
     async def reject(self, message: Message):
         """
         Rejects the specified message
         """
+        self._settle(message)
         message.message.reject(requeue=True)
 
     async def listen(self):
@@ -200,42 +697,143 @@ class RabbitMQ:
         if self._consumer is None:
             raise Exception("consumer is None")
         await self._start_consuming(self._consumer)
+        for task_consumer in self._task_consumers:
+            await self._start_consuming(task_consumer)
 
     async def _start_consuming(self, consumer: "_Consumer"):
         try:
             if consumer is None:
                 raise Exception("consumer is None")
-            await consumer.consume(self.callback_impl)
+            await consumer.consume(self.callback_impl, self.prefetch_count)
         except Exception:
             error("start_consuming exception")
             print_exc(file=stdout)
             interrupt_main()
 
-    async def send(self, message: str) -> Union[bool, None]:
-        """
-        Publishes a new task on the queue
-        """
+    async def send(self, message: Union[str, bytes], routing_key: Optional[str] = None, node_name: Optional[str] = None, expiration: Optional[float] = None, priority: Optional[int] = None, content_type: str = "text/plain", headers: Optional[Dict[str, Any]] = None) -> Union[bool, None]:  # noqa: E501
+        """
+        Publishes a new task on the queue,
+        with task routing, a message with a node name is published
+        to the queue of the node, a message with a routing key (the task name)
+        to the queue of the task
+        A message with an expiration (in seconds) is dead lettered
+        after that time, it is not batched
+        If the connection to the broker is lost, the message is published
+        from the outbox, when the connection is back
+        """
+        new_message = self._create_new_message(message, expiration, priority, content_type, headers)  # noqa: E501
+        if len(self._outbox) > 0:
+            # keep the order behind the messages waiting in the outbox
+            return (await self._put_outbox([new_message], [routing_key], [node_name]))[0]  # noqa: E501
+        if self._batcher is not None and expiration is None:
+            return await self._batcher.send(new_message, routing_key, node_name)  # noqa: E501
         try:
-            new_message = self._create_new_message(message)
+            publish_result = await self._publish_one(new_message, routing_key, node_name)  # noqa: E501
+            return publish_result is not None
+        except (AMQPConnectionError, ChannelInvalidStateError, DuplicateConsumerTag):  # noqa: E501
+            print_exc(file=stdout)
+            return (await self._put_outbox([new_message], [routing_key], [node_name]))[0]  # noqa: E501
+
+    async def _publish_one(self, new_message: AioPikaMessage, routing_key: Optional[str], node_name: Optional[str]):  # noqa: E501
+        if self._shared_connection is not None:
+            async with self._shared_connection.acquire_channel() as channel:  # noqa: E501
+                return await self._publish(channel, new_message, routing_key, node_name)  # noqa: E501
+        if self.sender_channel is None:
+            raise Exception("sender_channel is None")
+        if self.sender_channel.channel is None:
+            raise Exception("sender_channel.channel is None")
+        return await self._publish(self.sender_channel.channel, new_message, routing_key, node_name)  # noqa: E501
+
+    async def _publish_entry(self, entry: OutboxEntry) -> bool:
+        """
+        publishes a message from the outbox
+        """
+        publish_result = await self._publish_one(entry.message, entry.routing_key, entry.node_name)  # noqa: E501
+        return isinstance(publish_result, Basic.Ack)
+
+    async def _put_outbox(self, new_messages: List[AioPikaMessage], routing_keys: List[Optional[str]], node_names: List[Optional[str]]) -> List[bool]:  # noqa: E501
+        for new_message, routing_key, node_name in zip(new_messages, routing_keys, node_names):  # noqa: E501
+            await self._outbox.put(OutboxEntry(new_message, routing_key, node_name))  # noqa: E501
+        return [True] * len(new_messages)
+
+    async def send_many(self, messages: Sequence[Union[str, bytes]], routing_keys: Optional[List[Optional[str]]] = None, node_names: Optional[List[Optional[str]]] = None, priorities: Optional[List[Optional[int]]] = None, content_type: str = "text/plain", headers: Optional[Dict[str, Any]] = None) -> List[bool]:  # noqa: E501
+        """
+        Publishes the messages on the queue,
+        batch_size messages at a time are published without waiting
+        for the confirmation of the previous message,
+        returns for every message, if the broker has confirmed it
+        """
+        if routing_keys is None:
+            routing_keys = [None] * len(messages)
+        if node_names is None:
+            node_names = [None] * len(messages)
+        if priorities is None:
+            priorities = [None] * len(messages)
+        new_messages = [
+            self._create_new_message(message, priority=priority, content_type=content_type, headers=headers)  # noqa: E501
+            for message, priority in zip(messages, priorities)
+        ]
+        outcomes: List[bool] = []
+        for start in range(0, len(messages), self.batch_size):
+            end = start + self.batch_size
+            outcomes.extend(await self._publish_batch(new_messages[start:end], routing_keys[start:end], node_names[start:end]))  # noqa: E501
+        return outcomes
+
+    async def _publish_batch(self, new_messages: List[AioPikaMessage], routing_keys: List[Optional[str]], node_names: List[Optional[str]]) -> List[bool]:  # noqa: E501
+        if len(self._outbox) > 0:
+            return await self._put_outbox(new_messages, routing_keys, node_names)  # noqa: E501
+        try:
+            if self._shared_connection is not None:
+                async with self._shared_connection.acquire_channel() as channel:  # noqa: E501
+                    return await self._publish_confirmed(channel, new_messages, routing_keys, node_names)  # noqa: E501
             if self.sender_channel is None:
                 raise Exception("sender_channel is None")
             if self.sender_channel.channel is None:
                 raise Exception("sender_channel.channel is None")
-            exchange = self.sender_channel.channel.default_exchange
-            if exchange is None:
-                raise Exception("default exchange is None")
-            publish_result = await exchange.publish(new_message, routing_key=self.queue_name)  # noqa: E501
-            return publish_result is not None
-        except (AMQPConnectionError, ChannelInvalidStateError, DuplicateConsumerTag):  # noqa: E501
+            return await self._publish_confirmed(self.sender_channel.channel, new_messages, routing_keys, node_names)  # noqa: E501
+        except (AMQPConnectionError, ChannelInvalidStateError):
             print_exc(file=stdout)
-            interrupt_main()
-
-    def _create_new_message(self, message: str):
+            return await self._put_outbox(new_messages, routing_keys, node_names)  # noqa: E501
+
+    async def _publish_confirmed(self, channel: Channel, new_messages: List[AioPikaMessage], routing_keys: List[Optional[str]], node_names: List[Optional[str]]) -> List[bool]:  # noqa: E501
+        """
+        Publishes all messages, before waiting for the confirmations
+        """
+        results = await gather(*[
+            self._publish(channel, new_message, routing_key, node_name)
+            for new_message, routing_key, node_name in zip(new_messages, routing_keys, node_names)  # noqa: E501
+        ], return_exceptions=True)
+        outcomes = [isinstance(result, Basic.Ack) for result in results]
+        for result in results:
+            if isinstance(result, Exception):
+                error(f"publishing to {self.queue_name} failed: {result}")
+        return outcomes
+
+    async def _publish(self, channel: Channel, new_message: AioPikaMessage, routing_key: Optional[str], node_name: Optional[str] = None):  # noqa: E501
+        if self.task_routing and node_name:
+            exchange = await channel.get_exchange(node_exchange_name(self.queue_name), ensure=False)  # noqa: E501
+            return await exchange.publish(new_message, routing_key=node_name)  # noqa: E501
+        if self.task_routing and routing_key:
+            exchange = await channel.get_exchange(routing_exchange_name(self.queue_name), ensure=False)  # noqa: E501
+            return await exchange.publish(new_message, routing_key=routing_key)  # noqa: E501
+        exchange = channel.default_exchange
+        if exchange is None:
+            raise Exception("default exchange is None")
+        return await exchange.publish(new_message, routing_key=self.queue_name)  # noqa: E501
+
+    def _create_new_message(self, message: Union[str, bytes], expiration: Optional[float] = None, priority: Optional[int] = None, content_type: str = "text/plain", headers: Optional[Dict[str, Any]] = None):  # noqa: E501
+        if isinstance(message, str):
+            message = message.encode("utf-8")
+        body, content_encoding = compress(message)
         return AioPikaMessage(
-            body=message.encode("utf-8"),
-            content_type="text/plain",
+            body=body,
+            content_type=content_type,
+            content_encoding=content_encoding,
             delivery_mode=DeliveryMode.PERSISTENT,
-            headers={}
+            expiration=expiration,
+            # only used, if the queue is declared with x-max-priority
+            priority=clamp_priority(priority, self.max_priority),
+            headers=dict(headers or {})
         )
 
     async def delete_queue(self):
@@ -261,16 +859,21 @@ class _Consumer:
         connection: Connection,
         queue_name: str,
         queue_options: Dict[str, Any] = {},
+        channel: Optional[Channel] = None,
     ):
         self.queue_name = queue_name
         self.connection = connection
         self.queue_options = queue_options
-        self.channel: Optional[Channel] = None
+        # a channel of the pool is not closed by this instance
+        self._own_channel = channel is None
+        self.channel: Optional[Channel] = channel
         self.queue: Optional[Queue] = None
+        self.consumer_tag: Optional[str] = None
         self.init_done = False
 
     async def init(self):
-        self.channel = await self._open_channel(self.connection)
+        if self.channel is None:
+            self.channel = await self._open_channel(self.connection)
         self.queue = await self._declare_queue(self.queue_options)
         self.init_done = True
 
@@ -300,18 +903,69 @@ class _Consumer:
         debug(f"declared queue {queue_name}")
         return queue
 
-    async def consume(self, callback: Callable[[IncomingMessage], Awaitable[None]]):  # noqa: E501
+    async def declare_task_routing(self):
+        """
+        Declares the routing exchanges of the tasks and of the nodes,
+        the tasks without a bound queue are passed to this queue
+        through the alternate exchange
+        """
+        if self.channel is None or self.queue is None:
+            raise Exception("channel is None")
+        unrouted_exchange = await self.channel.declare_exchange(name=unrouted_exchange_name(self.queue_name), type=ExchangeType.FANOUT, durable=True)  # noqa: E501
+        await self.queue.bind(exchange=unrouted_exchange)
+        await self.channel.declare_exchange(
+            name=routing_exchange_name(self.queue_name),
+            type=ExchangeType.DIRECT,
+            durable=True,
+            arguments={"alternate-exchange": unrouted_exchange_name(self.queue_name)},  # noqa: E501
+        )
+        await self.channel.declare_exchange(
+            name=node_exchange_name(self.queue_name),
+            type=ExchangeType.DIRECT,
+            durable=True,
+            arguments={"alternate-exchange": unrouted_exchange_name(self.queue_name)},  # noqa: E501
+        )
+
+    async def bind_to_routing(self, exchange_name: str, routing_key: str):
+        """
+        Binds this queue to the given routing exchange,
+        to receive the tasks published with the given routing key
+        """
+        if self.channel is None or self.queue is None:
+            raise Exception("channel is None")
+        exchange = await self.channel.get_exchange(exchange_name, ensure=False)  # noqa: E501
+        await self.queue.bind(exchange=exchange, routing_key=routing_key)
+
+    async def consume(
+        self,
+        callback: Callable[[IncomingMessage], Awaitable[None]],
+        prefetch_count: int = prefetch_count,
+    ):
         """
         Specify, that this instance should be used to consume messages
         """
         if self.channel is None:
             raise Exception("channel is None")
-        await self.channel.set_qos(prefetch_count=prefetch_count)
+        # the prefetch count is shared by all queues consumed on the channel
+        await self.channel.set_qos(prefetch_count=prefetch_count, global_=True)  # noqa: E501
         if self.queue is None:
             raise Exception("queue is None")
-        await self.queue.consume(callback=callback)
+        self.consumer_tag = await self.queue.consume(callback=callback)
         info(f"[{self.queue_name}] [*] Waiting for messages. To exit press CTRL+C")  # noqa: E501
 
+    async def cancel(self):
+        """
+        stop consuming, without closing the channel,
+        so that the delivered messages can still be acked/nacked
+        """
+        if self.queue is None or self.consumer_tag is None:
+            return
+        try:
+            await self.queue.cancel(self.consumer_tag)
+        except (AMQPConnectionError, ChannelInvalidStateError):
+            pass
+        self.consumer_tag = None
+
     async def close(self):
         """
         stop consuming on the channel and close the channel
@@ -319,6 +973,8 @@ class _Consumer:
         try:
             if self.channel is None:
                 raise Exception("channel is None")
+            if not self._own_channel:
+                return
             await self.channel.close()
         except (KeyError, AMQPConnectionError, ChannelInvalidStateError):
             pass
@@ -346,20 +1002,22 @@ class _Consumer:
             raise Exception("channel is None while deleting queue")
         await self.channel.queue_delete(queue_name=self.queue_name)
 
-    async def clear_queue(self, queue_options: Dict[str, Any] = {}):
+    async def clear_queue(self, queue_options: Optional[Dict[str, Any]] = None):  # noqa: E501
         """
         Clears the queue
         """
         await self.delete_queue()
+        if queue_options is None:
+            queue_options = self.queue_options
         self.queue = await self._declare_queue(queue_options)
 
 
-def getPublisher(rabbitmq_url: str, queue_name: str, loop: AbstractEventLoop, queue_options: Dict[str, Any] = {}):  # noqa: E501
+def getPublisher(rabbitmq_url: str, queue_name: str, loop: AbstractEventLoop, queue_options: Dict[str, Any] = {}, connection: Optional[RabbitMQConnection] = None):  # noqa: E501
     print(threading.get_ident())
-    return RabbitMQ(url=rabbitmq_url, queue_name=queue_name, rmq_type="publisher", queue_options=queue_options, loop=loop)  # noqa: E501
+    return RabbitMQ(url=rabbitmq_url, queue_name=queue_name, rmq_type="publisher", queue_options=queue_options, loop=loop, connection=connection)  # noqa: E501
 
 
-def getConsumer(rabbitmq_url: str, queue_name: str, callback: FuncType, loop: AbstractEventLoop):  # noqa: E501
+def getConsumer(rabbitmq_url: str, queue_name: str, callback: FuncType, loop: AbstractEventLoop, prefetch_count: int = prefetch_count, connection: Optional[RabbitMQConnection] = None, task_routing: bool = False, queue_options: Dict[str, Any] = {}):  # noqa: E501
     print("Loop: ", loop)
     print(threading.get_ident())
-    return RabbitMQ(url=rabbitmq_url, queue_name=queue_name, rmq_type="consumer", callback=callback, loop=loop)  # noqa: E501
+    return RabbitMQ(url=rabbitmq_url, queue_name=queue_name, rmq_type="consumer", callback=callback, loop=loop, prefetch_count=prefetch_count, connection=connection, task_routing=task_routing, queue_options=queue_options)  # noqa: E501
@@ -124,6 +124,35 @@ class RedisClient():
         name = self.prefixed(name)
         return self._connection.lset(name, index, obj)
 
+    async def zadd(self, name: str, mapping: Dict[Any, float]) -> int:
+        name = self.prefixed(name)
+        return self._connection.zadd(name, mapping)
+
+    async def zrangebyscore(
+        self,
+        name: str,
+        min: Any,
+        max: Any,
+        start: Optional[int] = None,
+        num: Optional[int] = None,
+    ) -> List[bytes]:
+        name = self.prefixed(name)
+        return self._connection.zrangebyscore(name, min, max, start=start, num=num)  # noqa: E501
+
+    async def zrange(
+        self,
+        name: str,
+        start: int,
+        end: int,
+        withscores: bool = False,
+    ) -> List[Any]:
+        name = self.prefixed(name)
+        return self._connection.zrange(name, start, end, withscores=withscores)  # noqa: E501
+
+    async def zrem(self, name: str, *values: Any) -> int:
+        name = self.prefixed(name)
+        return self._connection.zrem(name, *values)
+
     async def subscribe(self, channel: str):
         return self._pubsub_connection.subscribe(channel)
 
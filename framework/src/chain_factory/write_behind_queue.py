@@ -0,0 +1,232 @@
+from asyncio import AbstractEventLoop
+from asyncio import Queue
+from asyncio import Task as AsyncTask
+from asyncio import TimeoutError as AsyncTimeoutError
+from asyncio import gather
+from asyncio import get_event_loop
+from asyncio import sleep
+from asyncio import wait_for
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from logging import error
+from logging import exception
+from logging import info
+from logging import warning
+from sqlite3 import Connection
+from sqlite3 import connect
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+# settings
+from .common.settings import write_behind_path
+
+
+@dataclass
+class StatusWrite():
+    # kind of the write, selects how the data is written
+    kind: str
+    # the json encoded document to write
+    data: str
+    # id of the write in the journal
+    write_id: Optional[int] = None
+
+
+ApplyType = Callable[[StatusWrite], Awaitable[Any]]
+
+
+class _WriteJournal():
+    """
+    keeps the pending writes in a sqlite database,
+    so they are written after a crash or a restart of the node,
+    the database is only used by a single thread,
+    so the event loop does not wait for the commits
+    """
+
+    def __init__(self, path: str, owner: str):
+        self.path = path
+        self.owner = owner
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._connection: Optional[Connection] = None
+
+    def _connect(self) -> Connection:
+        if self._connection is None:
+            self._connection = connect(self.path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS write_behind ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "owner TEXT, kind TEXT, data TEXT)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    async def _run(self, function: Callable[..., Any], *args) -> Any:
+        return await get_event_loop().run_in_executor(self._executor, function, *args)  # noqa: E501
+
+    def _append(self, kind: str, data: str) -> int:
+        connection = self._connect()
+        cursor = connection.execute(
+            "INSERT INTO write_behind (owner, kind, data) VALUES (?, ?, ?)",
+            (self.owner, kind, data),
+        )
+        connection.commit()
+        return cursor.lastrowid
+
+    def _pending(self) -> List[Tuple[int, str, str]]:
+        return self._connect().execute(
+            "SELECT id, kind, data FROM write_behind WHERE owner = ? ORDER BY id",  # noqa: E501
+            (self.owner, ),
+        ).fetchall()
+
+    def _remove(self, write_id: int):
+        connection = self._connect()
+        connection.execute("DELETE FROM write_behind WHERE id = ?", (write_id, ))  # noqa: E501
+        connection.commit()
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def append(self, kind: str, data: str) -> int:
+        return await self._run(self._append, kind, data)
+
+    async def pending(self) -> List[StatusWrite]:
+        rows = await self._run(self._pending)
+        return [StatusWrite(kind, data, write_id) for write_id, kind, data in rows]  # noqa: E501
+
+    async def remove(self, write_id: int):
+        await self._run(self._remove, write_id)
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+
+class WriteBehindQueue():
+    """
+    Runs database writes in the background one after another,
+    in the order they have been added,
+    so that the caller does not have to wait for the round trips
+    A failed write is retried with backoff, before the next write is started,
+    the pending writes are flushed, when the node is drained
+    If a path is given, the pending writes are kept in a sqlite journal
+    and written, when the node is started again
+    """
+
+    def __init__(
+        self,
+        apply: ApplyType,
+        path: str = write_behind_path,
+        owner: str = "",
+        retry_delay: float = 0.5,
+        max_retry_delay: float = 30,
+    ):
+        self._apply = apply
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._journal = _WriteJournal(path, owner) if path else None
+        self._queue: Optional["Queue[StatusWrite]"] = None
+        self._worker: Optional[AsyncTask] = None
+        self._pending = 0
+
+    @property
+    def started(self) -> bool:
+        return self._worker is not None
+
+    @property
+    def pending(self) -> int:
+        """
+        amount of writes, which have not been completed yet
+        """
+        return self._pending
+
+    async def start(self, loop: AbstractEventLoop):
+        self._queue = Queue()
+        if self._journal is not None:
+            # the writes left by the last run of the node
+            pending = await self._journal.pending()
+            if pending:
+                info(f"writing {len(pending)} pending write behind writes from the journal")  # noqa: E501
+            for write in pending:
+                self._enqueue(write)
+        self._worker = loop.create_task(self._run())
+
+    def _enqueue(self, write: StatusWrite):
+        if self._queue is None:
+            raise Exception("write behind queue has not been started")
+        self._pending = self._pending + 1
+        self._queue.put_nowait(write)
+
+    async def put(self, kind: str, data: str):
+        """
+        Adds the write to the queue (and the journal)
+        """
+        if self._queue is None:
+            raise Exception("write behind queue has not been started")
+        write = StatusWrite(kind, data)
+        if self._journal is not None:
+            write.write_id = await self._journal.append(kind, data)
+        self._enqueue(write)
+
+    async def _run(self):
+        if self._queue is None:
+            return
+        while True:
+            write = await self._queue.get()
+            try:
+                await self._write(write)
+            finally:
+                self._pending = self._pending - 1
+                self._queue.task_done()
+
+    async def _write(self, write: StatusWrite):
+        """
+        Retries the write until it succeeds,
+        the writes behind it have to wait to keep the order
+        """
+        attempt = 0
+        while True:
+            attempt = attempt + 1
+            try:
+                await self._apply(write)
+                break
+            except Exception as e:
+                exception(e)
+                warning(f"write behind attempt {attempt} failed, retrying")
+                await sleep(min(self.retry_delay * 2 ** (attempt - 1), self.max_retry_delay))  # noqa: E501
+        if self._journal is not None and write.write_id is not None:
+            await self._journal.remove(write.write_id)
+
+    async def flush(self, timeout: Optional[float] = None) -> int:
+        """
+        Waits until all writes added so far have been completed,
+        returns the amount of writes, which are still pending
+        """
+        if self._queue is None:
+            return 0
+        try:
+            await wait_for(self._queue.join(), timeout)
+        except AsyncTimeoutError:
+            pass
+        return self._pending
+
+    async def close(self):
+        """
+        Stops the background writer,
+        the pending writes are dropped, if there is no journal,
+        flush() has to be called before
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            await gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._journal is not None:
+            await self._journal.close()
+            if self._pending > 0:
+                info(f"{self._pending} pending write behind writes are kept in the journal")  # noqa: E501
+        elif self._pending > 0:
+            error(f"dropped {self._pending} pending write behind writes")
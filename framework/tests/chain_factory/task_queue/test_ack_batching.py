@@ -0,0 +1,75 @@
+from asyncio import ensure_future
+from asyncio import get_running_loop
+from asyncio import run
+from asyncio import sleep
+from gc import collect
+
+from aio_pika.exceptions import ChannelInvalidStateError
+
+from chain_factory.wrapper.rabbitmq import Message  # noqa: E501
+from chain_factory.wrapper.rabbitmq import _AckBatcher  # noqa: E501
+
+
+class FakeIncomingMessage():
+    def __init__(self, delivery_tag: int, channel, acks, fail: bool = False):  # noqa: E501
+        self.delivery_tag = delivery_tag
+        self.channel = channel
+        self.processed = False
+        self._acks = acks
+        self._fail = fail
+
+    def ack(self, multiple: bool = False):
+        self._acks.append((self.delivery_tag, multiple))
+        self.processed = True
+        # like aio_pika, the ack is sent in the background
+        return ensure_future(self._basic_ack())
+
+    async def _basic_ack(self):
+        if self._fail:
+            raise ChannelInvalidStateError("channel is closed")
+
+
+def test_ack_batcher_acks_highest_contiguous_delivery_tag():
+    async def main():
+        acks = []
+        channel = object()
+        batcher = _AckBatcher(interval=10, batch_size=100)
+        messages = [
+            Message(b"", FakeIncomingMessage(delivery_tag, channel, acks), delivery_tag)  # noqa: E501
+            for delivery_tag in range(1, 7)
+        ]
+        for message in messages:
+            batcher.delivered(message.message)
+        # 1, 2 and 4 are completed, 3 has been nacked, 5 is still running
+        for message in [messages[0], messages[1], messages[3], messages[5]]:
+            batcher.ack(message)
+            assert message.processed
+        batcher.settle(messages[2])
+        assert acks == []
+        batcher.flush()
+        # one ack up to 4, the ack of 6 behind 5 is sent on its own
+        assert acks == [(4, True), (6, False)]
+        batcher.ack(messages[4])
+        batcher.flush()
+        assert acks[-1] == (5, True)
+    run(main())
+
+
+def test_ack_batcher_logs_failed_acks(caplog):
+    async def main():
+        unhandled = []
+        get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))  # noqa: E501
+        acks = []
+        channel = object()
+        batcher = _AckBatcher(interval=10, batch_size=100)
+        message = Message(b"", FakeIncomingMessage(1, channel, acks, fail=True), 1)  # noqa: E501
+        batcher.delivered(message.message)
+        batcher.ack(message)
+        batcher.flush()
+        await sleep(0.01)
+        collect()
+        assert acks == [(1, True)]
+        # the failure is handled, not "exception was never retrieved"
+        assert unhandled == []
+    run(main())
+    assert "sending the batched ack failed" in caplog.text
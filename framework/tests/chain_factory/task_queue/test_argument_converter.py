@@ -0,0 +1,79 @@
+from asyncio import run
+from datetime import datetime
+from io import BytesIO
+from typing import Dict
+from typing import List
+from typing import Optional
+from pydantic import BaseModel
+from pytest import raises
+
+from chain_factory.argument_converter import ArgumentConverter  # noqa: E501
+from chain_factory.argument_converter import ArgumentConversionError  # noqa: E501
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_runner import TaskRunner  # noqa: E501
+
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+
+def task_function(
+    count: int,
+    ratio: float,
+    enabled: bool,
+    started: datetime,
+    names: List[str],
+    limits: Dict[str, int],
+    point: Point,
+    retries: Optional[int] = None,
+    untyped=None,
+):
+    pass
+
+
+def test_argument_converter():
+    converter = ArgumentConverter(task_function)
+    arguments = {
+        "count": "3",
+        "ratio": "0.5",
+        "enabled": "false",
+        "started": "2022-01-02T03:04:05Z",
+        "names": '["a", "b"]',
+        "limits": {"a": "1"},
+        "point": '{"x": 1, "y": "2"}',
+        "retries": None,
+        "untyped": "5",
+    }
+    converted = converter.convert(arguments)
+    assert converted["count"] == 3
+    assert converted["ratio"] == 0.5
+    assert converted["enabled"] is False
+    assert converted["started"].year == 2022
+    assert converted["names"] == ["a", "b"]
+    assert converted["limits"] == {"a": 1}
+    assert converted["point"] == Point(x=1, y=2)
+    assert converted["retries"] is None
+    assert converted["untyped"] == "5"
+    # the original arguments stay untouched
+    assert arguments["count"] == "3"
+
+
+def test_argument_converter_invalid_value():
+    converter = ArgumentConverter(task_function)
+    with raises(ArgumentConversionError) as e:
+        converter.convert({"count": "three"})
+    assert e.value.argument == "count"
+    with raises(ArgumentConversionError):
+        converter.convert({"point": {"x": 1}})
+
+
+def test_task_runner_reports_invalid_arguments():
+    async def main():
+        buffer = BytesIO()
+        task_runner = TaskRunner("task_function", task_function, "test")
+        task = Task(name="task_function", arguments={"count": "three"})
+        assert await task_runner.run(None, task, buffer) is None
+        # the reason is written to the log of the task
+        assert b"argument 'count'" in buffer.getvalue()
+    run(main())
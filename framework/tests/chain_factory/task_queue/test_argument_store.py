@@ -0,0 +1,76 @@
+from asyncio import run
+from gridfs.errors import NoFile
+from pytest import raises
+
+from chain_factory.argument_store import ArgumentLoadError  # noqa: E501
+from chain_factory.argument_store import ArgumentStore  # noqa: E501
+from chain_factory.argument_store import CLAIM_CHECK_KEY  # noqa: E501
+from chain_factory.argument_store import is_claim_check  # noqa: E501
+
+
+class FakeDownloadStream():
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+
+class FakeGridFSBucket():
+    def __init__(self):
+        self.files = {}
+        self.uploads = 0
+
+    def find(self, filter, limit=0):
+        files = [name for name in self.files if name == filter["filename"]]
+
+        async def iterate():
+            for name in files[:limit]:
+                yield name
+        return iterate()
+
+    async def upload_from_stream(self, filename: str, data: bytes):
+        self.uploads = self.uploads + 1
+        self.files[filename] = data
+
+    async def open_download_stream_by_name(self, filename: str):
+        if filename not in self.files:
+            raise NoFile(filename)
+        return FakeDownloadStream(self.files[filename])
+
+
+def test_argument_store_offloads_large_arguments_once():
+    async def main():
+        argument_store = ArgumentStore(threshold=100)
+        bucket = FakeGridFSBucket()
+        argument_store._bucket = bucket
+        arguments = {"users": ["user"] * 100, "count": 1}
+        offloaded = await argument_store.offload(arguments)
+        assert is_claim_check(offloaded["users"])
+        assert offloaded["count"] == 1
+        # content addressed, the same argument is stored once
+        assert await argument_store.offload(arguments) == offloaded
+        assert await argument_store.offload(offloaded) == offloaded
+        assert bucket.uploads == 1
+        assert await argument_store.load(offloaded) == arguments
+    run(main())
+
+
+def test_argument_store_keeps_excluded_arguments_out_of_gridfs():
+    async def main():
+        argument_store = ArgumentStore(threshold=10)
+        bucket = FakeGridFSBucket()
+        argument_store._bucket = bucket
+        arguments = {"password": "x" * 100, "exclude": ["password"]}
+        assert await argument_store.offload(arguments) == arguments
+        assert bucket.uploads == 0
+    run(main())
+
+
+def test_argument_store_raises_load_error_for_missing_argument():
+    async def main():
+        argument_store = ArgumentStore(threshold=10)
+        argument_store._bucket = FakeGridFSBucket()
+        with raises(ArgumentLoadError):
+            await argument_store.load({"users": {CLAIM_CHECK_KEY: "missing", "size": 100}})  # noqa: E501
+    run(main())
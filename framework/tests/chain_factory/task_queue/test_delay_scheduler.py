@@ -0,0 +1,50 @@
+from asyncio import run
+from datetime import datetime
+from datetime import timedelta
+
+from chain_factory.delay_scheduler import DelayScheduler  # noqa: E501
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+
+
+class FakeRedisClient():
+    """
+    sorted set of the planned tasks
+    """
+
+    def __init__(self):
+        self.scores = {}
+
+    async def zadd(self, name: str, mapping):
+        added = len([member for member in mapping if member not in self.scores])  # noqa: E501
+        self.scores.update(mapping)
+        return added
+
+    async def zrangebyscore(self, name: str, min, max, start=None, num=None):
+        members = [member for member, score in sorted(self.scores.items(), key=lambda item: item[1]) if score <= max]  # noqa: E501
+        return members[:num]
+
+    async def zrange(self, name: str, start: int, end: int, withscores=False):
+        return sorted(self.scores.items(), key=lambda item: item[1])[start:end + 1]  # noqa: E501
+
+    async def zrem(self, name: str, *values):
+        return len([self.scores.pop(value) for value in values if value in self.scores])  # noqa: E501
+
+
+def test_delay_scheduler_releases_due_tasks():
+    async def main():
+        sent = []
+
+        async def send(task: Task):
+            sent.append(task.name)
+
+        redis_client = FakeRedisClient()
+        scheduler = DelayScheduler(redis_client, send, interval=5)
+        now = datetime.utcnow()
+        await scheduler.schedule(Task(name="later", planned_date=now + timedelta(seconds=2)))  # noqa: E501
+        await scheduler.schedule(Task(name="due", planned_date=now - timedelta(seconds=1)))  # noqa: E501
+        sleep_time = await scheduler.release_due()
+        assert sent == ["due"]
+        # wakes up, when the next task is due
+        assert 0 < sleep_time <= 2
+        assert len(redis_client.scores) == 1
+    run(main())
@@ -0,0 +1,85 @@
+from asyncio import run
+from unittest.mock import patch
+
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_handler import TaskHandler  # noqa: E501
+
+
+def first():
+    return "second"
+
+
+def second():
+    return None
+
+
+class FakeBlockList():
+    list_items = []
+
+    async def get(self):
+        return self
+
+
+class FakeDatabase():
+    async def find_one(self, model, query):
+        return None
+
+
+class FakeMessage():
+    processed = True
+
+
+def local_chain_handler():
+    handler = TaskHandler("test", "node1")
+    handler.add_task("first", first, False)
+    handler.add_task("second", second, False)
+    handler.block_list = FakeBlockList()
+    handler.mongodb_client = FakeDatabase()
+    handler.ran = []
+    handler.statuses = []
+
+    async def run_task(task: Task, workflow):
+        handler.ran.append(task.name)
+        return {"first": "second", "second": None}[task.name], {}
+
+    async def save_task_result(task_id: str, result: str):
+        handler.statuses.append(result)
+
+    async def mark_workflow_as_stopped(workflow_id: str, status: str):
+        handler.statuses.append("workflow " + status)
+
+    async def ack(message):
+        pass
+
+    async def get_workflow(workflow_id: str):
+        return None
+
+    async def prepare_task(task: Task):
+        task.generate_task_id()
+        return task
+
+    handler._run_task = run_task
+    handler.ack = ack
+    handler._save_task_result = save_task_result
+    handler._mark_workflow_as_stopped = mark_workflow_as_stopped
+    handler._get_workflow = get_workflow
+    handler._prepare_task = prepare_task
+    return handler
+
+
+def test_local_chain_runs_the_next_task_on_this_node():
+    async def main():
+        task = Task(name="first", workflow_id="workflow", task_id="task")
+        with patch("chain_factory.task_handler.local_chain_max_depth", 2):
+            handler = local_chain_handler()
+            assert await handler._handle_run_task(task.copy(), FakeMessage()) is None  # noqa: E501
+            assert handler.ran == ["first", "second"]
+            assert handler.statuses == ["Task", "None", "workflow None"]
+        with patch("chain_factory.task_handler.local_chain_max_depth", 0):
+            handler = local_chain_handler()
+            next_task = await handler._handle_run_task(task.copy(), FakeMessage())  # noqa: E501
+            # the next task is returned to be sent to the queue
+            assert next_task.name == "second"
+            assert next_task.parent_task_id == "task"
+            assert handler.ran == ["first"]
+    run(main())
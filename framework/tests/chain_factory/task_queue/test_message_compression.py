@@ -0,0 +1,23 @@
+from chain_factory.wrapper.message_compression import MessageSizeHistogram  # noqa: E501
+from chain_factory.wrapper.message_compression import compress  # noqa: E501
+from chain_factory.wrapper.message_compression import decompress  # noqa: E501
+
+
+def test_message_compression_above_threshold():
+    body = b'{"arguments": "' + b"x" * 10000 + b'"}'
+    compressed, encoding = compress(body, "gzip", 4096)
+    assert encoding == "gzip"
+    assert len(compressed) < len(body)
+    assert decompress(compressed, encoding) == body
+    # small bodies and disabled compression are sent as they are
+    assert compress(b"{}", "gzip", 4096) == (b"{}", None)
+    assert compress(body, "", 4096) == (body, None)
+    assert decompress(b"{}", None) == b"{}"
+
+
+def test_message_size_histogram():
+    histogram = MessageSizeHistogram([1024, 4096])
+    for size in [10, 1024, 1025, 5000]:
+        histogram.record(size)
+    assert histogram.snapshot() == {"<=1024": 2, "<=4096": 1, ">4096": 1}
+    assert histogram.total_bytes == 10 + 1024 + 1025 + 5000
@@ -0,0 +1,35 @@
+from asyncio import run
+from datetime import datetime
+from datetime import timedelta
+
+from chain_factory.models.redis_models import Heartbeat  # noqa: E501
+from chain_factory.node_selector import NodeSelector  # noqa: E501
+
+
+class FakeRedisClient():
+    def __init__(self):
+        self.values = {}
+        self.gets = 0
+
+    async def get(self, name: str):
+        self.gets = self.gets + 1
+        return self.values.get(name)
+
+
+def heartbeat(node_name: str, age: float) -> str:
+    last_time_seen = datetime.utcnow() - timedelta(seconds=age)
+    return Heartbeat(node_name=node_name, namespace="test", last_time_seen=last_time_seen).json()  # noqa: E501
+
+
+def test_node_selector_selects_alive_node():
+    async def main():
+        redis_client = FakeRedisClient()
+        redis_client.values["heartbeat_alive"] = heartbeat("alive", 1)
+        redis_client.values["heartbeat_dead"] = heartbeat("dead", 300)
+        selector = NodeSelector(redis_client, max_heartbeat_age=30, cache_time=60)  # noqa: E501
+        for _ in range(0, 5):
+            assert await selector.select(["dead", "missing", "alive"]) == "alive"  # noqa: E501
+        assert await selector.select(["dead", "missing"]) is None
+        # the state of the nodes is cached
+        assert redis_client.gets == 3
+    run(main())
@@ -0,0 +1,119 @@
+from asyncio import gather
+from asyncio import run
+from asyncio import sleep
+from unittest.mock import patch
+
+from aiormq.exceptions import DeliveryError
+from pamqp.specification import Basic
+
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_handler import TaskHandler  # noqa: E501
+from chain_factory.wrapper.rabbitmq import RabbitMQ  # noqa: E501
+from chain_factory.wrapper.rabbitmq import priority_queue_options  # noqa: E501
+
+
+class FakeExchange():
+    def __init__(self):
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.routing_keys = []
+
+    async def publish(self, message, routing_key: str):
+        self.routing_keys.append(routing_key)
+        self.in_flight = self.in_flight + 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await sleep(0.01)
+        self.in_flight = self.in_flight - 1
+        body = message.body.decode("utf-8")
+        if body == "nack":
+            raise DeliveryError(None, Basic.Nack())
+        self.published.append(body)
+        return Basic.Ack()
+
+
+class FakeChannel():
+    def __init__(self):
+        self.default_exchange = FakeExchange()
+        self.exchanges = {}
+
+    async def get_exchange(self, name: str, ensure: bool = True):
+        return self.exchanges.setdefault(name, FakeExchange())
+
+
+class FakeSenderChannel():
+    def __init__(self):
+        self.channel = FakeChannel()
+
+
+def test_send_many_pipelines_and_returns_outcomes():
+    async def main():
+        rabbitmq = RabbitMQ("amqp://localhost", "test", batch_size=3)
+        rabbitmq.sender_channel = FakeSenderChannel()
+        exchange = rabbitmq.sender_channel.channel.default_exchange
+        outcomes = await rabbitmq.send_many(["a", "nack", "b", "c", "d"])
+        assert outcomes == [True, False, True, True, True]
+        assert exchange.published == ["a", "b", "c", "d"]
+        # a batch is published without waiting for the confirmations
+        assert exchange.max_in_flight == 3
+    run(main())
+
+
+def test_send_collects_messages_in_time_window():
+    async def main():
+        rabbitmq = RabbitMQ("amqp://localhost", "test", batch_size=10, batch_window=0.05)  # noqa: E501
+        rabbitmq.sender_channel = FakeSenderChannel()
+        exchange = rabbitmq.sender_channel.channel.default_exchange
+        outcomes = await gather(*[rabbitmq.send(str(i)) for i in range(0, 4)])  # noqa: E501
+        assert outcomes == [True, True, True, True]
+        assert exchange.max_in_flight == 4
+        assert exchange.published == ["0", "1", "2", "3"]
+    run(main())
+
+
+def test_send_routes_tasks_by_name():
+    async def main():
+        rabbitmq = RabbitMQ("amqp://localhost", "test", task_routing=True)
+        rabbitmq.sender_channel = FakeSenderChannel()
+        channel = rabbitmq.sender_channel.channel
+        assert await rabbitmq.send("a", routing_key="task_a")
+        # without a task name the message goes to the queue directly
+        assert await rabbitmq.send("b")
+        assert channel.exchanges["test.routing"].routing_keys == ["task_a"]
+        assert channel.default_exchange.routing_keys == ["test"]
+    run(main())
+
+
+def test_message_priority_is_clamped_to_the_task_queues():
+    rabbitmq = RabbitMQ("amqp://", "test", queue_options=priority_queue_options(10), max_priority=10)  # noqa: E501
+    assert rabbitmq._create_new_message("a", priority=300).priority == 10
+    assert rabbitmq._create_new_message("a", priority=-1).priority == 0
+    # without priority queues, the priority is limited to an octet
+    rabbitmq = RabbitMQ("amqp://", "test", max_priority=0)
+    assert rabbitmq._create_new_message("a", priority=300).priority == 255
+
+
+def test_wait_queue_keeps_the_priority():
+    async def main():
+        published = []
+
+        async def init(self):
+            pass
+
+        async def publish_one(self, new_message, routing_key, node_name):
+            published.append((self.queue_name, new_message.priority))
+            return Basic.Ack()
+
+        handler = TaskHandler("test", "node1")
+        handler.wait_queue_name = "iw_queue"
+        handler.blocked_queue_name = "ib_queue"
+        handler.queue_name = "it_queue"
+        handler.loop = None
+        with patch.object(RabbitMQ, "init", init), patch.object(RabbitMQ, "_publish_one", publish_one):  # noqa: E501
+            await handler._init_amqp_publishers("amqp://")
+            # the wait queue is no priority queue, the task queue may be one
+            handler.amqp_wait.max_priority = 10
+            await handler._send_to_wait_queue(Task(name="task", priority=9))  # noqa: E501
+        # dead lettered to the task queue with its priority
+        assert published == [("dlx.iw_queue", 9)]
+    run(main())
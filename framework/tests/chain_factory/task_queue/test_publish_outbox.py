@@ -0,0 +1,54 @@
+from asyncio import run
+from asyncio import sleep
+
+from aio_pika import Message as AioPikaMessage
+from aio_pika.exceptions import AMQPConnectionError
+
+from chain_factory.wrapper.publish_outbox import OutboxEntry  # noqa: E501
+from chain_factory.wrapper.publish_outbox import PublishOutbox  # noqa: E501
+
+
+def test_publish_outbox_publishes_in_order_when_the_broker_is_back(tmp_path):  # noqa: E501
+    async def main():
+        published = []
+        broker_down = True
+
+        async def publish(entry: OutboxEntry) -> bool:
+            if broker_down:
+                raise AMQPConnectionError("connection lost")
+            published.append(entry.message.body)
+            return True
+
+        path = str(tmp_path / "outbox.sqlite")
+        outbox = PublishOutbox(publish, "test", path=path, retry_interval=0.01)  # noqa: E501
+        for index in range(0, 3):
+            message = AioPikaMessage(f"task{index}".encode(), priority=index)
+            await outbox.put(OutboxEntry(message, routing_key="task"))
+        await sleep(0.05)
+        assert len(outbox) == 3
+        # the messages are kept over a restart of the node
+        await outbox.close(timeout=0)
+        outbox = PublishOutbox(publish, "test", path=path, retry_interval=0.01)  # noqa: E501
+        assert len(outbox) == 3
+        broker_down = False
+        outbox.start()
+        await outbox.close(timeout=1)
+        assert published == [b"task0", b"task1", b"task2"]
+        assert len(PublishOutbox(publish, "test", path=path)) == 0
+    run(main())
+
+
+def test_publish_outbox_waits_when_full():
+    async def main():
+        published = []
+
+        async def publish(entry: OutboxEntry) -> bool:
+            published.append(entry.message.body)
+            return True
+
+        outbox = PublishOutbox(publish, "test", max_size=1, path="", retry_interval=0.01)  # noqa: E501
+        for index in range(0, 3):
+            await outbox.put(OutboxEntry(AioPikaMessage(f"task{index}".encode())))  # noqa: E501
+        await outbox.close(timeout=1)
+        assert published == [b"task0", b"task1", b"task2"]
+    run(main())
@@ -0,0 +1,73 @@
+from asyncio import create_task
+from asyncio import run
+from asyncio import sleep
+
+from chain_factory.queue_handler import QueueHandler  # noqa: E501
+from chain_factory.worker_slots import WorkerSlots  # noqa: E501
+from chain_factory.wrapper.rabbitmq import RabbitMQ  # noqa: E501
+
+
+class FakeIncomingMessage():
+    def __init__(self, delivery_tag: int, body: bytes):
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.content_type = "application/json"
+        self.content_encoding = None
+        self.headers = {}
+        self.processed = False
+        self.channel = FakeChannel()
+        self.result = ""
+
+    async def ack(self, multiple: bool = False):
+        self.result = "acked"
+        self.processed = True
+
+    async def reject(self, requeue: bool = False):
+        self.result = "rejected"
+        self.processed = True
+
+    async def nack(self, requeue: bool = True):
+        self.result = "requeued"
+        self.processed = True
+
+
+class FakeChannel():
+    is_closed = False
+
+
+class FakeConsumer():
+    async def cancel(self):
+        pass
+
+
+class SleepingQueueHandler(QueueHandler):
+    async def on_task(self, task, message):
+        await sleep(float(task.arguments["duration"]))
+        return None
+
+
+def test_queue_handler_drain():
+    async def main():
+        queue_handler = SleepingQueueHandler()
+        queue_handler.worker_slots = WorkerSlots(2)
+        rabbitmq = RabbitMQ("amqp://localhost", "test", "consumer", queue_handler._on_message)  # noqa: E501
+        rabbitmq._consumer = FakeConsumer()
+        queue_handler.rabbitmq = rabbitmq
+        durations = [0.05, 10, 0.05]
+        messages = [
+            FakeIncomingMessage(index, f'{{"name": "task", "arguments": {{"duration": {duration}}}}}'.encode())  # noqa: E501
+            for index, duration in enumerate(durations)
+        ]
+        handlers = [create_task(rabbitmq.callback_impl(message)) for message in messages]  # noqa: E501
+        await sleep(0.01)
+        report = await queue_handler.drain(timeout=0.5)
+        await sleep(0.01)
+        for handler in handlers:
+            handler.cancel()
+        return report, [message.result for message in messages]
+    report, results = run(main())
+    # the third message waited for a free worker slot
+    assert results == ["acked", "requeued", "requeued"]
+    assert report.completed == 1
+    assert report.requeued == 2
+    assert report.timed_out
@@ -0,0 +1,23 @@
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.retry_tiers import RetryTiers  # noqa: E501
+
+
+def test_retry_tiers_grow_with_retry_counter():
+    retry_tiers = RetryTiers(delays=[1, 5, 30], max_attempts=4, jitter=0.2)
+    task = Task(name="task")
+    tiers = []
+    for _ in range(0, 5):
+        task.increase_retried()
+        tiers.append(retry_tiers.tier(task))
+    # later retries are waiting in the last tier
+    assert tiers == [0, 1, 2, 2, 2]
+    # the fifth retry exceeds max_attempts
+    assert retry_tiers.exhausted(task)
+    assert not RetryTiers(delays=[1], max_attempts=0).exhausted(task)
+
+
+def test_retry_tiers_spread_the_jitter_over_queues():
+    retry_tiers = RetryTiers(delays=[5], jitter=0.2, jitter_queues=3)
+    # one queue ttl per jitter queue, no per message expiration
+    assert retry_tiers.queue_delays(5) == [4, 5, 6]
+    assert RetryTiers(delays=[5], jitter=0).queue_delays(5) == [5]
@@ -0,0 +1,19 @@
+from chain_factory.running_task_registry import RunningTaskRegistry  # noqa: E501
+
+
+def test_running_task_registry_same_workflow():
+    registry = RunningTaskRegistry(stripe_count=4)
+    first, second, other = object(), object(), object()
+    # two tasks of the same workflow are running at the same time
+    registry.add("task1", "workflow1", first)
+    registry.add("task2", "workflow1", second)
+    registry.add("task3", "workflow2", other)
+    assert registry.count() == 3
+    assert registry.get("task2") is second
+    assert set(map(id, registry.by_workflow("workflow1"))) == {id(first), id(second)}  # noqa: E501
+    assert registry.remove("task1", "workflow1") is first
+    assert registry.by_workflow("workflow1") == [second]
+    registry.remove("task2", "workflow1")
+    assert registry.by_workflow("workflow1") == []
+    assert list(registry.snapshot().keys()) == ["task3"]
+    assert len(registry) == 1
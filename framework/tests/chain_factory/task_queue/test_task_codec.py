@@ -0,0 +1,37 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_codec import TRUSTED_HEADER  # noqa: E501
+from chain_factory.task_codec import decode_task  # noqa: E501
+from chain_factory.task_codec import encode_task  # noqa: E501
+
+
+def test_task_codec_round_trip():
+    task = Task(name="task", arguments={"a": [1, 2]}, node_names=["node1"], priority=3)  # noqa: E501
+    encoded = encode_task(task)
+    assert encoded.content_type == "application/json"
+    assert encoded.headers[TRUSTED_HEADER]
+    for headers in [encoded.headers, {}]:
+        decoded = decode_task(encoded.body, encoded.content_type, headers)
+        assert decoded == task
+        assert isinstance(decoded.planned_date, datetime)
+
+
+def test_task_codec_validates_unsigned_tasks():
+    task = Task(name="task")
+    body = task.json().encode("utf-8")
+    # a header set by the client is not a valid signature
+    for headers in [{TRUSTED_HEADER: True}, {TRUSTED_HEADER: "0" * 64}]:
+        with patch.object(Task, "construct", side_effect=AssertionError):
+            assert decode_task(body, "application/json", headers) == task
+    encoded = encode_task(task)
+    with patch.object(Task, "parse_obj", side_effect=AssertionError):
+        assert decode_task(encoded.body, encoded.content_type, encoded.headers) == task  # noqa: E501
+
+
+def test_task_codec_decodes_former_messages():
+    task = Task(name="task")
+    # former nodes and the api are sending pydantic json as text/plain
+    assert decode_task(task.json().encode("utf-8"), "text/plain") == task
+    assert decode_task(task.json().encode("utf-8"), None) == task
@@ -0,0 +1,32 @@
+from asyncio import gather
+from asyncio import get_running_loop
+from asyncio import run
+from asyncio import sleep
+from io import BytesIO
+
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_context import TaskContext  # noqa: E501
+from chain_factory.task_context import current_task_context  # noqa: E501
+from chain_factory.task_thread import TaskThread  # noqa: E501
+
+
+async def task_function():
+    # give the other task the chance to run in between
+    await sleep(0.05)
+    return current_task_context.get().task.name
+
+
+async def run_task(name: str):
+    task_context = TaskContext(Task(name=name))
+    current_task_context.set(task_context)
+    task_thread = TaskThread(name, task_function, {}, BytesIO(), {}, None, task_context.task)  # noqa: E501
+    task_thread.bind_loop(get_running_loop())
+    task_thread.start()
+    await task_thread.wait_finished()
+    return task_thread.result
+
+
+def test_task_context_concurrent_threads():
+    async def main():
+        return await gather(run_task("first"), run_task("second"))
+    assert run(main()) == ["first", "second"]
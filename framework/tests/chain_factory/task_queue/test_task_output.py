@@ -0,0 +1,47 @@
+from asyncio import gather
+from asyncio import get_running_loop
+from asyncio import run
+from asyncio import sleep
+from io import BytesIO
+from logging import INFO
+from logging import getLogger
+from logging import info
+
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_coroutine import TaskCoroutine  # noqa: E501
+from chain_factory.task_thread import TaskThread  # noqa: E501
+
+
+def task_function(name: str):
+    async def log_lines():
+        for index in range(0, 3):
+            info(f"{name} log {index}")
+            print(f"{name} print {index}")
+            # let the other tasks write in between
+            await sleep(0.01)
+    return log_lines
+
+
+async def run_task(task_class, name: str):
+    buffer = BytesIO()
+    task_execution = task_class(name, task_function(name), {}, buffer, {}, None, Task(name=name))  # noqa: E501
+    task_execution.bind_loop(get_running_loop())
+    task_execution.start()
+    await task_execution.wait_finished()
+    return buffer.getvalue().decode("utf-8")
+
+
+def test_task_output_is_routed_per_task():
+    getLogger().setLevel(INFO)
+
+    async def main():
+        return await gather(
+            run_task(TaskThread, "first"),
+            run_task(TaskThread, "second"),
+            run_task(TaskCoroutine, "third"),
+        )
+    outputs = run(main())
+    for name, output in zip(["first", "second", "third"], outputs):
+        lines = [line for line in output.splitlines() if not line.startswith("result")]  # noqa: E501
+        assert len(lines) == 6
+        assert all(line.startswith(name) for line in lines)
@@ -0,0 +1,87 @@
+from asyncio import run
+
+from chain_factory.models.mongodb_models import NodeTasks  # noqa: E501
+from chain_factory.models.mongodb_models import RegisteredTask  # noqa: E501
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_parking import TaskParking  # noqa: E501
+
+
+class FakeRedisClient():
+    def __init__(self):
+        self.scores = {}
+
+    async def zadd(self, name: str, mapping):
+        self.scores.update(mapping)
+        return len(mapping)
+
+    async def zrange(self, name: str, start: int, end: int, withscores=False):
+        return sorted(self.scores, key=lambda member: self.scores[member])
+
+    async def zrem(self, name: str, *values):
+        return len([self.scores.pop(value) for value in values if value in self.scores])  # noqa: E501
+
+
+class FakeDatabase():
+    def __init__(self):
+        self.node_tasks = [
+            NodeTasks(node_name="node1", namespace="test", tasks=[RegisteredTask(name="task1", arguments={})]),  # noqa: E501
+        ]
+
+    async def find(self, model, query):
+        return self.node_tasks
+
+
+class FakeNodeSelector():
+    def __init__(self):
+        self.alive_nodes = []
+
+    async def alive(self, node_name: str) -> bool:
+        return node_name in self.alive_nodes
+
+
+def test_task_parking_releases_tasks_for_registering_node():
+    async def main():
+        sent = []
+
+        async def send(task: Task):
+            sent.append(task.name)
+
+        redis_client = FakeRedisClient()
+        node_selector = FakeNodeSelector()
+        parking = TaskParking(redis_client, FakeDatabase(), "test", node_selector, send)  # noqa: E501
+        task1 = Task(name="task1")
+        task2 = Task(name="task2")
+        # node1 has registered task1, but is not alive
+        assert not await parking.can_run(task1)
+        assert not await parking.can_run(task2)
+        await parking.park(task1)
+        await parking.park(task2)
+        node_selector.alive_nodes = ["node1"]
+        parking._registered_nodes = {}
+        assert await parking.can_run(task1)
+        assert not await parking.can_run(Task(name="task1", node_names=["node2"]))  # noqa: E501
+        # node1 registers again with task1
+        assert await parking.release("node1", ["task1"]) == 1
+        assert sent == ["task1"]
+        assert len(redis_client.scores) == 1
+    run(main())
+
+
+def test_task_parking_releases_tasks_periodically():
+    async def main():
+        sent = []
+
+        async def send(task: Task):
+            sent.append(task.name)
+
+        redis_client = FakeRedisClient()
+        parking = TaskParking(redis_client, FakeDatabase(), "test", FakeNodeSelector(), send, release_interval=60)  # noqa: E501
+        await parking.park(Task(name="task1"))
+        assert await parking.release_due("node1", ["task1"]) == 1
+        # parked again by a node, which has not seen node1 yet
+        await parking.park(Task(name="task1"))
+        assert await parking.release_due("node1", ["task1"]) == 0
+        parking._last_release = parking._last_release - 60
+        assert await parking.release_due("node1", ["task1"]) == 1
+        assert sent == ["task1", "task1"]
+    run(main())
@@ -0,0 +1,39 @@
+from io import BytesIO
+from signal import SIGTERM
+from signal import SIG_IGN
+from signal import signal
+from time import monotonic
+from time import sleep
+
+from chain_factory.models.mongodb_models import Task  # noqa: E501
+from chain_factory.task_process import TaskProcess  # noqa: E501
+from chain_factory.task_process_pool import TaskProcessPool  # noqa: E501
+
+
+def ignore_sigterm():
+    signal(SIGTERM, SIG_IGN)
+    print("started")
+    sleep(30)
+
+
+def test_task_process_abort_does_not_wait_for_the_process():
+    pool = TaskProcessPool(1, "fork", terminate_timeout=0.5)
+    pool.start()
+    try:
+        task_process = TaskProcess("ignore_sigterm", ignore_sigterm, {}, BytesIO(), {}, None, Task(name="ignore_sigterm"), pool)  # noqa: E501
+        task_process.start()
+        started = monotonic()
+        while b"started" not in task_process._buffer.getvalue() and monotonic() - started < 10:  # noqa: E501
+            sleep(0.01)
+        started = monotonic()
+        task_process.abort()
+        # the process ignores SIGTERM, abort only signals it
+        assert monotonic() - started < 0.5
+        # the process is killed and the worker is recycled by the thread
+        task_process.join(10)
+        assert not task_process.is_alive()
+        worker = pool.acquire()
+        assert worker.process.is_alive()
+        pool.release(worker)
+    finally:
+        pool.shutdown()
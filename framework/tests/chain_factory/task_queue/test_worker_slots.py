@@ -0,0 +1,21 @@
+from asyncio import run, gather, sleep
+from chain_factory.worker_slots import WorkerSlots  # noqa: E501
+
+
+def test_worker_slots():
+    worker_slots = WorkerSlots(2)
+    max_in_use = 0
+
+    async def run_task():
+        nonlocal max_in_use
+        async with worker_slots:
+            max_in_use = max(max_in_use, worker_slots.in_use)
+            await sleep(0.01)
+
+    async def run_tasks():
+        await gather(*[run_task() for _ in range(0, 10)])
+
+    run(run_tasks())
+    assert max_in_use == 2
+    assert worker_slots.in_use == 0
+    assert worker_slots.free == 2
@@ -0,0 +1,41 @@
+from asyncio import get_event_loop
+from asyncio import run
+
+from chain_factory.write_behind_queue import StatusWrite  # noqa: E501
+from chain_factory.write_behind_queue import WriteBehindQueue  # noqa: E501
+
+
+def test_write_behind_queue_keeps_pending_writes_in_the_journal(tmp_path):  # noqa: E501
+    async def main():
+        written = []
+        database_down = True
+        attempts = 0
+
+        async def apply(write: StatusWrite):
+            nonlocal attempts
+            attempts = attempts + 1
+            if database_down:
+                raise Exception("database is down")
+            written.append(write.data)
+
+        path = str(tmp_path / "write_behind.sqlite")
+        queue = WriteBehindQueue(apply, path=path, owner="node1", retry_delay=0.01, max_retry_delay=0.02)  # noqa: E501
+        await queue.start(get_event_loop())
+        for index in range(0, 3):
+            await queue.put("task_status", f"status{index}")
+        # the failed write is retried instead of being dropped
+        assert await queue.flush(0.2) == 3
+        assert attempts > 3
+        # the node crashes, the writes are kept in the journal
+        await queue.close()
+        database_down = False
+        queue = WriteBehindQueue(apply, path=path, owner="node1", retry_delay=0.01)  # noqa: E501
+        await queue.start(get_event_loop())
+        assert await queue.flush(1) == 0
+        assert written == ["status0", "status1", "status2"]
+        await queue.close()
+        queue = WriteBehindQueue(apply, path=path, owner="node1")
+        await queue.start(get_event_loop())
+        assert queue.pending == 0
+        await queue.close()
+    run(main())